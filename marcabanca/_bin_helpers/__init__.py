@@ -1,2 +1,6 @@
 from . import info
+from . import compare
+from . import merge
+from . import prune
+from . import report
 from .main import main
@@ -0,0 +1,187 @@
+from .main import main, root_arg, compute_root
+from .info import match_configs, LOGGER
+import climax as clx
+import numpy as np
+from jztools import humanize as pghm
+from pytest_marcabanca.utils import Manager
+from pytest_marcabanca import stats as mb_stats
+from rich.table import Table
+from rich.console import Console
+from rich.markup import escape
+
+CONSOLE = Console()
+
+CONFIG_KINDS = {"machine": "machine_configs", "python": "python_configs"}
+
+
+def resolve_configs(mngr, base, new):
+    """
+    Matches the base and new id prefixes to two configs of the same kind.
+
+    :return: ``(kind, base config, new config)``, where ``kind`` is one of :data:`CONFIG_KINDS`.
+    """
+    matches = {
+        _prefix: [
+            (_kind, _config)
+            for _kind, _key in CONFIG_KINDS.items()
+            for _config in match_configs(mngr.data[_key], _prefix)
+        ]
+        for _prefix in [base, new]
+    }
+    for _prefix, _matches in matches.items():
+        if len(_matches) != 1:
+            LOGGER.error(
+                f"Found {len(_matches)} machine or python configs matching hash '{_prefix}' (expected one)."
+            )
+            exit(-1)
+    (base_kind, base_config), (new_kind, new_config) = (
+        matches[base][0],
+        matches[new][0],
+    )
+    if base_kind != new_kind:
+        LOGGER.error(f"Cannot compare a {base_kind} config to a {new_kind} config.")
+        exit(-1)
+    return base_kind, base_config, new_config
+
+
+def pair_references(references, kind, base_id, new_id):
+    """
+    Joins the base and new references of each test. When a test has several references on a side (e.g., from several python configs when comparing machines), references with matching configs of the other kind are preferred, and ties are broken by the number of samples.
+
+    :return: Dictionary mapping ``(test_node_id, metric)`` to ``(base reference, new reference)``, and the lists of test keys only found on the base side and on the new side.
+    """
+    id_key = f"{kind}_config_id"
+    other_key = f"{'python' if kind == 'machine' else 'machine'}_config_id"
+    sides = {}
+    for _ref in references:
+        reference_id = _ref.reference_id
+        if (config_id := reference_id[id_key]) in (base_id, new_id):
+            key = (reference_id["test_node_id"], reference_id.get("metric"))
+            sides.setdefault(key, ([], []))[config_id == new_id].append(_ref)
+
+    pairs = {}
+    for _key, (_base_refs, _new_refs) in sides.items():
+        if not (_base_refs and _new_refs):
+            continue
+        candidates = [
+            (_base, _new)
+            for _base in _base_refs
+            for _new in _new_refs
+            if _base.reference_id[other_key] == _new.reference_id[other_key]
+        ] or [(_base, _new) for _base in _base_refs for _new in _new_refs]
+        pairs[_key] = max(
+            candidates,
+            key=lambda _pair: min(_pair[0].num_samples, _pair[1].num_samples),
+        )
+    return (
+        pairs,
+        sorted(_key for _key, _refs in sides.items() if not _refs[1]),
+        sorted(_key for _key, _refs in sides.items() if not _refs[0]),
+    )
+
+
+def normalized_runtimes(reference, other):
+    """
+    Returns the reference's runtimes, normalized to the work units of the other reference if both declare work units.
+    """
+    runtimes = np.asarray(reference.runtimes, dtype=float)
+    if reference.work_units and other.work_units:
+        runtimes = runtimes * other.work_units / reference.work_units
+    return runtimes
+
+
+@main.command(
+    parents=[root_arg],
+    help="Compare the references of two machine configs or two python configs, joined by test. Prints each test's relative runtime (new/base) with a bootstrap confidence interval, and the geometric-mean speedup of the new config.",
+)
+@clx.argument(
+    "--base",
+    required=True,
+    help="Id (or id prefix) of the baseline machine or python config.",
+)
+@clx.argument(
+    "--new",
+    required=True,
+    help="Id (or id prefix) of the machine or python config compared to the baseline.",
+)
+@clx.argument(
+    "--confidence",
+    type=float,
+    default=0.95,
+    help="[0.95] Confidence level of the intervals.",
+)
+def compare(root, base, new, confidence):
+    root = compute_root(root)
+    mngr = Manager(root, add_this_env=False)
+    kind, base_config, new_config = resolve_configs(mngr, base, new)
+    pairs, base_only, new_only = pair_references(
+        mngr.data["references"], kind, base_config.config_id, new_config.config_id
+    )
+    if not pairs:
+        CONSOLE.print(f"No tests have references for both {kind} configs.", style="red")
+        return
+
+    rng = np.random.default_rng(0)
+    samples = {
+        _key: (normalized_runtimes(_base, _new), np.asarray(_new.runtimes, dtype=float))
+        for _key, (_base, _new) in pairs.items()
+    }
+    # Resample all the tests at once.
+    cis = mb_stats.bootstrap_ratio_cis(
+        [(_new, _base) for _base, _new in samples.values()],
+        confidence=confidence,
+        rng=rng,
+    )
+    rows = [
+        (
+            _test_node_id + (f" [{_metric}]" if _metric else ""),
+            _base.mean(),
+            _new.mean(),
+            *_ci,
+            (len(_base), len(_new)),
+        )
+        for ((_test_node_id, _metric), (_base, _new)), _ci in zip(samples.items(), cis)
+    ]
+    rows.sort(key=lambda _row: _row[3], reverse=True)
+
+    table = Table(
+        title=f"{kind.capitalize()} config {new_config.config_id[:8]} relative to {base_config.config_id[:8]}"
+    )
+    for _header in [
+        "Test",
+        "Base",
+        "New",
+        "Rltv",
+        f"{confidence:.0%} CI",
+        "Speedup",
+        "n",
+    ]:
+        table.add_column(
+            _header,
+            justify="left" if _header == "Test" else "right",
+            no_wrap=_header != "Test",
+        )
+    for _label, _base_mean, _new_mean, _ratio, _lower, _upper, _num in rows:
+        table.add_row(
+            escape(_label),
+            pghm.secs(_base_mean),
+            pghm.secs(_new_mean),
+            f"{_ratio:.3f}X",
+            f"[{_lower:.3f}, {_upper:.3f}]",
+            f"{1/_ratio:.3f}X",
+            f"{_num[0]}/{_num[1]}",
+            style=("red" if _lower > 1 else ("green" if _upper < 1 else None)),
+        )
+    CONSOLE.print(table)
+
+    gmean, lower, upper = mb_stats.geometric_mean_ci(
+        [_row[3] for _row in rows], confidence=confidence, rng=rng
+    )
+    CONSOLE.print(
+        f"Geometric-mean speedup over {len(rows)} tests: {1/gmean:.3f}X ({confidence:.0%} CI [{1/upper:.3f}, {1/lower:.3f}])."
+    )
+    if base_only or new_only:
+        CONSOLE.print(
+            f"{len(base_only)} tests only have base references and {len(new_only)} tests only have new references.",
+            style="yellow",
+        )
@@ -2,7 +2,15 @@ from .main import main, root_arg, compute_root
 from collections import namedtuple
 from jztools import validation as pgval
 import climax as clx
-from pytest_marcabanca.utils import Manager, find
+from pytest_marcabanca.utils import Manager, find, load_references, store_paths
+from pytest_marcabanca import maintenance as mb_maintenance
+from pytest_marcabanca import query as mb_query
+from pytest_marcabanca import export as mb_export
+from jztools import humanize as pghm
+from jztools.serializer import Serializer
+from rich.markup import escape
+import json
+import time
 from rich.table import Table
 from rich.console import Console
 from rich.text import Text
@@ -61,6 +69,34 @@ def python(root, do_diff):
     )
 
 
+def match_configs(configs_list, prefix):
+    """
+    Returns the configs whose id starts with the specified prefix.
+    """
+    return [
+        _config
+        for _config in configs_list
+        if _config.config_id[: len(prefix)] == prefix
+    ]
+
+
+def find_config(config_type, configs_list, prefix):
+    """
+    Returns the single config whose id starts with the specified prefix, exiting with an error otherwise.
+    """
+    matches = match_configs(configs_list, prefix)
+    if len(matches) > 1:
+        LOGGER.error(
+            f"Found more than one matching reference {config_type} for hash '{prefix}': "
+            f"{[_config.config_id for _config in matches]}"
+        )
+        exit(-1)
+    elif len(matches) == 0:
+        LOGGER.error(f"Found no matching reference {config_type}s for hash '{prefix}'.")
+        exit(-1)
+    return matches[0]
+
+
 def print_summary(config_type, this_config, configs_list, do_diff):
 
     # Get the matching config.
@@ -76,23 +112,7 @@ def print_summary(config_type, this_config, configs_list, do_diff):
     if do_diff is None:
         ref_config = this_config
     elif do_diff is not False:
-        posn = [
-            _k
-            for _k, _ref in enumerate(configs_list)
-            if _ref.config_id[: len(do_diff)] == do_diff
-        ]
-        if len(posn) > 1:
-            LOGGER.error(
-                f"Found more than one matching reference {config_type} for hash '{do_diff}': "
-                f"{[configs_list[_k].config_id for _k in posn]}"
-            )
-            exit(-1)
-        elif len(posn) == 0:
-            LOGGER.error(
-                f"Found no matching reference {config_type}s for hash '{do_diff}'."
-            )
-            exit(-1)
-        ref_config = configs_list[posn[0]]
+        ref_config = find_config(config_type, configs_list, do_diff)
 
     #
     formatted_configs = [
@@ -128,3 +148,125 @@ def print_summary(config_type, this_config, configs_list, do_diff):
         table.add_row(*[_config[_col.key] for _col in columns])
 
     CONSOLE.print(table)
+
+
+@info.command(
+    parents=[root_arg],
+    help="Print summary statistics (mean, coefficient of variation, p99 and number of samples) of the references matching all the specified filters.",
+)
+@clx.argument(
+    "--nodes",
+    help="Shell-style pattern of the test node ids (e.g., 'tests/test_io.py::*').",
+)
+@clx.argument("--machine", help="Prefix of the machine config ids.")
+@clx.argument("--python", help="Prefix of the python config ids.")
+@clx.argument("--model", help="Model family (e.g., 'gamma').")
+@clx.argument("--min-samples", type=int, help="Minimum number of samples.")
+@clx.argument("--max-samples", type=int, help="Maximum number of samples.")
+@clx.argument(
+    "--max-age",
+    type=float,
+    help="Only references used by a session within this many days. A reference is used by the sessions that create or evaluate it (for references stored by older versions, the latest history entry is used instead).",
+)
+@clx.argument(
+    "--min-age",
+    type=float,
+    help="Only references not used by any session within this many days (see --max-age).",
+)
+@clx.argument(
+    "--empirical",
+    action="store_true",
+    help="Compute the statistics from the stored runtimes instead of the reference models.",
+)
+@clx.argument(
+    "--json", action="store_true", dest="as_json", help="Print the results as JSON."
+)
+def references(
+    root,
+    nodes,
+    machine,
+    python,
+    model,
+    min_samples,
+    max_samples,
+    max_age,
+    min_age,
+    empirical,
+    as_json,
+):
+    root = compute_root(root)
+    # Only the references (and the history, if needed) are loaded.
+    all_references = load_references(root)
+    usage = None
+    if max_age is not None or min_age is not None:
+        usage = mb_maintenance.last_used(
+            all_references,
+            Serializer().load_safe(store_paths(root)["history"])[0] or [],
+        )
+    records = mb_query.query_records(
+        sorted(
+            mb_query.filter_references(
+                all_references,
+                node_glob=nodes,
+                machine_prefix=machine,
+                python_prefix=python,
+                model_name=model,
+                min_samples=min_samples,
+                max_samples=max_samples,
+                usage=usage,
+                max_age=None if max_age is None else max_age * mb_maintenance.DAY,
+                min_age=None if min_age is None else min_age * mb_maintenance.DAY,
+            ),
+            key=lambda _ref: (
+                _ref.reference_id["test_node_id"],
+                _ref.reference_id.get("metric") or "",
+            ),
+        ),
+        usage=usage,
+        empirical=empirical,
+    )
+
+    if as_json:
+        # Non-finite statistics (e.g., the CV of a zero mean) are printed as null.
+        print(json.dumps(mb_export.to_builtin(records), indent=2, allow_nan=False))
+        return
+
+    table = Table(title=f"{len(records)} matching references")
+    for _header in [
+        "Test",
+        "Machine",
+        "Python",
+        "Model",
+        "n",
+        "Mean",
+        "CV",
+        "p99",
+        *(["Last used"] if usage is not None else []),
+    ]:
+        table.add_column(_header, justify="left" if _header == "Test" else "right")
+    for _record in records:
+        table.add_row(
+            escape(
+                _record["test_node_id"]
+                + (f" [{_record['metric']}]" if _record.get("metric") else "")
+            ),
+            _record["machine_config_id"][:8],
+            _record["python_config_id"][:8],
+            _record["model_name"],
+            str(_record["n"]),
+            pghm.secs(_record["mean"]),
+            f"{_record['cv']:.1%}",
+            pghm.secs(_record["p99"]),
+            *(
+                [
+                    (
+                        time.strftime("%Y-%m-%d", time.localtime(_record["last_used"]))
+                        if _record["last_used"] is not None
+                        else "unknown"
+                    )
+                ]
+                if usage is not None
+                else []
+            ),
+        )
+    CONSOLE.print(table)
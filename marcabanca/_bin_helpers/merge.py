@@ -0,0 +1,60 @@
+from .main import main, root_arg, compute_root
+from .prune import dry_run_arg
+import climax as clx
+import os
+import os.path as osp
+import shutil
+from pathlib import Path
+from pytest_marcabanca.utils import Manager
+from pytest_marcabanca import maintenance as mb_maintenance
+from rich.table import Table
+from rich.console import Console
+
+CONSOLE = Console()
+
+
+@main.command(
+    parents=[root_arg, dry_run_arg],
+    help="Merge the data stores of other roots (e.g., from several CI machines) into the root. Equivalent machine and python configs are unified, and references and history entries are remapped to the unified config ids.",
+)
+@clx.argument(
+    "sources",
+    type=Path,
+    nargs="+",
+    help="Marcabanca data root folders merged into the root, in order.",
+)
+@clx.argument(
+    "--policy",
+    choices=mb_maintenance.MERGE_POLICIES,
+    default="newest",
+    help="['newest'] How to resolve references of the same test and environment found in several roots: keep the most recently used one ('newest'), the one with most samples ('most-samples'), or the most recently used one while keeping the runtimes of the other as a history entry ('history').",
+)
+def merge(root, dry_run, sources, policy):
+    if root is not None:
+        os.makedirs(root, exist_ok=True)
+    root = compute_root(root)
+    mngr = Manager(root, add_this_env=False)
+
+    results = {
+        _source: mb_maintenance.merge_stores(
+            mngr, Manager(compute_root(_source), add_this_env=False), policy=policy
+        )
+        for _source in sources
+    }
+
+    if not dry_run:
+        mngr.write()
+        for _source_path, _target_path in (
+            _profile for _result in results.values() for _profile in _result.profiles
+        ):
+            os.makedirs(osp.dirname(_target_path), exist_ok=True)
+            shutil.copyfile(_source_path, _target_path)
+
+    table = Table(title="Would merge" if dry_run else "Merged")
+    table.add_column("Item")
+    [table.add_column(str(_source), justify="right") for _source in sources]
+    for _item in mb_maintenance.MERGE_COUNTS:
+        table.add_row(
+            _item, *(str(_result.counts[_item]) for _result in results.values())
+        )
+    CONSOLE.print(table)
@@ -0,0 +1,122 @@
+from .main import main, root_arg, compute_root
+import climax as clx
+import os
+import sys
+from jztools import humanize as pghm
+from pytest_marcabanca.utils import Manager
+from pytest_marcabanca import maintenance as mb_maintenance
+from rich.table import Table
+from rich.console import Console
+from logging import getLogger
+
+CONSOLE = Console()
+
+LOGGER = getLogger(__name__)
+
+
+@clx.parent()
+@clx.argument(
+    "--dry-run",
+    action="store_true",
+    help="Only print what would be removed, and the bytes and load time that would be saved.",
+)
+def dry_run_arg():
+    pass
+
+
+def read_node_ids(nodes, collect):
+    """
+    Reads the existing test node ids from a file (``'-'`` for stdin) with one node id per line, or from a pytest collection.
+    """
+    if nodes is not None:
+        with open(nodes, "rt") if nodes != "-" else sys.stdin as fo:
+            return {_line.strip() for _line in fo if _line.strip()}
+    if collect is not None:
+        try:
+            return mb_maintenance.collect_node_ids(collect)
+        except RuntimeError as err:
+            LOGGER.error(str(err))
+            exit(-1)
+    return None
+
+
+def run_prune(root, dry_run, **kwargs):
+    """
+    Prunes the data store (see :func:`~pytest_marcabanca.maintenance.plan_prune`), removes orphaned profiles and re-writes the store, which also folds in the journals of interrupted sessions and drops unused runtimes.
+    """
+    mngr = Manager(root, add_this_env=False)
+    size_before = mb_maintenance.store_size(root)
+    load_before = mb_maintenance.load_time(root)
+
+    plan = mb_maintenance.plan_prune(mngr, **kwargs)
+    mb_maintenance.apply_prune(mngr, plan)
+    orphans = mb_maintenance.orphaned_profiles(root, mngr.data["references"])
+    if dry_run:
+        size_after, load_after = mb_maintenance.measure_store(mngr, orphans)
+    else:
+        mngr.write()
+        for _path in orphans:
+            os.remove(_path)
+        size_after = mb_maintenance.store_size(root)
+        load_after = mb_maintenance.load_time(root)
+
+    table = Table(title="Would remove" if dry_run else "Removed")
+    table.add_column("Item")
+    table.add_column("Count", justify="right")
+    for _label, _count in {**plan.counts(), "profile files": len(orphans)}.items():
+        table.add_row(_label, str(_count))
+    CONSOLE.print(table)
+    CONSOLE.print(
+        f"Store size: {size_before:,} -> {size_after:,} bytes ({size_before - size_after:,} bytes saved). "
+        f"Load time: {pghm.secs(load_before)} -> {pghm.secs(load_after)}."
+    )
+
+
+@main.command(
+    parents=[root_arg, dry_run_arg],
+    help="Remove references of tests that no longer exist or that match the retention policies, and the configs, history entries and profiles no longer used by any reference. The store is then compacted (see 'compact').",
+)
+@clx.argument(
+    "--nodes",
+    help="File with the existing test node ids, one per line ('-' for stdin). References of other tests are removed.",
+)
+@clx.argument(
+    "--collect",
+    nargs="+",
+    metavar="PYTEST_ARG",
+    help="Run a pytest collection with these arguments (e.g., the test folder) to find the existing test node ids. References of other tests are removed.",
+)
+@clx.argument(
+    "--max-age",
+    type=float,
+    help="Remove references not used by any session in this many days, and older history entries. A reference is used by the sessions that create or evaluate it (for references stored by older versions, the latest history entry is used instead, and references without one are kept).",
+)
+@clx.argument(
+    "--keep-environments",
+    type=int,
+    help="Keep at most this many references per test (the most recently used ones, see --max-age).",
+)
+@clx.argument(
+    "--keep-history",
+    type=int,
+    help="Keep at most this many history entries per reference (the latest ones).",
+)
+def prune(root, dry_run, nodes, collect, max_age, keep_environments, keep_history):
+    root = compute_root(root)
+    run_prune(
+        root,
+        dry_run,
+        node_ids=read_node_ids(nodes, collect),
+        max_age=None if max_age is None else max_age * mb_maintenance.DAY,
+        keep_environments=keep_environments,
+        keep_history=keep_history,
+    )
+
+
+@main.command(
+    parents=[root_arg, dry_run_arg],
+    help="Compact the store: fold in the journals of interrupted sessions, drop runtimes no longer used by any reference, and remove the configs, history entries and profiles that belong to no reference.",
+)
+def compact(root, dry_run):
+    root = compute_root(root)
+    run_prune(root, dry_run)
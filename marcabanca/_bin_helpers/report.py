@@ -0,0 +1,51 @@
+from .main import main, root_arg, compute_root
+import climax as clx
+from pytest_marcabanca.utils import Manager
+from pytest_marcabanca import htmlreport
+from rich.console import Console
+
+CONSOLE = Console()
+
+
+@main.command(
+    parents=[root_arg],
+    help="Write a static HTML report of all the references (and their history) in the data store.",
+)
+@clx.argument(
+    "--output",
+    "-o",
+    default="marcabanca_report.html",
+    help="['marcabanca_report.html'] Output HTML file.",
+)
+def report(root, output):
+    root = compute_root(root)
+    mngr = Manager(root, add_this_env=False)
+    summaries = []
+    for _ref in mngr.data["references"]:
+        reference_id = _ref.reference_id
+        history = [
+            _entry
+            for _entry in mngr.get_history(
+                reference_id["test_node_id"],
+                same_machine=False,
+                metric=reference_id.get("metric"),
+            )
+            if _entry.reference_id["machine_config_id"]
+            == reference_id["machine_config_id"]
+        ]
+        summaries.append(
+            htmlreport.summarize_test(
+                reference_id["test_node_id"]
+                + (f" [{reference_id['metric']}]" if reference_id.get("metric") else "")
+                + f" (machine {reference_id['machine_config_id'][:8]}, python {reference_id['python_config_id'][:8]})",
+                _ref,
+                history=history,
+                stats=[
+                    ("Runs", str(_ref.num_samples)),
+                    ("Mean", f"{float(_ref.model.stats('m')):.3g}s"),
+                    ("History", str(len(history))),
+                ],
+            )
+        )
+    htmlreport.write_html(output, summaries, title=f"Marcabanca references: {root}")
+    CONSOLE.print(f"Wrote a report of {len(summaries)} references to '{output}'.")
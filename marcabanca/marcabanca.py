@@ -1,9 +1,18 @@
 import functools
 
 
-def benchmark(do_benchmark=True):
+def benchmark(do_benchmark=True, **options):
     """
     Decorator to mark a function for benchmarking or no benchmarking.
+
+    :param do_benchmark: Whether to benchmark the decorated test.
+    :param options: Per-test benchmarking options. Supported options are:
+
+      * ``quantile`` and ``quantile_thresh``: Override ``--mb-quantile`` and ``--mb-quantile-thresh``.
+      * ``work_units``: Units of work (e.g., items, bytes, rows) carried out by each call of the test, so that throughput is compared instead of raw runtimes. Can also be a callable receiving any of the test's fixture values as keyword arguments. (See also fixture ``mb_work_units``.)
+      * ``work_unit_name``: Name of the work units (defaults to 'items').
+      * ``concurrency`` and ``concurrency_kind``: Override ``--mb-concurrency`` (as a list of worker counts) and ``--mb-concurrency-kind``.
+      * ``cold_start``: Overrides ``--mb-cold-start``.
     """
 
     def wrap(fxn):
@@ -12,7 +21,7 @@ def benchmark(do_benchmark=True):
 
         # Hacky. Better solution is to return a callable object,
         # but pytest does not seem to bind those correctly.
-        marcabanca_wrapper._marcabanca = {"benchmark": do_benchmark}
+        marcabanca_wrapper._marcabanca = {"benchmark": do_benchmark, **options}
 
         return marcabanca_wrapper
 
@@ -0,0 +1,99 @@
+"""
+Planning of per-test run counts under a global benchmarking time budget.
+"""
+
+import numpy as np
+
+
+def sampling_priority(
+    runtimes,
+    last_entry=None,
+    rank_thresh=0.99,
+    rltv_thresh=1.5,
+    near=0.8,
+    cv_scale=0.1,
+    max_noise_priority=2.0,
+):
+    """
+    Returns the sampling priority (at least 1) of a test. Noisy tests, tests that regressed in their last recorded run and tests whose last recorded run was near the regression thresholds get a higher priority.
+
+    :param runtimes: The reference runtimes.
+    :param last_entry: The test's latest ``'test'`` :class:`~pytest_marcabanca.utils.HistoryEntry` (optional).
+    :param near: Fraction of the thresholds above which a run is considered near the thresholds.
+    :param cv_scale: Coefficient of variation of the reference runtimes that adds one to the priority.
+    :param max_noise_priority: Maximum priority increase due to noise.
+    """
+    runtimes = np.asarray(runtimes, dtype=float)
+    priority = 1.0 + min(
+        np.std(runtimes) / np.mean(runtimes) / cv_scale, max_noise_priority
+    )
+    if last_entry is not None:
+        rank = last_entry.rank if last_entry.rank is not None else 0.0
+        rltv = last_entry.rltv_runtime if last_entry.rltv_runtime is not None else 0.0
+        if rank > rank_thresh or rltv > rltv_thresh:
+            priority += 2.0
+        elif rank > near * rank_thresh or rltv > near * rltv_thresh:
+            priority += 1.0
+    return float(priority)
+
+
+def allocate_runs(costs, priorities, requested, budget, min_runs=2, max_runs=200):
+    """
+    Allocates test runs under a time budget. Each test first gets ``min_runs`` runs (or fewer if it requested fewer). The remaining budget is then shared between tests in proportion to their priorities, and each test can get up to its requested number of runs scaled by its priority.
+
+    :param costs: Dictionary mapping test ids to the estimated runtime of a single run.
+    :param priorities: Dictionary mapping test ids to priorities (see :func:`sampling_priority`).
+    :param requested: Dictionary mapping test ids to the number of runs requested without a budget.
+    :param budget: The time budget (in seconds), including a warmup run for each test.
+    :param max_runs: Upper bound on the number of runs of any test.
+    :return: Dictionary mapping test ids to the allocated number of runs.
+    """
+    targets = {
+        _id: int(min(max_runs, np.ceil(requested[_id] * priorities[_id])))
+        for _id in costs
+    }
+    runs = {_id: min(min_runs, targets[_id]) for _id in costs}
+    remaining = budget - sum(costs[_id] * (1 + runs[_id]) for _id in costs)
+
+    # Water filling: share the remaining time by priority among unsaturated tests.
+    while remaining > 0 and (
+        active := [_id for _id in costs if runs[_id] < targets[_id]]
+    ):
+        total_priority = sum(priorities[_id] for _id in active)
+        available = remaining
+        added = 0
+        for _id in active:
+            share = available * priorities[_id] / total_priority
+            extra = min(int(share // max(costs[_id], 1e-9)), targets[_id] - runs[_id])
+            runs[_id] += extra
+            added += extra
+            remaining -= extra * costs[_id]
+        if not added:
+            # Shares are below the cost of a run: favor the highest-priority affordable test.
+            affordable = [_id for _id in active if costs[_id] <= remaining]
+            if not affordable:
+                break
+            _id = max(affordable, key=lambda _id: priorities[_id])
+            runs[_id] += 1
+            remaining -= costs[_id]
+    return runs
+
+
+def scaling_cost(cost, ladder, num_calls, curve=None):
+    """
+    Estimates the time taken to measure a scaling curve (see :func:`~pytest_marcabanca.concurrency.measure_scaling`).
+
+    :param cost: The estimated runtime of a single call.
+    :param ladder: The numbers of concurrent workers.
+    :param num_calls: The number of calls of each worker.
+    :param curve: A previously measured scaling curve. The time of each number of workers in the curve is derived from its throughput. Other numbers of workers are assumed not to scale, i.e., their calls are assumed to run one at a time.
+    """
+    throughputs = {_point["workers"]: _point["throughput"] for _point in curve or []}
+    return float(
+        sum(
+            _workers
+            * num_calls
+            * (1.0 / throughputs[_workers] if throughputs.get(_workers) else cost)
+            for _workers in ladder
+        )
+    )
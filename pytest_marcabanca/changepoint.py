@@ -0,0 +1,140 @@
+"""
+Change-point detection over per-test runtime histories.
+
+Runtime series are analyzed in log space, so that level shifts are expressed as relative (multiplicative) changes.
+"""
+
+import numpy as np
+from collections import namedtuple
+
+LevelShift = namedtuple("LevelShift", ("index", "ratio", "method"))
+"""
+A detected level shift. ``index`` is the position of the first value at the new level, ``ratio`` is the ratio of the new level to the initial level, and ``method`` is the detector that flagged the shift ('pelt' or 'cusum').
+"""
+
+
+def robust_sigma(values, min_sigma=0.0):
+    """
+    Estimates the noise standard deviation from the median absolute deviation of first differences. Differencing makes the estimate insensitive to level shifts.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) < 3:
+        return min_sigma
+    diffs = np.diff(values)
+    sigma = np.median(np.abs(diffs - np.median(diffs))) / (0.6745 * np.sqrt(2))
+    return max(sigma, min_sigma)
+
+
+def pelt(values, sigma, penalty=None, min_size=2):
+    """
+    Pruned Exact Linear Time (PELT) search for changes in the mean of a gaussian series with known standard deviation.
+
+    :param values: The series.
+    :param sigma: The noise standard deviation.
+    :param penalty: Cost of adding a change point (defaults to the BIC value :math:`2 \\log n`).
+    :param min_size: Minimum number of values in each segment.
+    :return: Sorted list of change-point indices (the first index of each new segment).
+    """
+
+    values = np.asarray(values, dtype=float) / sigma
+    num = len(values)
+    if num < 2 * min_size:
+        return []
+    penalty = 2 * np.log(num) if penalty is None else penalty
+
+    cumsum = np.concatenate([[0.0], np.cumsum(values)])
+    cumsum_sq = np.concatenate([[0.0], np.cumsum(values**2)])
+
+    def cost(start, end):
+        # Squared deviation from the mean of values[start:end].
+        return (cumsum_sq[end] - cumsum_sq[start]) - (
+            cumsum[end] - cumsum[start]
+        ) ** 2 / (end - start)
+
+    best = np.full(num + 1, np.inf)
+    best[0] = -penalty
+    last_change = np.zeros(num + 1, dtype=int)
+    candidates = [0]
+    for end in range(min_size, num + 1):
+        valid = [_s for _s in candidates if end - _s >= min_size]
+        if valid:
+            costs = [best[_s] + cost(_s, end) + penalty for _s in valid]
+            k = int(np.argmin(costs))
+            best[end] = costs[k]
+            last_change[end] = valid[k]
+            # Prune candidates that can never be optimal again.
+            candidates = [
+                _s for _s, _c in zip(valid, costs) if _c - penalty <= best[end]
+            ] + [_s for _s in candidates if end - _s < min_size]
+        candidates.append(end - min_size + 1)
+
+    # Backtrack.
+    out = []
+    end = num
+    while (start := int(last_change[end])) > 0:
+        out.append(start)
+        end = start
+    return sorted(out)
+
+
+def cusum(values, sigma, baseline_size=None, slack=0.5, threshold=5.0):
+    """
+    One-sided (upward) CUSUM detector on standardized deviations from the mean of the first ``baseline_size`` values. Flags slow drifts that are individually too small for segment-based detection.
+
+    :return: ``(alarm_index, onset_index)`` or ``None`` if no alarm is raised.
+    """
+    values = np.asarray(values, dtype=float)
+    baseline_size = baseline_size or max(2, len(values) // 4)
+    if len(values) <= baseline_size:
+        return None
+    z_values = (values - np.mean(values[:baseline_size])) / sigma
+
+    stat = 0.0
+    onset = 0
+    for k, z in enumerate(z_values):
+        if stat == 0.0:
+            onset = k
+        stat = max(0.0, stat + z - slack)
+        if stat > threshold:
+            return k, onset
+    return None
+
+
+def find_level_shift(runtimes, min_shift=0.05, min_sigma=0.01, min_size=2):
+    """
+    Searches a runtime history for an upward level shift of at least ``min_shift`` relative to the initial level.
+
+    :param runtimes: Positive runtime summaries (e.g., per-run means) in chronological order.
+    :param min_shift: Minimum relative increase (e.g., 0.05 for 5%) to report.
+    :param min_sigma: Floor on the estimated log-space noise level.
+    :return: A :class:`LevelShift` or ``None``.
+    """
+    log_runtimes = np.log(np.asarray(runtimes, dtype=float))
+    if len(log_runtimes) < 2 * min_size:
+        return None
+    sigma = robust_sigma(log_runtimes, min_sigma)
+
+    # Abrupt shifts.
+    if change_points := pelt(log_runtimes, sigma, min_size=min_size):
+        bounds = [0] + change_points + [len(log_runtimes)]
+        levels = [
+            np.mean(log_runtimes[_start:_end])
+            for _start, _end in zip(bounds[:-1], bounds[1:])
+        ]
+        # Report the first change point past which the level stays above the threshold.
+        for k in range(1, len(levels)):
+            if min(levels[k:]) - levels[0] >= np.log1p(min_shift):
+                return LevelShift(
+                    bounds[k], float(np.exp(levels[-1] - levels[0])), "pelt"
+                )
+
+    # Gradual drift.
+    if alarm := cusum(log_runtimes, sigma, baseline_size=min_size):
+        _, onset = alarm
+        ratio = float(
+            np.exp(np.mean(log_runtimes[-min_size:]) - np.mean(log_runtimes[:min_size]))
+        )
+        if ratio >= 1 + min_shift:
+            return LevelShift(onset, ratio, "cusum")
+
+    return None
@@ -0,0 +1,128 @@
+"""
+Cold-start measurements: the cost of importing a test module and calling the test for the first time in a fresh interpreter.
+"""
+
+import json
+import os
+import re
+import subprocess as subp
+import sys
+import unittest
+
+METRIC = "cold_start"
+"""
+The reference metric name used for cold-start references.
+"""
+
+_SCRIPT = """
+import time, json, importlib
+_start = time.perf_counter()
+_module = importlib.import_module({module!r})
+_imported = time.perf_counter()
+_cls = getattr(_module, {cls!r}) if {cls!r} else None
+if _cls is None:
+    getattr(_module, {name!r})()
+elif {is_unittest!r}:
+    _cls({name!r}).debug()
+else:
+    getattr(_cls(), {name!r})()
+_called = time.perf_counter()
+print(json.dumps({{"import": _imported - _start, "first_call": _called - _imported}}))
+"""
+
+_IMPORTTIME_LINE = re.compile(
+    r"^import time:\s+(?P<self>\d+)\s+\|\s+(?P<cumulative>\d+)\s+\|(?P<module>.*)$"
+)
+
+
+class ColdStartUnsupported(Exception):
+    pass
+
+
+class ColdStartFailed(Exception):
+    pass
+
+
+def build_script(item):
+    """
+    Returns a python script that imports the module of a pytest item and calls the test once, printing the import and first-call times as JSON.
+
+    :raises ColdStartUnsupported: For tests that require fixtures or parameters.
+    """
+    if getattr(item, "callspec", None) is not None:
+        raise ColdStartUnsupported("Parametrized tests are not supported.")
+    is_unittest = item.cls is not None and issubclass(item.cls, unittest.TestCase)
+    if not is_unittest and [
+        _name for _name in getattr(item, "fixturenames", []) if _name != "request"
+    ]:
+        raise ColdStartUnsupported("Tests with fixtures are not supported.")
+    return _SCRIPT.format(
+        module=item.module.__name__,
+        cls=item.cls.__name__ if item.cls is not None else None,
+        name=item.originalname if hasattr(item, "originalname") else item.name,
+        is_unittest=is_unittest,
+    )
+
+
+def _run(script, cwd, extra_args=()):
+    """
+    :raises ColdStartFailed: If the fresh interpreter exits with an error (e.g., the test fails when called outside of pytest).
+    """
+    env = dict(os.environ)
+    # Make the fresh interpreter see the same modules as this one (pytest alters sys.path).
+    env["PYTHONPATH"] = os.pathsep.join(
+        _path for _path in sys.path if _path and os.path.isdir(_path)
+    )
+    try:
+        return subp.run(
+            [sys.executable, *extra_args, "-c", script],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except subp.CalledProcessError as err:
+        # The last line of the traceback names the error.
+        lines = err.stderr.strip().splitlines()
+        raise ColdStartFailed(
+            lines[-1] if lines else f"Exit status {err.returncode}."
+        ) from err
+
+
+def measure_cold_start(script, cwd=None):
+    """
+    Runs the script from :func:`build_script` in a fresh interpreter.
+
+    :return: A dictionary with the module ``'import'`` and ``'first_call'`` times (sec).
+    :raises ColdStartFailed: See :func:`_run`.
+    """
+    return json.loads(_run(script, cwd).stdout.strip().splitlines()[-1])
+
+
+def measure_importtime(script, cwd=None, top=20):
+    """
+    Runs the script from :func:`build_script` in a fresh interpreter with ``-X importtime``.
+
+    :param top: Number of entries to return.
+    :return: A dictionary mapping the ``top`` modules with the highest cumulative import time to that time (sec).
+    :raises ColdStartFailed: See :func:`_run`.
+    """
+    entries = []
+    for _line in _run(script, cwd, ["-X", "importtime"]).stderr.splitlines():
+        if match := _IMPORTTIME_LINE.match(_line):
+            entries.append((match["module"].strip(), int(match["cumulative"]) * 1e-6))
+    return dict(sorted(entries, key=lambda _x: _x[1], reverse=True)[:top])
+
+
+def diff_importtime(importtime, ref_importtime, top=5):
+    """
+    Returns the ``top`` ``(module, increase)`` pairs with the largest increase in cumulative import time relative to the reference. Modules absent from the reference are compared to zero.
+    """
+    diffs = [
+        (_module, _time - ref_importtime.get(_module, 0.0))
+        for _module, _time in importtime.items()
+    ]
+    return sorted(
+        [_x for _x in diffs if _x[1] > 0], key=lambda _x: _x[1], reverse=True
+    )[:top]
@@ -0,0 +1,167 @@
+"""
+Concurrent-load measurements of a test body in multiple threads or processes.
+"""
+
+import multiprocessing as mp
+import queue as queue_module
+import threading
+import time
+import numpy as np
+
+KINDS = ("thread", "process")
+
+START_TIMEOUT = 60.0
+"""
+Time (in seconds) that forked workers are given to start.
+"""
+
+POLL_INTERVAL = 0.5
+"""
+Interval (in seconds) at which the liveness of forked workers is checked while waiting for their results.
+"""
+
+
+def _timed_calls(fxn, num_calls):
+    latencies = []
+    for _ in range(num_calls):
+        start = time.perf_counter()
+        fxn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _run_threads(fxn, num_workers, num_calls):
+    barrier = threading.Barrier(num_workers + 1)
+    latencies = [None] * num_workers
+    errors = []
+
+    def worker(k):
+        barrier.wait()
+        try:
+            latencies[k] = _timed_calls(fxn, num_calls)
+        except BaseException as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(num_workers)]
+    [_thread.start() for _thread in threads]
+    barrier.wait()
+    start = time.perf_counter()
+    [_thread.join() for _thread in threads]
+    wall = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return wall, latencies
+
+
+def _run_processes(fxn, num_workers, num_calls):
+    """
+    Workers are forked, as they must inherit the test body and its fixtures, which need not be picklable (as required by the ``spawn`` and ``forkserver`` start methods). A forked worker only inherits the calling thread, and can deadlock on locks held by other threads at the time of the fork. Callers should thus stop their own background threads (e.g., the :class:`~pytest_marcabanca.noise.NoiseMonitor`) before calling this function.
+
+    Workers that crash or are killed (e.g., by the OOM killer) are detected while waiting for their results, and raise a :class:`RuntimeError`.
+    """
+    ctx = mp.get_context("fork")
+    barrier = ctx.Barrier(num_workers + 1)
+    queue = ctx.Queue()
+
+    def worker(k):
+        barrier.wait()
+        try:
+            queue.put((k, _timed_calls(fxn, num_calls)))
+        except BaseException as err:
+            queue.put((k, repr(err)))
+
+    processes = [ctx.Process(target=worker, args=(k,)) for k in range(num_workers)]
+    [_process.start() for _process in processes]
+    try:
+        try:
+            barrier.wait(START_TIMEOUT)
+        except threading.BrokenBarrierError:
+            raise RuntimeError("Concurrent benchmark workers failed to start.")
+        start = time.perf_counter()
+        results, exited = {}, set()
+        while len(results) < num_workers:
+            try:
+                k, result = queue.get(timeout=POLL_INTERVAL)
+                results[k] = result
+            except queue_module.Empty:
+                # Workers that had exited without a result at the previous poll died.
+                if dead := exited - set(results):
+                    k = min(dead)
+                    raise RuntimeError(
+                        f"Concurrent benchmark worker exited with code {processes[k].exitcode} without a result."
+                    )
+                exited = {
+                    k
+                    for k, _process in enumerate(processes)
+                    if _process.exitcode is not None
+                }
+        wall = time.perf_counter() - start
+    finally:
+        for _process in processes:
+            if _process.is_alive():
+                _process.terminate()
+            _process.join()
+    latencies = list(results.values())
+    if errors := [_x for _x in latencies if isinstance(_x, str)]:
+        raise RuntimeError(f"Concurrent benchmark worker failed: {errors[0]}")
+    return wall, latencies
+
+
+def measure_concurrency(fxn, num_workers, num_calls=5, kind="thread"):
+    """
+    Calls ``fxn`` ``num_calls`` times in each of ``num_workers`` concurrent threads or processes.
+
+    :param fxn: The callable to benchmark.
+    :param num_workers: Number of concurrent workers.
+    :param num_calls: Number of calls carried out by each worker.
+    :param kind: One of ``'thread'`` or ``'process'``. Processes are started with ``fork`` (see :func:`_run_processes`).
+    :return: A dictionary with the number of workers, the aggregate throughput (calls/sec) and the mean per-call latency (sec).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Invalid kind {kind}. Expected one of {KINDS}.")
+    wall, latencies = (_run_threads if kind == "thread" else _run_processes)(
+        fxn, num_workers, num_calls
+    )
+    return {
+        "workers": num_workers,
+        "throughput": num_workers * num_calls / wall,
+        "latency": float(np.mean(latencies)),
+    }
+
+
+def measure_scaling(fxn, ladder, num_calls=5, kind="thread"):
+    """
+    Measures a scaling curve, calling :func:`measure_concurrency` for each number of workers in the ladder.
+
+    :return: A list of :func:`measure_concurrency` outputs sorted by number of workers.
+    """
+    return [
+        measure_concurrency(fxn, _num_workers, num_calls, kind)
+        for _num_workers in sorted(ladder)
+    ]
+
+
+def scaling_efficiency(curve):
+    """
+    Returns a dictionary mapping each number of workers in a scaling curve to the scaling efficiency, the ratio of the throughput to the ideal (linear) throughput extrapolated from the smallest number of workers.
+    """
+    base = curve[0]
+    per_worker = base["throughput"] / base["workers"]
+    return {
+        _point["workers"]: _point["throughput"] / (_point["workers"] * per_worker)
+        for _point in curve
+    }
+
+
+def efficiency_ratio(curve, ref_curve):
+    """
+    Returns the smallest ratio of the scaling efficiency of ``curve`` to that of ``ref_curve`` over the numbers of workers in both curves, or ``None`` if they have no worker counts in common beyond the smallest one.
+    """
+    efficiency = scaling_efficiency(curve)
+    ref_efficiency = scaling_efficiency(ref_curve)
+    ratios = [
+        efficiency[_workers] / ref_efficiency[_workers]
+        for _workers in set(efficiency).intersection(ref_efficiency)
+        if _workers != curve[0]["workers"]
+    ]
+    return min(ratios) if ratios else None
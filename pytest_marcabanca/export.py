@@ -0,0 +1,147 @@
+"""
+Machine-readable export of benchmark results: JSON Lines and CSV files streamed as results are produced, and JUnit XML properties.
+"""
+
+import csv
+import json
+import math
+import numpy as np
+
+_SCALAR_FIELDS = [
+    "test_node_id",
+    "metric",
+    "reference_tier",
+    "machine_similarity",
+    "exact",
+    "carried_forward",
+    "rank",
+    "runtime",
+    "rltv_runtime",
+    "model_mean",
+    "empirical_mean",
+    "p_value",
+    "q_value",
+    "effect_size",
+    "quantile",
+    "quantile_thresh",
+    "test_quantile",
+    "ref_quantile",
+    "ref_empirical_quantile",
+    "work_units",
+    "throughput",
+    "ref_throughput",
+    "scaling_ratio",
+    "noisy_samples",
+]
+"""
+The :class:`~pytest_marcabanca.pytest_marcabanca.Result` fields exported as is.
+"""
+
+PROPERTY_FIELDS = ["regressed", "rank", "rltv_runtime", "runtime", "p_value"]
+"""
+The record fields attached to JUnit XML test cases as properties (see :func:`junit_properties`).
+"""
+
+
+def to_builtin(value):
+    """
+    Recursively converts numpy scalars and arrays (and tuples) to the equivalent python built-in types. Non-finite floats (which JSON cannot represent) are converted to ``None``.
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    elif isinstance(value, (list, tuple, np.ndarray)):
+        return [to_builtin(_x) for _x in value]
+    elif isinstance(value, dict):
+        return {_key: to_builtin(_x) for _key, _x in value.items()}
+    return value
+
+
+def result_record(result, regressed, thresholds, quantiles=True):
+    """
+    Builds a flat dictionary of built-in types describing a result.
+
+    Two-sample comparisons are only final once the session's q-values are computed. Records without a q-value are then marked as not ``final``, as their ``regressed`` field is provisional (see :meth:`~pytest_marcabanca.pytest_marcabanca.PytestMarcabanca.is_regressed`).
+
+    :param result: A :class:`~pytest_marcabanca.pytest_marcabanca.Result`.
+    :param regressed: Whether the result exceeds the thresholds.
+    :param thresholds: Dictionary of the thresholds that the result was compared against (e.g., ``{'rank_thresh': 0.99}``).
+    :param quantiles: Whether to include the reference's quantile summary (see :meth:`~pytest_marcabanca.utils.ReferenceModel.quantile_summary`), which reads the reference's runtimes. Otherwise, ``ref_quantiles`` is ``None``.
+    """
+    return to_builtin(
+        {
+            **{_field: getattr(result, _field) for _field in _SCALAR_FIELDS},
+            "reference_id": (
+                result.ref_model.reference_id if result.ref_model is not None else None
+            ),
+            **thresholds,
+            "regressed": bool(regressed),
+            "final": result.p_value is None or result.q_value is not None,
+            "test_runtimes": result.test_runtimes,
+            "ref_quantiles": (
+                result.ref_model.quantile_summary()
+                if quantiles and result.ref_model is not None
+                else None
+            ),
+            "scaling": result.scaling,
+            "importtime_diff": result.importtime_diff,
+        }
+    )
+
+
+def junit_properties(record):
+    """
+    Returns the ``(name, value)`` JUnit XML properties (see :attr:`pytest.Item.user_properties`) of a result record. Names are prefixed by ``marcabanca_`` and suffixed by the metric, if any. Fields without a value are omitted.
+    """
+    suffix = f"_{record['metric']}" if record["metric"] else ""
+    return [
+        (f"marcabanca_{_field}{suffix}", record[_field])
+        for _field in PROPERTY_FIELDS
+        if record[_field] is not None
+    ]
+
+
+class JsonLinesWriter:
+    """
+    Writes each record as a JSON object in its own line, flushing after each record.
+    """
+
+    def __init__(self, path):
+        self.fo = open(path, "wt")
+
+    def write(self, record):
+        self.fo.write(json.dumps(record, allow_nan=False) + "\n")
+        self.fo.flush()
+
+    def close(self):
+        self.fo.close()
+
+
+class CsvWriter:
+    """
+    Writes each record as a CSV row, flushing after each record. The header is taken from the first record, and list and dictionary values are JSON-encoded.
+    """
+
+    def __init__(self, path):
+        self.fo = open(path, "wt", newline="")
+        self.writer = None
+
+    def write(self, record):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.fo, fieldnames=list(record))
+            self.writer.writeheader()
+        self.writer.writerow(
+            {
+                _key: (
+                    json.dumps(_x, allow_nan=False)
+                    if isinstance(_x, (list, dict))
+                    else _x
+                )
+                for _key, _x in record.items()
+            }
+        )
+        self.fo.flush()
+
+    def close(self):
+        self.fo.close()
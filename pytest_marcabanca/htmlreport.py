@@ -0,0 +1,253 @@
+"""
+Self-contained static HTML benchmark reports with inline SVG plots. Plotted data is aggregated before rendering (histograms, quantiles and bucket means), so that the report size does not grow with the number of stored runtimes.
+"""
+
+from html import escape
+import numpy as np
+
+NUM_BINS = 30
+"""
+Number of bins of the reference runtime histograms.
+"""
+
+NUM_PDF_POINTS = 60
+"""
+Number of points where the reference model pdf is evaluated.
+"""
+
+MAX_SAMPLE_MARKS = 50
+"""
+Maximum number of test runtime marks per test. Larger test samples are represented by their quantiles.
+"""
+
+MAX_TREND_POINTS = 100
+"""
+Maximum number of points in history trends. Longer histories are averaged in buckets of consecutive entries.
+"""
+
+_WIDTH, _HEIGHT, _MARGIN = 420, 150, 24
+
+_STYLE = """
+body { font-family: sans-serif; margin: 2em; color: #222; }
+table { border-collapse: collapse; }
+td, th { padding: 2px 8px; text-align: right; }
+td:first-child, th:first-child { text-align: left; }
+.regressed { color: #c0392b; }
+.ok { color: #27ae60; }
+section { border-top: 1px solid #ccc; margin-top: 1.5em; }
+svg { margin-right: 1em; background: #fafafa; }
+.plots { display: flex; flex-wrap: wrap; }
+"""
+
+
+def downsample(values, max_points):
+    """
+    Returns the values, or the means of up to ``max_points`` buckets of consecutive values.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) <= max_points:
+        return values
+    return np.array([_x.mean() for _x in np.array_split(values, max_points)])
+
+
+def summarize_test(
+    label,
+    ref_model,
+    test_runtimes=None,
+    history=(),
+    regressed=None,
+    stats=None,
+    profile=None,
+):
+    """
+    Aggregates the plotted data of a test.
+
+    :param label: The test label.
+    :param ref_model: The test's :class:`~pytest_marcabanca.utils.ReferenceModel`.
+    :param test_runtimes: The runtimes of the current run, if any.
+    :param history: The test's chronologically-sorted :class:`~pytest_marcabanca.utils.HistoryEntry` list.
+    :param regressed: Whether the current run regressed (``None`` if there is no current run).
+    :param stats: Optional list of ``(name, formatted value)`` tuples displayed for the test.
+    :param profile: Optional profile of a regressed run, as a dictionary with the paths (or URLs) of its ``'pstats'`` and ``'collapsed'`` files and its ``'diff'`` of top functions (see :func:`~pytest_marcabanca.profiles.diff_top_functions`, ``None`` if the reference has no profile).
+    :return: A dictionary of built-in types.
+    """
+    runtimes = np.asarray(ref_model.runtimes, dtype=float)
+    test_runtimes = np.asarray(
+        test_runtimes if test_runtimes is not None else [], dtype=float
+    )
+    # Degenerate models (e.g., fitted to constant runtimes) have non-finite quantiles.
+    bounds = np.concatenate(
+        [ref_model.quantiles([0.001, 0.999]), runtimes, test_runtimes]
+    )
+    bounds = bounds[np.isfinite(bounds)]
+    lo, hi = (bounds.min(), bounds.max()) if len(bounds) else (0.0, 0.0)
+    num_bins = NUM_BINS
+    if hi <= lo:
+        # A single bin around the constant runtime.
+        pad = 0.05 * abs(lo) or 1.0
+        lo, hi, num_bins = lo - pad, hi + pad, 1
+    counts, edges = np.histogram(
+        runtimes[np.isfinite(runtimes)], bins=num_bins, range=(lo, hi), density=True
+    )
+    pdf_x = np.linspace(lo, hi, NUM_PDF_POINTS)
+    if len(test_runtimes) > MAX_SAMPLE_MARKS:
+        test_runtimes = np.quantile(test_runtimes, np.linspace(0, 1, MAX_SAMPLE_MARKS))
+    return {
+        "label": label,
+        "regressed": regressed,
+        "stats": list(stats or []),
+        "profile": (
+            {
+                **profile,
+                "diff": profile["diff"] and [list(_x) for _x in profile["diff"]],
+            }
+            if profile
+            else None
+        ),
+        "num_ref_runtimes": len(runtimes),
+        "edges": edges.tolist(),
+        "counts": counts.tolist(),
+        "pdf_x": pdf_x.tolist(),
+        "pdf_y": np.nan_to_num(ref_model.model.pdf(pdf_x)).tolist(),
+        "test_runtimes": test_runtimes.tolist(),
+        "num_history": len(history),
+        "trend": downsample([_entry.mean for _entry in history], MAX_TREND_POINTS)
+        .astype(float)
+        .tolist(),
+    }
+
+
+def _scale(values, lo, hi, out_lo, out_hi):
+    span = (hi - lo) or 1.0
+    return [out_lo + (_x - lo) / span * (out_hi - out_lo) for _x in values]
+
+
+def svg_distribution(summary):
+    """
+    Renders the reference runtime histogram, the reference model pdf and the current run's runtimes (red marks) of a test summary.
+    """
+    edges, counts = summary["edges"], summary["counts"]
+    x_lo, x_hi = edges[0], edges[-1]
+    y_hi = max(counts + summary["pdf_y"]) or 1.0
+    bottom = _HEIGHT - _MARGIN
+
+    def x(values):
+        return _scale(values, x_lo, x_hi, _MARGIN, _WIDTH - _MARGIN)
+
+    def y(values):
+        return _scale(values, 0.0, y_hi, bottom, _MARGIN)
+
+    bars = "".join(
+        f'<rect x="{_x0:.1f}" y="{_y:.1f}" width="{max(_x1 - _x0 - 1, 1):.1f}" height="{bottom - _y:.1f}" fill="#a6c8e6"/>'
+        for _x0, _x1, _y, _count in zip(x(edges[:-1]), x(edges[1:]), y(counts), counts)
+        if _count
+    )
+    pdf = " ".join(
+        f"{_x:.1f},{_y:.1f}" for _x, _y in zip(x(summary["pdf_x"]), y(summary["pdf_y"]))
+    )
+    marks = "".join(
+        f'<line x1="{_x:.1f}" y1="{bottom}" x2="{_x:.1f}" y2="{bottom + 8}" stroke="#c0392b"/>'
+        for _x in x(summary["test_runtimes"])
+    )
+    return (
+        f'<svg width="{_WIDTH}" height="{_HEIGHT}" xmlns="http://www.w3.org/2000/svg">'
+        f"<title>Reference runtimes ({summary['num_ref_runtimes']}) and model pdf</title>"
+        f"{bars}"
+        f'<polyline points="{pdf}" fill="none" stroke="#1f4e79" stroke-width="1.5"/>'
+        f"{marks}"
+        f'<text x="{_MARGIN}" y="{_HEIGHT - 2}" font-size="10">{escape(_secs(x_lo))}</text>'
+        f'<text x="{_WIDTH - _MARGIN}" y="{_HEIGHT - 2}" font-size="10" text-anchor="end">{escape(_secs(x_hi))}</text>'
+        "</svg>"
+    )
+
+
+def svg_trend(summary):
+    """
+    Renders the trend of the mean runtimes stored in the history of a test summary, or returns an empty string if the history has fewer than two entries.
+    """
+    trend = summary["trend"]
+    if len(trend) < 2:
+        return ""
+    y_lo, y_hi = min(trend), max(trend)
+    xs = _scale(range(len(trend)), 0, len(trend) - 1, _MARGIN, _WIDTH - _MARGIN)
+    ys = _scale(trend, y_lo, y_hi, _HEIGHT - _MARGIN, _MARGIN)
+    points = " ".join(f"{_x:.1f},{_y:.1f}" for _x, _y in zip(xs, ys))
+    return (
+        f'<svg width="{_WIDTH}" height="{_HEIGHT}" xmlns="http://www.w3.org/2000/svg">'
+        f"<title>Mean runtime over {summary['num_history']} history entries</title>"
+        f'<polyline points="{points}" fill="none" stroke="#1f4e79" stroke-width="1.5"/>'
+        f'<text x="2" y="{_MARGIN - 6}" font-size="10">{escape(_secs(y_hi))}</text>'
+        f'<text x="2" y="{_HEIGHT - 6}" font-size="10">{escape(_secs(y_lo))}</text>'
+        "</svg>"
+    )
+
+
+def html_profile(summary):
+    """
+    Renders links to the profile files of a test summary and the functions whose self time per run increased the most, or returns an empty string if the test was not profiled.
+    """
+    if not (profile := summary["profile"]):
+        return ""
+    diff = (
+        "<table><tr><th>Function</th><th>Reference</th><th>Test</th></tr>"
+        + "".join(
+            f"<tr><td>{escape(_function)}</td><td>{escape(_secs(_ref_time))}</td><td>{escape(_secs(_test_time))}</td></tr>"
+            for _function, _ref_time, _test_time in profile["diff"]
+        )
+        + "</table>"
+        if profile["diff"]
+        else ""
+    )
+    return (
+        f'<p>Profile: <a href="{escape(profile["pstats"])}">pstats</a>, '
+        f'<a href="{escape(profile["collapsed"])}">collapsed stacks</a></p>{diff}'
+    )
+
+
+def _secs(value):
+    return f"{value:.3g}s"
+
+
+def _status(summary):
+    if summary["regressed"] is None:
+        return ""
+    elif summary["regressed"]:
+        return '<span class="regressed">regressed</span>'
+    return '<span class="ok">ok</span>'
+
+
+def render_html(summaries, title="Marcabanca benchmark report"):
+    """
+    Renders a self-contained HTML report with an overview table and a section per test summary (see :func:`summarize_test`). Regressed tests are listed first. Sections of profiled tests link to the profile files (see :func:`html_profile`).
+    """
+    summaries = sorted(summaries, key=lambda _summary: not _summary["regressed"])
+    overview = "".join(
+        f'<tr><td><a href="#test-{_k}">{escape(_summary["label"])}</a></td><td>{_status(_summary)}</td>'
+        + "".join(f"<td>{escape(_value)}</td>" for _, _value in _summary["stats"])
+        + "</tr>"
+        for _k, _summary in enumerate(summaries)
+    )
+    headers = "".join(
+        f"<th>{escape(_name)}</th>"
+        for _name, _ in (summaries[0]["stats"] if summaries else [])
+    )
+    sections = "".join(
+        f'<section id="test-{_k}"><h3>{escape(_summary["label"])} {_status(_summary)}</h3>'
+        f'<div class="plots">{svg_distribution(_summary)}{svg_trend(_summary)}</div>'
+        f"{html_profile(_summary)}</section>"
+        for _k, _summary in enumerate(summaries)
+    )
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{escape(title)}</title>'
+        f"<style>{_STYLE}</style></head><body><h1>{escape(title)}</h1>"
+        f"<table><tr><th>Test</th><th>Status</th>{headers}</tr>{overview}</table>"
+        f"{sections}</body></html>"
+    )
+
+
+def write_html(path, summaries, title="Marcabanca benchmark report"):
+    """
+    Writes the report rendered by :func:`render_html` to the specified path.
+    """
+    with open(path, "wt") as fo:
+        fo.write(render_html(summaries, title))
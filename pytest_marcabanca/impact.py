@@ -0,0 +1,79 @@
+"""
+Change-impact analysis: the source files executed by a test and their content hashes.
+"""
+
+import hashlib
+import os
+import os.path as osp
+import sys
+
+
+def trace_files(fxn, root):
+    """
+    Calls ``fxn`` with a :func:`sys.settrace` tracer that records the source files of all the functions called.
+
+    :param root: Only files within this directory (and outside of installed packages) are recorded.
+    :return: Sorted list of the recorded file paths, relative to ``root``.
+    """
+    root = osp.abspath(root)
+    filenames = set()
+
+    def tracer(frame, event, arg):
+        filenames.add(frame.f_code.co_filename)
+        # Function calls are all that is needed: do not trace lines.
+        return None
+
+    prev_tracer = sys.gettrace()
+    sys.settrace(tracer)
+    try:
+        fxn()
+    finally:
+        sys.settrace(prev_tracer)
+
+    out = set()
+    for _filename in filenames:
+        path = osp.abspath(_filename)
+        if (
+            osp.isfile(path)
+            and osp.commonpath([root, path]) == root
+            and "site-packages" not in path.split(os.sep)
+        ):
+            out.add(osp.relpath(path, root).replace(os.sep, "/"))
+    return sorted(out)
+
+
+def hash_file(path):
+    """
+    Returns the SHA-256 hex digest of the file's contents, or ``None`` if the file does not exist.
+    """
+    try:
+        with open(path, "rb") as fo:
+            return hashlib.sha256(fo.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def hash_files(relpaths, root):
+    """
+    Returns a dictionary mapping each path (relative to ``root``) to its :func:`hash_file` digest.
+    """
+    return {_relpath: hash_file(osp.join(root, _relpath)) for _relpath in relpaths}
+
+
+def trace_dependencies(fxn, root):
+    """
+    Calls ``fxn`` and returns its source dependencies as a dictionary mapping the files executed (see :func:`trace_files`) to their content hashes.
+    """
+    return hash_files(trace_files(fxn, root), root)
+
+
+def changed_files(dependencies, root):
+    """
+    Returns the sorted list of dependency files that were modified or removed since the dependencies were recorded.
+    """
+    current = hash_files(dependencies, root)
+    return sorted(
+        _relpath
+        for _relpath, _digest in dependencies.items()
+        if current[_relpath] != _digest
+    )
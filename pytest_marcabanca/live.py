@@ -0,0 +1,191 @@
+"""
+Live progress display of benchmark sessions.
+"""
+
+from collections import deque
+from contextlib import nullcontext
+import sys
+import time
+from jztools import humanize as pghm
+import numpy as np
+
+
+class LiveDisplay:
+    """
+    Displays the test being benchmarked, its sample count, a running estimate of its rank and relative runtime, the session's estimated remaining time and the latest regressions.
+
+    The display is only refreshed when notified between samples (and at most every ``min_interval`` seconds), so that it adds no overhead to the timed runs. Pytest's output capturing is suspended while refreshing.
+    """
+
+    def __init__(self, config, min_interval=0.25, max_regressions=5):
+        """
+        :param config: The pytest config.
+        :param min_interval: Minimum time (in seconds) between refreshes.
+        :param max_regressions: Number of latest regressions displayed.
+        """
+        self.capture_manager = config.pluginmanager.getplugin("capturemanager")
+        self.min_interval = min_interval
+        self.live = None
+        self.last_refresh = 0.0
+        # Dictionary mapping pending test ids to [mean runtime or None, remaining samples].
+        self.pending = {}
+        self.test_node_id = None
+        self.phase = None
+        self.num_samples = 0
+        self.num_done = 0
+        self.samples = []
+        self.ref_model = None
+        self.regressions = deque(maxlen=max_regressions)
+        self.num_regressions = 0
+
+    def _output(self):
+        return (
+            self.capture_manager.global_and_fixture_disabled()
+            if self.capture_manager is not None
+            else nullcontext()
+        )
+
+    def plan(self, means, num_samples):
+        """
+        Sets the tests expected to be benchmarked.
+
+        :param means: Dictionary mapping test ids to the mean runtime of their reference, or ``None`` if unknown.
+        :param num_samples: Dictionary mapping test ids to their number of planned samples.
+        """
+        self.pending = {
+            _test_node_id: [_mean, num_samples[_test_node_id]]
+            for _test_node_id, _mean in means.items()
+        }
+
+    def begin(self, test_node_id, phase, num_samples, num_done=0, ref_model=None):
+        """
+        Displays a new batch of samples of a test.
+
+        :param phase: The label of the batch (e.g., ``'reference'`` or ``'test'``).
+        :param num_samples: The number of samples of the batch.
+        :param num_done: The number of samples of the batch already taken.
+        :param ref_model: The test's reference, used to estimate its rank and relative runtime from the test samples.
+        """
+        if test_node_id != self.test_node_id or ref_model is not self.ref_model:
+            self.samples = []
+        self.test_node_id = test_node_id
+        self.phase = phase
+        self.num_samples = num_samples
+        self.num_done = num_done
+        self.ref_model = ref_model
+        self.refresh()
+
+    def add_sample(self, runtime):
+        """
+        Records a sample of the current test. Must be called outside of the timed region.
+        """
+        self.samples.append(runtime)
+        self.num_done += 1
+        if pending := self.pending.get(self.test_node_id):
+            pending[1] = max(pending[1] - 1, 0)
+        self.refresh()
+
+    def end(self, test_node_id):
+        """
+        Marks a test as benchmarked.
+        """
+        self.pending.pop(test_node_id, None)
+        if test_node_id == self.test_node_id:
+            self.test_node_id = None
+            self.samples = []
+            self.ref_model = None
+        self.refresh()
+
+    def add_regression(self, label):
+        self.regressions.append(label)
+        self.num_regressions += 1
+        self.refresh(force=True)
+
+    def eta(self):
+        """
+        Returns the estimated remaining time of the pending samples, and the number of pending tests without a runtime estimate. Tests without a reference are estimated from their samples once these are available.
+        """
+        eta, num_unknown = 0.0, 0
+        for _test_node_id, (_mean, _remaining) in self.pending.items():
+            if _mean is None and _test_node_id == self.test_node_id and self.samples:
+                _mean = np.mean(self.samples)
+            if _mean is None:
+                num_unknown += 1
+            else:
+                eta += _mean * _remaining
+        return eta, num_unknown
+
+    def estimate(self):
+        """
+        Returns the running ``(rank, relative runtime)`` estimate of the current test, or ``None`` if there are no test samples or no reference.
+        """
+        if self.ref_model is None or not self.samples:
+            return None
+        return (
+            float(np.mean([self.ref_model.rank_runtime(_x) for _x in self.samples])),
+            float(np.mean(self.samples) / self.ref_model.model.stats("m")),
+        )
+
+    def render(self):
+        from rich.console import Group
+        from rich.progress_bar import ProgressBar
+        from rich.table import Table
+        from rich.text import Text
+        from rich.markup import escape
+
+        grid = Table.grid(padding=(0, 1))
+        if self.test_node_id is not None:
+            grid.add_row("Test", escape(self.test_node_id))
+            progress = Table.grid(padding=(0, 1))
+            progress.add_row(
+                f"{self.phase} sample {self.num_done}/{self.num_samples}",
+                ProgressBar(
+                    total=max(self.num_samples, 1), completed=self.num_done, width=30
+                ),
+            )
+            grid.add_row("Progress", progress)
+            if estimate := self.estimate():
+                grid.add_row(
+                    "Estimate", f"rank {estimate[0]:.2%}, rltv {estimate[1]:.2f}X"
+                )
+        eta, num_unknown = self.eta()
+        grid.add_row(
+            "ETA",
+            pghm.secs(eta)
+            + (f" (+{num_unknown} tests without an estimate)" if num_unknown else ""),
+        )
+        if self.regressions:
+            grid.add_row(
+                "Regressions",
+                Text(
+                    f"{self.num_regressions} so far, latest: "
+                    + ", ".join(self.regressions),
+                    style="red",
+                ),
+            )
+        return Group(Text("MARCABANCA", style="bold"), grid)
+
+    def refresh(self, force=False):
+        if not force and time.monotonic() - self.last_refresh < self.min_interval:
+            return
+        with self._output():
+            if self.live is None:
+                from rich.console import Console
+                from rich.live import Live
+
+                self.live = Live(
+                    console=Console(file=sys.stdout),
+                    auto_refresh=False,
+                    transient=True,
+                    redirect_stdout=False,
+                    redirect_stderr=False,
+                )
+                self.live.start()
+            self.live.update(self.render(), refresh=True)
+        self.last_refresh = time.monotonic()
+
+    def stop(self):
+        if self.live is not None:
+            with self._output():
+                self.live.stop()
+            self.live = None
@@ -0,0 +1,412 @@
+"""
+Maintenance of data stores: pruning of stale references and history entries, removal of the configs and profiles that are no longer used, and merging of stores.
+"""
+
+from dataclasses import dataclass, field
+import copy
+import json
+import os
+import os.path as osp
+import subprocess as subp
+import sys
+import time
+from tempfile import TemporaryDirectory
+from jztools.serializer import Serializer as _Serializer
+from .utils import (
+    store_paths,
+    journal_paths,
+    reference_key,
+    decode_python_configs,
+    PythonConfiguration,
+    HistoryEntry,
+)
+import numpy as np
+from . import profiles as mb_profiles
+
+DAY = 24 * 3600.0
+
+
+def group_key(reference_id):
+    return (reference_id["test_node_id"], reference_id.get("metric"))
+
+
+@dataclass
+class PrunePlan:
+    """
+    The references, configs and history entries removed by a prune (see :func:`plan_prune`).
+    """
+
+    references: list = field(default_factory=list)
+    machine_configs: list = field(default_factory=list)
+    python_configs: list = field(default_factory=list)
+    history: list = field(default_factory=list)
+
+    def counts(self):
+        return {
+            "references": len(self.references),
+            "machine configs": len(self.machine_configs),
+            "python configs": len(self.python_configs),
+            "history entries": len(self.history),
+        }
+
+
+def last_used(references, history=()):
+    """
+    Returns a dictionary mapping reference keys (see :func:`reference_key`) to the timestamp of the reference's last use: the latest of its recorded last use (see :attr:`~pytest_marcabanca.utils.ReferenceModel.last_used`) and of its history entries (reference creations, test runs with ``--mb-history`` and merges). References stored before last uses were recorded only have their history, and references with neither are omitted.
+    """
+    out = {}
+    for _reference_id, _timestamp in [
+        (_ref.reference_id, _ref.last_used) for _ref in references
+    ] + [(_entry.reference_id, _entry.timestamp) for _entry in history]:
+        if _timestamp is not None:
+            key = reference_key(_reference_id)
+            out[key] = max(out.get(key, _timestamp), _timestamp)
+    return out
+
+
+def plan_prune(
+    mngr,
+    node_ids=None,
+    max_age=None,
+    keep_environments=None,
+    keep_history=None,
+    now=None,
+):
+    """
+    Determines which references and history entries of the data store to remove. Configs used by no remaining reference are always removed, together with their history entries.
+
+    :param mngr: A :class:`~pytest_marcabanca.utils.Manager`.
+    :param node_ids: Test node ids that still exist. References and history entries of other tests are removed. Disabled if ``None``.
+    :param max_age: Maximum age in seconds. References not used by a session within this period (see :func:`last_used`), and older history entries, are removed. References with an unknown last use are kept.
+    :param keep_environments: Maximum number of references (i.e., of machine and python config combinations) kept per test. The most recently used references are kept.
+    :param keep_history: Maximum number of history entries kept per reference. The latest entries are kept.
+    :param now: The current timestamp (defaults to the current time).
+    :return: A :class:`PrunePlan`.
+    """
+    now = time.time() if now is None else now
+    usage = last_used(mngr.data["references"], mngr.history)
+    plan = PrunePlan()
+
+    def stale(reference_id):
+        return (
+            node_ids is not None and reference_id["test_node_id"] not in node_ids
+        ) or (
+            max_age is not None
+            and usage.get(reference_key(reference_id), now) < now - max_age
+        )
+
+    by_test = {}
+    for _ref in mngr.data["references"]:
+        if stale(_ref.reference_id):
+            plan.references.append(_ref)
+        else:
+            by_test.setdefault(group_key(_ref.reference_id), []).append(_ref)
+    if keep_environments is not None:
+        for _refs in by_test.values():
+            _refs.sort(
+                key=lambda _ref: usage.get(reference_key(_ref.reference_id), 0.0),
+                reverse=True,
+            )
+            plan.references.extend(_refs[keep_environments:])
+            del _refs[keep_environments:]
+
+    # Configs of the remaining references.
+    kept = [_ref for _refs in by_test.values() for _ref in _refs]
+    for _key, _id_key in [
+        ("machine_configs", "machine_config_id"),
+        ("python_configs", "python_config_id"),
+    ]:
+        used = {_ref.reference_id[_id_key] for _ref in kept}
+        getattr(plan, _key).extend(
+            _config for _config in mngr.data[_key] if _config.config_id not in used
+        )
+
+    removed_configs = {_config.config_id for _config in plan.machine_configs} | {
+        _config.config_id for _config in plan.python_configs
+    }
+    entries = {}
+    for _entry in mngr.history:
+        reference_id = _entry.reference_id
+        if (
+            stale(reference_id)
+            or (max_age is not None and _entry.timestamp < now - max_age)
+            or reference_id["machine_config_id"] in removed_configs
+            or reference_id["python_config_id"] in removed_configs
+        ):
+            plan.history.append(_entry)
+        else:
+            entries.setdefault(reference_key(reference_id), []).append(_entry)
+    if keep_history is not None:
+        for _entries in entries.values():
+            _entries.sort(key=lambda _entry: _entry.timestamp, reverse=True)
+            plan.history.extend(_entries[keep_history:])
+
+    return plan
+
+
+def apply_prune(mngr, plan):
+    """
+    Removes the references, configs and history entries of the plan from the manager's in-memory data. Call :meth:`~pytest_marcabanca.utils.Manager.write` to persist the changes.
+    """
+    for _key in ["references", "machine_configs", "python_configs"]:
+        removed = {id(_x) for _x in getattr(plan, _key)}
+        mngr.data[_key] = [_x for _x in mngr.data[_key] if id(_x) not in removed]
+    removed = {id(_x) for _x in plan.history}
+    mngr.history = [_x for _x in mngr.history if id(_x) not in removed]
+    mngr.modified = True
+
+
+def orphaned_profiles(root, references):
+    """
+    Returns the paths of the profile files (see :mod:`~pytest_marcabanca.profiles`) that belong to none of the references.
+    """
+    digests = {
+        osp.basename(
+            mb_profiles.profile_prefix(root, _ref.reference_id, "reference")
+        ).split(".")[0]
+        for _ref in references
+    }
+    return [
+        _path
+        for _path in profile_files(root)
+        if osp.basename(_path).split(".")[0] not in digests
+    ]
+
+
+def profile_files(root):
+    """
+    Returns the paths of the profile files in the root.
+    """
+    if not osp.isdir(profiles_dir := osp.join(root, "profiles")):
+        return []
+    return sorted(osp.join(profiles_dir, _name) for _name in os.listdir(profiles_dir))
+
+
+def store_size(root):
+    """
+    Returns the total size in bytes of the data store files and profiles in the root.
+    """
+    paths = [
+        _path for _key, _path in store_paths(root).items() if _key != "lock"
+    ] + journal_paths(root)
+    return sum(
+        osp.getsize(_path) for _path in paths + profile_files(root) if osp.isfile(_path)
+    )
+
+
+def load_time(root, repeats=3):
+    """
+    Returns the time in seconds (best of ``repeats``) taken to load the data files of the store, as done at the start of each session. Runtimes are not included, as they are loaded lazily.
+    """
+    paths = store_paths(root)
+    serializer = _Serializer()
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _key in ["machine_configs", "python_configs", "references", "history"]:
+            data = serializer.load_safe(paths[_key])[0] or []
+            if _key == "python_configs":
+                decode_python_configs(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_store(mngr, orphans=()):
+    """
+    Measures the size and load time of the store that :meth:`~pytest_marcabanca.utils.Manager.write` would produce from the manager's in-memory data, by writing it to a temporary directory.
+
+    :param orphans: Profile files that would be removed.
+    :return: ``(size in bytes, load time in seconds)``.
+    """
+    with TemporaryDirectory() as tmp_root:
+        tmp_mngr = copy.copy(mngr)
+        tmp_mngr.root, tmp_mngr.paths = tmp_root, store_paths(tmp_root)
+        tmp_mngr.write()
+        profiles_size = sum(
+            osp.getsize(_path)
+            for _path in profile_files(mngr.root)
+            if _path not in orphans
+        )
+        return store_size(tmp_root) + profiles_size, load_time(tmp_root)
+
+
+def collect_node_ids(args, cwd=None):
+    """
+    Runs a pytest collection and returns the collected test node ids.
+
+    :param args: Arguments of the pytest collection (e.g., the test folder).
+    :raises RuntimeError: If the collection fails or collects no tests, so that the references of all tests are not pruned by mistake.
+    """
+    out = subp.run(
+        [
+            sys.executable,
+            "-m",
+            "pytest",
+            "--collect-only",
+            "-q",
+            "-p",
+            "no:cacheprovider",
+        ]
+        + list(args),
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if out.returncode != 0:
+        raise RuntimeError(
+            f"The pytest collection failed with exit code {out.returncode}:\n{out.stdout}{out.stderr}"
+        )
+    return {_line.strip() for _line in out.stdout.splitlines() if "::" in _line}
+
+
+MERGE_POLICIES = ["newest", "most-samples", "history"]
+
+MERGE_COUNTS = [
+    "unified configs",
+    "added configs",
+    "added references",
+    "replaced references",
+    "kept references",
+    "added history entries",
+]
+
+
+@dataclass
+class MergeResult:
+    """
+    The outcome of a merge (see :func:`merge_stores`).
+    """
+
+    counts: dict = field(default_factory=lambda: dict.fromkeys(MERGE_COUNTS, 0))
+    # (source path, target path) tuples of the profile files to copy.
+    profiles: list = field(default_factory=list)
+
+
+def config_key(config):
+    """
+    Returns a key shared by equivalent configs, regardless of their ``config_id``: the python version and module set of python configs (see :meth:`~pytest_marcabanca.utils.PythonConfiguration.content_hash`), or the specs other than the host name and MAC address of machine configs.
+    """
+    if isinstance(config, PythonConfiguration):
+        return PythonConfiguration.content_hash(config.specs)
+    return json.dumps(config._anonynoums_specs(), sort_keys=True, default=str)
+
+
+def history_key(entry):
+    return (reference_key(entry.reference_id), entry.kind, entry.timestamp)
+
+
+def merge_stores(mngr, source, policy="newest"):
+    """
+    Merges the data of the source manager into the target manager. Equivalent configs (see :func:`config_key`) are unified under the target's config ids, and the source's references and history entries are remapped to the unified ids. All lookups use dictionary indexes, so that the merge takes linear time in the size of the stores.
+
+    :param mngr: The target :class:`~pytest_marcabanca.utils.Manager`. Call :meth:`~pytest_marcabanca.utils.Manager.write` to persist the merge.
+    :param source: The source :class:`~pytest_marcabanca.utils.Manager`.
+    :param policy: How to resolve references of the same test and environment found in both stores:
+
+        * ``'newest'``: Keep the most recently used reference (see :func:`last_used`), preferring the target's on ties.
+        * ``'most-samples'``: Keep the reference with the most samples, preferring the target's on ties.
+        * ``'history'``: As ``'newest'``, and further keep the runtimes of the discarded reference as a history entry of kind ``'merged'``, timestamped with the reference's last use.
+
+    :return: A :class:`MergeResult`.
+    """
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"Invalid merge policy '{policy}'.")
+    result = MergeResult()
+
+    # Map source config ids to target config ids.
+    id_map = {}
+    for _key in ["machine_configs", "python_configs"]:
+        index = {config_key(_config): _config for _config in mngr.data[_key]}
+        for _config in source.data[_key]:
+            if (target_config := index.get(config_key(_config))) is not None:
+                result.counts["unified configs"] += 1
+            else:
+                target_config = index[config_key(_config)] = _config
+                mngr.data[_key].append(_config)
+                result.counts["added configs"] += 1
+            id_map[_config.config_id] = target_config.config_id
+
+    def remap(reference_id):
+        return {
+            **reference_id,
+            **{
+                _key: id_map.get(reference_id[_key], reference_id[_key])
+                for _key in ["machine_config_id", "python_config_id"]
+            },
+        }
+
+    # Last uses are computed separately for each store, as they decide conflicts.
+    target_usage = last_used(mngr.data["references"], mngr.history)
+    source_history = []
+    for _entry in source.history:
+        source_history.append(entry := copy.copy(_entry))
+        entry.reference_id = remap(_entry.reference_id)
+    source_references = []
+    for _ref in source.data["references"]:
+        source_references.append(reference := copy.copy(_ref))
+        reference.reference_id = remap(_ref.reference_id)
+    source_usage = last_used(source_references, source_history)
+
+    history_index = {history_key(_entry) for _entry in mngr.history}
+    for _entry in source_history:
+        if (key := history_key(_entry)) not in history_index:
+            history_index.add(key)
+            mngr.history.append(_entry)
+            result.counts["added history entries"] += 1
+
+    references_index = {
+        reference_key(_ref.reference_id): _posn
+        for _posn, _ref in enumerate(mngr.data["references"])
+    }
+    for _ref, reference in zip(source.data["references"], source_references):
+        # Load the runtimes from the source store.
+        reference.runtimes = np.asarray(_ref.runtimes, dtype=float)
+        key = reference_key(reference.reference_id)
+
+        if (posn := references_index.get(key)) is None:
+            references_index[key] = len(mngr.data["references"])
+            mngr.data["references"].append(reference)
+            result.counts["added references"] += 1
+        else:
+            existing = mngr.data["references"][posn]
+            replace = (
+                reference.num_samples > existing.num_samples
+                if policy == "most-samples"
+                else source_usage.get(key, 0.0) > target_usage.get(key, 0.0)
+            )
+            if policy == "history":
+                discarded, usage = (
+                    (existing, target_usage) if replace else (reference, source_usage)
+                )
+                entry = HistoryEntry.from_runtimes(
+                    "merged", reference.reference_id, discarded.runtimes
+                )
+                entry.timestamp, entry.commit = usage.get(key, entry.timestamp), None
+                mngr.history.append(entry)
+                result.counts["added history entries"] += 1
+            if not replace:
+                result.counts["kept references"] += 1
+                continue
+            mngr.data["references"][posn] = reference
+            result.counts["replaced references"] += 1
+
+        for _kind in ["reference", "regressed"]:
+            for _ext in [".pstats", ".collapsed"]:
+                if osp.isfile(
+                    path := mb_profiles.profile_prefix(
+                        source.root, _ref.reference_id, _kind
+                    )
+                    + _ext
+                ):
+                    result.profiles.append(
+                        (
+                            path,
+                            mb_profiles.profile_prefix(
+                                mngr.root, reference.reference_id, _kind
+                            )
+                            + _ext,
+                        )
+                    )
+
+    mngr.modified = True
+    return result
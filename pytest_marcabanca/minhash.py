@@ -0,0 +1,95 @@
+"""
+MinHash signatures used to estimate the similarity (Jaccard index) of python module sets without intersecting them.
+"""
+
+import hashlib
+import numpy as np
+
+NUM_HASHES = 64
+"""
+Number of hash functions (and signature length).
+"""
+
+_PRIME = 4294967311
+"""
+The smallest prime above 2**32. Hash functions have the form ``(a * x + b) % _PRIME`` for 32-bit ``a``, ``b`` and ``x``, which cannot overflow 64-bit unsigned integers.
+"""
+
+
+def _hash32(token):
+    return int.from_bytes(
+        hashlib.blake2b(token.encode(), digest_size=4).digest(), "little"
+    )
+
+
+# Derived deterministically from their index, so that stored signatures remain valid across sessions.
+_COEFFS = np.array(
+    [
+        [_hash32(f"a{_k}") | 1 for _k in range(NUM_HASHES)],
+        [_hash32(f"b{_k}") for _k in range(NUM_HASHES)],
+    ],
+    dtype=np.uint64,
+)
+
+
+def signature(tokens):
+    """
+    Returns the MinHash signature (a list of ``NUM_HASHES`` ints) of a set of string tokens.
+    """
+    if not tokens:
+        return [_PRIME] * NUM_HASHES
+    x = np.array([_hash32(_token) for _token in tokens], dtype=np.uint64)[:, None]
+    return [
+        int(_x) for _x in ((_COEFFS[0] * x + _COEFFS[1]) % np.uint64(_PRIME)).min(0)
+    ]
+
+
+def similarity(signature1, signature2):
+    """
+    Estimates the Jaccard index of the token sets of two signatures.
+    """
+    return float(np.mean(np.asarray(signature1) == np.asarray(signature2)))
+
+
+NUM_BANDS = 16
+"""
+Number of bands of :class:`LSHIndex`. Each band hashes ``NUM_HASHES // NUM_BANDS`` signature entries, so that sets with a Jaccard index of 0.5 share a band with a probability of about 0.64, and sets with an index of 0.2 with a probability of about 0.03.
+"""
+
+
+class LSHIndex:
+    """
+    Locality-sensitive hashing index of MinHash signatures: keys whose signatures are identical in any band are candidates of similar sets, found without comparing all pairs of signatures.
+    """
+
+    max_bucket_size = 8
+    """
+    Number of most recently added keys kept in each bucket, which bounds the number of candidates of a query.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+
+    @staticmethod
+    def _bands(signature):
+        rows = NUM_HASHES // NUM_BANDS
+        return [
+            (_k, tuple(signature[_k * rows : (_k + 1) * rows]))
+            for _k in range(NUM_BANDS)
+        ]
+
+    def add(self, key, signature):
+        for _band in self._bands(signature):
+            bucket = self._buckets.setdefault(_band, [])
+            bucket.append(key)
+            del bucket[: -self.max_bucket_size]
+
+    def query(self, signature):
+        """
+        Returns the keys that share a band with the signature, most recently added first.
+        """
+        out = {}
+        for _band in self._bands(signature):
+            for _key in reversed(self._buckets.get(_band, [])):
+                out[_key] = None
+        return list(out)
@@ -0,0 +1,133 @@
+"""
+Background monitoring of system noise (load from competing processes, CPU steal time, frequency scaling) during benchmark samples.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+import psutil
+
+
+class NoiseMonitor:
+    """
+    Samples system noise indicators in a background thread. Use :meth:`sample` to annotate a benchmark sample with the noise observed while it ran, and :meth:`wait_until_quiet` to pause benchmarking while the system is noisy.
+
+    The noise level is the percentage of the total CPU capacity used by other processes plus the CPU steal time percentage (on virtual machines).
+    """
+
+    def __init__(self, noise_thresh, interval=0.1):
+        """
+        :param noise_thresh: Noise level (in percent) above which the system is considered noisy.
+        :param interval: Sampling interval of the background thread (in seconds).
+        """
+        self.noise_thresh = noise_thresh
+        self.interval = interval
+        self.latest = None
+        self._windows = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._process = psutil.Process()
+        self._num_cpus = psutil.cpu_count() or 1
+
+    def read(self):
+        """
+        Returns a dictionary with the current noise indicators.
+        """
+        system_cpu = psutil.cpu_percent(interval=None)
+        own_cpu = self._process.cpu_percent(interval=None) / self._num_cpus
+        competing_cpu = max(0.0, system_cpu - own_cpu)
+        steal = getattr(psutil.cpu_times_percent(interval=None), "steal", 0.0)
+        try:
+            load = os.getloadavg()[0] / self._num_cpus
+        except (AttributeError, OSError):
+            load = None
+        try:
+            freq = psutil.cpu_freq().current
+        except (AttributeError, NotImplementedError, FileNotFoundError):
+            freq = None
+        return {
+            "competing_cpu": competing_cpu,
+            "steal": steal,
+            "load": load,
+            "freq": freq,
+            "noisy": competing_cpu + steal > self.noise_thresh,
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            reading = self.read()
+            with self._lock:
+                self.latest = reading
+                for _window in self._windows:
+                    _window.append(reading)
+
+    def start(self):
+        # Initialize psutil's cpu percent counters.
+        self.read()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @contextmanager
+    def sample(self):
+        """
+        Context manager that yields a dictionary filled on exit with the worst noise indicators observed while the context was active (or the latest ones, for contexts shorter than the sampling interval).
+        """
+        window = []
+        with self._lock:
+            if self.latest:
+                window.append(self.latest)
+            self._windows.append(window)
+        annotation = {}
+        try:
+            yield annotation
+        finally:
+            with self._lock:
+                self._windows.remove(window)
+                window = window + ([self.latest] if self.latest else [])
+            annotation.update(summarize(window))
+
+    def wait_until_quiet(self, max_wait):
+        """
+        Blocks while the latest reading is noisy, for at most ``max_wait`` seconds.
+
+        :return: The time waited (in seconds).
+        """
+        start = time.perf_counter()
+        waited = 0.0
+        while (
+            self.latest is not None
+            and self.latest["noisy"]
+            and (waited := time.perf_counter() - start) < max_wait
+        ):
+            time.sleep(self.interval)
+        return waited
+
+
+def summarize(readings):
+    """
+    Combines noise readings into a single annotation keeping the worst value of each indicator.
+    """
+    if not readings:
+        return {"noisy": False}
+
+    def worst(key, fxn):
+        values = [_x[key] for _x in readings if _x[key] is not None]
+        return fxn(values) if values else None
+
+    return {
+        "competing_cpu": worst("competing_cpu", max),
+        "steal": worst("steal", max),
+        "load": worst("load", max),
+        "freq": worst("freq", min),
+        "noisy": any(_x["noisy"] for _x in readings),
+    }
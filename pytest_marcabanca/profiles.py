@@ -0,0 +1,128 @@
+"""
+Profiles of benchmarked tests: :mod:`cProfile` statistics, collapsed-stack flamegraph files and diffs of the functions with the largest self time.
+"""
+
+import cProfile
+import hashlib
+import json
+import os
+import os.path as osp
+import pstats
+
+
+def profile_runs(fxn, num_runs):
+    """
+    Calls ``fxn`` ``num_runs`` times under :mod:`cProfile`.
+
+    :return: The resulting :class:`pstats.Stats`.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        for _ in range(num_runs):
+            fxn()
+    finally:
+        profiler.disable()
+    return pstats.Stats(profiler)
+
+
+def profile_prefix(root, reference_id, kind):
+    """
+    Returns the path prefix (without extension) of the profile files of a reference. Profiles are stored in the ``profiles`` folder of the data root.
+
+    :param kind: ``'reference'`` for the profile taken when the reference was created, or ``'regressed'`` for the profile of the latest regressed run.
+    """
+    digest = hashlib.sha256(
+        json.dumps(reference_id, sort_keys=True).encode()
+    ).hexdigest()[:16]
+    return osp.join(root, "profiles", f"{digest}.{kind}")
+
+
+def save_profile(stats, prefix):
+    """
+    Writes the profile statistics to ``<prefix>.pstats`` and their collapsed stacks (see :func:`collapsed_stacks`) to ``<prefix>.collapsed``.
+    """
+    os.makedirs(osp.dirname(prefix), exist_ok=True)
+    stats.dump_stats(prefix + ".pstats")
+    with open(prefix + ".collapsed", "wt") as fo:
+        for _stack, _weight in sorted(collapsed_stacks(stats).items()):
+            fo.write(f"{_stack} {_weight}\n")
+
+
+def load_profile(prefix):
+    """
+    Loads the :class:`pstats.Stats` saved by :func:`save_profile`, or returns ``None`` if it does not exist.
+    """
+    try:
+        return pstats.Stats(prefix + ".pstats")
+    except FileNotFoundError:
+        return None
+
+
+def _label(func):
+    filename, lineno, name = func
+    return pstats.func_std_string((osp.basename(filename), lineno, name))
+
+
+def collapsed_stacks(stats, min_time=1e-6, max_depth=128):
+    """
+    Reconstructs the collapsed stacks (the input format of flamegraph tools) of the profile. cProfile only records caller-callee pairs, so the self time of a function is split between its call stacks in proportion to the cumulative time of each caller-callee pair.
+
+    Recursive calls are not expanded, as a function already in the stack would otherwise be expanded endlessly. As the stacks expanded at each depth have at most the total time, the number of expanded stacks is bounded by ``max_depth`` times the total time over ``min_time``.
+
+    :param min_time: Stacks with less than this cumulative time (in seconds) are not expanded.
+    :param max_depth: Stacks with this many functions are not expanded.
+    :return: Dictionary mapping ``;``-separated stacks to self times in microseconds.
+    """
+    callees = {}
+    for _func, (_, _, _, _, _callers) in stats.stats.items():
+        for _caller, _edge in _callers.items():
+            callees.setdefault(_caller, []).append((_func, _edge[3]))
+
+    out = {}
+    pending = [
+        (_func, _cumtime, (), frozenset())
+        for _func, (_, _, _, _cumtime, _callers) in stats.stats.items()
+        if not _callers
+    ]
+    while pending:
+        func, cum_time, stack, on_stack = pending.pop()
+        stack, on_stack = stack + (_label(func),), on_stack | {func}
+        _, _, tottime, cumtime, _ = stats.stats[func]
+        scale = cum_time / cumtime if cumtime else 0.0
+        if weight := round(tottime * scale * 1e6):
+            key = ";".join(stack)
+            out[key] = out.get(key, 0) + weight
+        if len(stack) >= max_depth:
+            continue
+        for _callee, _edge_cumtime in callees.get(func, []):
+            if (time := _edge_cumtime * scale) >= min_time and _callee not in on_stack:
+                pending.append((_callee, time, stack, on_stack))
+    return out
+
+
+def self_times(stats, num_runs=1):
+    """
+    Returns a dictionary mapping function labels to their self time per run.
+    """
+    out = {}
+    for _func, (_, _, _tottime, _, _) in stats.stats.items():
+        label = _label(_func)
+        out[label] = out.get(label, 0.0) + _tottime / num_runs
+    return out
+
+
+def diff_top_functions(ref_stats, ref_runs, test_stats, test_runs, num_functions=5):
+    """
+    Returns the functions with the largest increase in self time per run between the reference and the test profiles.
+
+    :return: List of ``(function label, reference time, test time)`` tuples (times per run, in seconds), sorted by decreasing increase.
+    """
+    ref_times = self_times(ref_stats, ref_runs)
+    test_times = self_times(test_stats, test_runs)
+    diffs = [
+        (_label, ref_times.get(_label, 0.0), _time)
+        for _label, _time in test_times.items()
+        if _time > ref_times.get(_label, 0.0)
+    ]
+    return sorted(diffs, key=lambda _x: _x[1] - _x[2])[:num_functions]
@@ -2,15 +2,30 @@
 # from marcabanca import MarcabancaWrappedCallable
 from jztools import humanize as pghm
 import os
+import time
+import inspect
+import random
 import os.path as osp
 import numpy as np
 from collections import namedtuple
-from .utils import Manager
+from .utils import Manager, HistoryEntry
+from .changepoint import find_level_shift
+from . import stats as mb_stats
+from . import concurrency as mb_concurrency
+from . import coldstart as mb_coldstart
+from . import budget as mb_budget
+from . import impact as mb_impact
+from . import export as mb_export
+from . import htmlreport as mb_htmlreport
+from . import profiles as mb_profiles
+from .noise import NoiseMonitor
+from .live import LiveDisplay
 import py
 import jztools.profiling as pgprof
 from py.path import local
 import pytest
 from jztools.unittest.utils import is_skipped
+from _pytest.runner import runtestprotocol
 
 
 class TestIsSlow(Exception):
@@ -18,6 +33,18 @@ class TestIsSlow(Exception):
         super().__init__(f"Avg. rank={rank}; Avg. rltv. runtime={rltv}")
 
 
+class RegressionWarning(pytest.PytestWarning):
+    """
+    Issued for regressed tests with ``--mb-enforce=warn``.
+    """
+
+
+REGRESSION_EXIT_CODE = 6
+"""
+Session exit code used with ``--mb-enforce=fail`` when performance regressions are the only test failures.
+"""
+
+
 def pytest_configure(config):
     """
     pytest_configure hook for marcabanca plugin
@@ -26,6 +53,10 @@ def pytest_configure(config):
     config.pluginmanager.register(PytestMarcabanca(config))
 
 
+def _int_list(value):
+    return [int(_x) for _x in value.split(",")]
+
+
 def pytest_addoption(parser):
     """
     Defines pytest options for marcabanca plugin.
@@ -55,12 +86,150 @@ def pytest_addoption(parser):
         default=1.5,
         help="[1.5] Error threshold applied to average relative runtime (e.g., use 1.3 to fail with tests 30% slower on avg. than the ref).",
     )
+    group.addoption(
+        "--mb-quantile",
+        type=float,
+        default=None,
+        help="[None] Also compare this quantile (e.g., 0.99 for p99 tail latency) of the test runtimes to the reference model's quantile. Test runtimes are then sampled adaptively (see --mb-max-test-runs). Can be set per test using the @benchmark decorator.",
+    )
+    group.addoption(
+        "--mb-quantile-thresh",
+        type=float,
+        default=1.5,
+        help="[1.5] Error threshold applied to the ratio of the test runtime quantile to the reference quantile when using --mb-quantile. Can be set per test using the @benchmark decorator.",
+    )
+    group.addoption(
+        "--mb-max-test-runs",
+        type=int,
+        default=200,
+        help="[200] Maximum number of runs carried out when sampling test and reference runtimes to estimate a quantile.",
+    )
+    group.addoption(
+        "--mb-enforce",
+        default="none",
+        choices=["none", "fail", "xfail", "warn"],
+        help=f"['none'] How to enforce performance regressions of tests that otherwise passed: 'fail' them, mark them as 'xfail', 'warn' about them, or only report them ('none'). With 'fail', sessions where regressions are the only failures exit with code {REGRESSION_EXIT_CODE}.",
+    )
+    group.addoption(
+        "--mb-select",
+        default="all",
+        choices=["all", "changed"],
+        help="['all'] Benchmark 'all' tests, or only those whose source dependencies 'changed'. The source files executed by a test (and their content hashes) are recorded when creating its reference. With 'changed', tests whose files are all unchanged are not benchmarked, and the results of their last recorded run are carried forward instead (test runs are then recorded in the history even without --mb-history).",
+    )
+    group.addoption(
+        "--mb-time-budget",
+        type=float,
+        default=None,
+        help="[None] Approximate time (in seconds) to spend on benchmark runs. The number of test runs of each test is planned before the session using the mean of its reference model, favoring noisy tests and tests that regressed or were near the thresholds in their last recorded run (see --mb-history). Stable tests get as few as 2 runs, while prioritized tests can get more than --mb-num-test-runs. The estimated time of reference creation (including for tests without a reference, which are not planned), reference profiling, concurrency and cold-start measurements is deducted first. The report shows the actual time taken by the tests when it exceeds the budget.",
+    )
+    group.addoption(
+        "--mb-concurrency",
+        type=_int_list,
+        default=None,
+        help="[None] Comma-separated ladder of worker counts (e.g., '1,2,4,8'). When specified, the test body is further run concurrently in that many threads or processes (see --mb-concurrency-kind), and the resulting scaling curve (aggregate throughput and per-call latency) is stored in the reference and compared at test time. Can be set per test using the @benchmark decorator.",
+    )
+    group.addoption(
+        "--mb-concurrency-kind",
+        default="thread",
+        choices=mb_concurrency.KINDS,
+        help="['thread'] Whether concurrent workers are threads or (forked) processes. Can be set per test using the @benchmark decorator.",
+    )
+    group.addoption(
+        "--mb-concurrency-calls",
+        type=int,
+        default=5,
+        help="[5] Number of calls carried out by each concurrent worker.",
+    )
+    group.addoption(
+        "--mb-scaling-thresh",
+        type=float,
+        default=0.8,
+        help="[0.8] Error threshold applied to the ratio of the test's scaling efficiency to the reference's (at any worker count) when using --mb-concurrency.",
+    )
+    group.addoption(
+        "--mb-cold-start",
+        action="store_true",
+        default=False,
+        help="Also benchmark the cold-start cost of each test (importing the test module and calling the test once in a fresh interpreter), stored as a separate reference. Only supported for tests without fixtures or parameters. Can be set per test using the @benchmark decorator.",
+    )
+    group.addoption(
+        "--mb-num-cold-runs",
+        type=int,
+        default=5,
+        help="[5] Number of fresh interpreters spawned to measure cold-start costs, both when creating references and at test time.",
+    )
+    group.addoption(
+        "--mb-importtime",
+        action="store_true",
+        default=False,
+        help="With --mb-cold-start, also record a '-X importtime' breakdown and report the modules with the largest import time increases for regressed cold starts.",
+    )
+    group.addoption(
+        "--mb-profile",
+        action="store_true",
+        default=False,
+        help="Profile tests with cProfile when creating their references and when they regress, saving '.pstats' and collapsed-stack (flamegraph) files in the 'profiles' folder of the data root, and report the functions with the largest self time increases of regressed tests.",
+    )
+    group.addoption(
+        "--mb-profile-runs",
+        type=int,
+        default=3,
+        help="[3] Number of test runs profiled with --mb-profile.",
+    )
+    group.addoption(
+        "--mb-schedule",
+        default="sequential",
+        choices=["sequential", "interleaved"],
+        help="['sequential'] Take all the samples of each test back to back ('sequential'), or collect all benchmarked tests first and then take their samples in randomized round-robin order ('interleaved'), so that slow system-wide drifts (e.g., thermal throttling) average out across tests. Interleaved sampling re-runs each test's fixture setup and teardown for every sample and does not support adaptive quantile sampling.",
+    )
+    group.addoption(
+        "--mb-seed",
+        type=int,
+        default=None,
+        help="[random] Seed of the randomized order of interleaved samples. The seed used is shown in the report.",
+    )
+    group.addoption(
+        "--mb-noise-thresh",
+        type=float,
+        default=None,
+        help="[None] Monitor system noise in the background and annotate each sample with it. The system is considered noisy while the CPU percentage used by other processes plus the CPU steal time exceeds this threshold (e.g., 20). Sampling is paused while the system is noisy (see --mb-noise-max-wait), and samples taken under noise are handled as per --mb-noise-action.",
+    )
+    group.addoption(
+        "--mb-noise-action",
+        default="mark",
+        choices=["mark", "discard"],
+        help="['mark'] Keep samples taken under noise and mark them as noisy ('mark'), or discard and retake them ('discard'). Samples are retaken at most twice per requested sample.",
+    )
+    group.addoption(
+        "--mb-noise-max-wait",
+        type=float,
+        default=30.0,
+        help="[30.0] Maximum time (in seconds) to pause before each sample waiting for the system to become quiet when using --mb-noise-thresh.",
+    )
+    group.addoption(
+        "--mb-compare",
+        default="model",
+        choices=["model", *mb_stats.COMPARISONS],
+        help="['model'] Regression criterion. Use 'model' to apply --mb-rank-thresh to the rank of test runtimes in the reference model, or 'mannwhitney'/'bootstrap' to instead apply a two-sample test (Mann-Whitney U or bootstrap difference of medians) between the reference and test runtimes, with Benjamini-Hochberg false discovery rate control across the session (see --mb-fdr).",
+    )
+    group.addoption(
+        "--mb-fdr",
+        type=float,
+        default=0.05,
+        help="[0.05] False discovery rate applied to the session's q-values when using a two-sample --mb-compare criterion.",
+    )
     group.addoption(
         "--mb-create-references",
         default="none",
         choices=["none", "overwrite", "missing"],
         help="['none'] Creates references for the tests run (those satisfying the --mb option). Use 'missing' to create only missing references, 'overwrite' to further overwrite existing references, or 'none' to create no new references (the default).",
     )
+    group.addoption(
+        "--mb-resume",
+        action="store_true",
+        default=False,
+        help="Resume an interrupted session: deselect the tests that the last interrupted session completed while creating references. References created by interrupted sessions are always recovered from their journals.",
+    )
     group.addoption(
         "--mb-num-ref-runs",
         type=int,
@@ -76,6 +245,75 @@ def pytest_addoption(parser):
     group.addoption(
         "--mb-model-name", default="gamma", help="One of the models in scipy.stats."
     )
+    group.addoption(
+        "--mb-min-machine-similarity",
+        type=float,
+        default=None,
+        help="When this machine has no reference for a test, use the reference from the most similar machine (same architecture; similar cpu model, core count, caches, memory and flags) if its hardware similarity score is at least this value (in the [0,1] range, e.g., 0.9). Disabled by default.",
+    )
+    group.addoption(
+        "--mb-update-references",
+        action="store_true",
+        default=False,
+        help="Update the current environment's references online using the runtimes of tests that did not regress. Updates are capped by --mb-update-max-shift and --mb-update-max-drift.",
+    )
+    group.addoption(
+        "--mb-update-weight",
+        type=float,
+        default=0.2,
+        help="[0.2] Weight of the newly-fitted model parameters in exponentially-weighted online reference updates.",
+    )
+    group.addoption(
+        "--mb-update-max-shift",
+        type=float,
+        default=0.02,
+        help="[0.02] Maximum relative change of a reference's model mean caused by a single online update.",
+    )
+    group.addoption(
+        "--mb-update-max-drift",
+        type=float,
+        default=0.1,
+        help="[0.1] Maximum relative change of a reference's model mean from its value when the reference was created, accumulated over all online updates.",
+    )
+    group.addoption(
+        "--mb-reservoir-size",
+        type=int,
+        default=100,
+        help="[100] Maximum number of runtimes kept in a reference's reservoir when updating references online.",
+    )
+    group.addoption(
+        "--mb-history",
+        action="store_true",
+        default=False,
+        help="Append a summary of each test run to the per-test history store (reference creations are always recorded) and report gradual runtime drifts detected in that history.",
+    )
+    group.addoption(
+        "--mb-drift-thresh",
+        type=float,
+        default=0.05,
+        help="[0.05] Minimum relative level shift in the runtime history reported as a drift (e.g., 0.05 for 5%%).",
+    )
+    group.addoption(
+        "--mb-live",
+        action="store_true",
+        default=False,
+        help="Display the session's progress live: the test being benchmarked, its sample count, a running rank and relative runtime estimate, the estimated remaining time (from reference means) and the regressions found so far. The display is only refreshed between samples.",
+    )
+    group.addoption(
+        "--mb-report-json",
+        default=None,
+        help="Stream each benchmark result (including the raw test runtimes, reference id, thresholds and regression status) to this JSON Lines file as it is produced.",
+    )
+    group.addoption(
+        "--mb-report-csv",
+        default=None,
+        help="Stream each benchmark result to this CSV file as it is produced (see --mb-report-json).",
+    )
+    group.addoption(
+        "--mb-report-html",
+        default=None,
+        help="Write a self-contained HTML report to this file with, for each benchmarked test, the reference runtime histogram and model pdf, the test runtimes and the runtime history trend (see --mb-history).",
+    )
 
 
 Result = namedtuple(
@@ -89,10 +327,94 @@ Result = namedtuple(
         "model_mean",
         "empirical_mean",
         "ref_model",
+        "test_runtimes",
+        "p_value",
+        "q_value",
+        "effect_size",
+        "quantile",
+        "quantile_thresh",
+        "test_quantile",
+        "ref_quantile",
+        "ref_empirical_quantile",
+        "work_units",
+        "throughput",
+        "ref_throughput",
+        "scaling",
+        "scaling_ratio",
+        "metric",
+        "importtime_diff",
+        "noisy_samples",
+        "carried_forward",
+        "reference_tier",
+        "machine_similarity",
+        "profile_prefix",
+        "profile_diff",
     ),
+    defaults=(None,) * 22,
 )
 
 
+@pytest.fixture
+def mb_work_units(request):
+    """
+    Fixture used to declare the units of work (e.g., items, bytes, rows) carried out by each call of the test, so that marcabanca compares throughput (units/sec) instead of raw runtimes. Usage: ``mb_work_units(len(data), "rows")``.
+    """
+
+    def declare(work_units, work_unit_name="items"):
+        request.node._marcabanca_work_units = (work_units, work_unit_name)
+
+    return declare
+
+
+class _SamplingPlan:
+    """
+    The reference and test runtime samples requested and collected for a benchmarked test.
+    """
+
+    def __init__(
+        self,
+        item,
+        num_test_runs,
+        num_ref_runs=0,
+        reference_kwargs=None,
+        evaluate_kwargs=None,
+    ):
+        self.item = item
+        self.num_ref_runs = num_ref_runs
+        self.num_test_runs = num_test_runs
+        self.ref_runtimes = []
+        self.test_runtimes = []
+        self.ref_noise = []
+        self.test_noise = []
+        self.reference_kwargs = reference_kwargs or {}
+        self.evaluate_kwargs = evaluate_kwargs or {}
+        self.failed = False
+        self.result = None
+
+    @property
+    def remaining(self):
+        if self.failed:
+            return 0
+        return (
+            self.num_ref_runs
+            + self.num_test_runs
+            - len(self.ref_runtimes)
+            - len(self.test_runtimes)
+        )
+
+    def add(self, runtimes, noise=()):
+        """
+        Adds samples (and any noise annotations) to the reference runtimes until these are complete, and then to the test runtimes.
+        """
+        for k, _runtime in enumerate(runtimes):
+            if len(self.ref_runtimes) < self.num_ref_runs:
+                self.ref_runtimes.append(_runtime)
+                self.ref_noise.extend(noise[k : k + 1])
+            else:
+                self.test_runtimes.append(_runtime)
+                self.test_noise.extend(noise[k : k + 1])
+
+
 class PytestMarcabanca(object):
     def __init__(self, config):
         self.which_tests = config.getvalue("mb")
@@ -101,11 +423,79 @@ class PytestMarcabanca(object):
         self.num_ref_runs = config.getvalue("mb_num_ref_runs")
         self.num_test_runs = config.getvalue("mb_num_test_runs")
         self.model_name = config.getvalue("mb_model_name")
+        self.min_machine_similarity = config.getvalue("mb_min_machine_similarity")
         self.data_manager = None
         self.rank_thresh = config.getvalue("mb_rank_thresh")
         self.rltv_thresh = config.getvalue("mb_rltv_thresh")
+        self.quantile = config.getvalue("mb_quantile")
+        self.quantile_thresh = config.getvalue("mb_quantile_thresh")
+        self.max_test_runs = config.getvalue("mb_max_test_runs")
+        self.concurrency = config.getvalue("mb_concurrency")
+        self.concurrency_kind = config.getvalue("mb_concurrency_kind")
+        self.concurrency_calls = config.getvalue("mb_concurrency_calls")
+        self.scaling_thresh = config.getvalue("mb_scaling_thresh")
+        self.cold_start = config.getvalue("mb_cold_start")
+        self.num_cold_runs = config.getvalue("mb_num_cold_runs")
+        self.importtime = config.getvalue("mb_importtime")
+        self.profile = config.getvalue("mb_profile")
+        self.profile_runs = config.getvalue("mb_profile_runs")
+        self._profile_round = False
+        self.unsupported_cold_starts = []
+        self.failed_cold_starts = []
+        self.resume = config.getvalue("mb_resume")
+        self.resumed_tests = set()
+        self.select = config.getvalue("mb_select")
+        self.enforce = config.getvalue("mb_enforce")
+        self.enforced_tests = set()
+        self.regressions = []
+        self.num_comparisons = 0
+        self.rootdir = None
+        self.time_budget = config.getvalue("mb_time_budget")
+        self.budget_plan = None
+        self.fixed_cost = None
+        self.planned_cost = None
+        self.loop_time = None
+        self.reduced_tests = []
+        self.unplanned_tests = []
+        self.noise_thresh = config.getvalue("mb_noise_thresh")
+        self.noise_action = config.getvalue("mb_noise_action")
+        self.noise_max_wait = config.getvalue("mb_noise_max_wait")
+        self.noise_monitor = None
+        self.num_discarded_samples = 0
+        self.noise_wait = 0.0
+        self.schedule = config.getvalue("mb_schedule")
+        self.seed = config.getvalue("mb_seed")
+        if self.seed is None:
+            self.seed = random.randrange(2**32)
+        self.sampling_plans = {}
+        self.failed_samplings = []
+        self.stopped_samplings = []
+        self._sampling_round = False
+        self.comparison = config.getvalue("mb_compare")
+        self.fdr = config.getvalue("mb_fdr")
+        self.update_references = config.getvalue("mb_update_references")
+        self.update_kwargs = {
+            "weight": config.getvalue("mb_update_weight"),
+            "max_shift": config.getvalue("mb_update_max_shift"),
+            "max_drift": config.getvalue("mb_update_max_drift"),
+            "reservoir_size": config.getvalue("mb_reservoir_size"),
+        }
+        self.pending_updates = []
+        # Selecting changed tests carries forward the results of recorded runs.
+        self.record_history = config.getvalue("mb_history") or self.select == "changed"
+        self.drift_thresh = config.getvalue("mb_drift_thresh")
         self.results = []
         self.missing_references = []
+        self.report_paths = {
+            mb_export.JsonLinesWriter: config.getvalue("mb_report_json"),
+            mb_export.CsvWriter: config.getvalue("mb_report_csv"),
+        }
+        self.report_writers = []
+        # Results are attached as properties to the JUnit XML report, if any.
+        self.junit_xml = bool(config.getoption("xmlpath", None))
+        self.report_html = config.getvalue("mb_report_html")
+        self.show_live = config.getvalue("mb_live")
+        self.live = None
 
     @classmethod
     def _default_root(cls, session):
@@ -115,6 +505,7 @@ class PytestMarcabanca(object):
     def pytest_sessionstart(self, session):
 
         # Create root directory if necessary.
+        self.rootdir = str(session.config.rootdir)
         self.root = self.root or self._default_root(session)
         try:
             self.root.mkdir()
@@ -122,23 +513,199 @@ class PytestMarcabanca(object):
             pass
 
         # Initialize data manager.
-        self.data_manager = Manager(self.root)
+        self.data_manager = Manager(
+            self.root, min_machine_similarity=self.min_machine_similarity
+        )
+        if self.resume and self.data_manager.interrupted_session:
+            # Continue journaling completed tests under the interrupted session's id.
+            self.data_manager.session_id, self.resumed_tests = (
+                self.data_manager.interrupted_session
+            )
+
+        # Start the system noise monitor.
+        if self.noise_thresh is not None and self.which_tests != "none":
+            self.noise_monitor = NoiseMonitor(self.noise_thresh).start()
+
+        if self.show_live and self.which_tests != "none":
+            self.live = LiveDisplay(session.config)
+
+        # Open the machine-readable reports.
+        self.report_writers = [
+            _writer_type(_path)
+            for _writer_type, _path in self.report_paths.items()
+            if _path is not None
+        ]
 
     def pytest_sessionfinish(self, session, exitstatus):
         #
-        if (
-            self.create_references in ["overwrite", "missing"]
-            and self.data_manager.created_new_reference
-        ):
+        if self.live is not None:
+            self.live.stop()
+        if self.noise_monitor is not None:
+            self.noise_monitor.stop()
+        #
+        if self.which_tests != "none":
+            self.compute_qvalues()
+            self.apply_reference_updates()
+        if exitstatus == pytest.ExitCode.INTERRUPTED:
+            # The journal is kept, so that the next session recovers the created references and can resume this one.
+            self.data_manager.write_usage()
+            self.data_manager.close_journal()
+        elif self.data_manager.modified:
             self.data_manager.write()
+        else:
+            # Sessions that only used references leave the data files untouched.
+            self.data_manager.write_usage()
         #
+        if self.which_tests != "none":
+            self.write_final_records()
+            if self.enforce != "none":
+                self.enforce_exitstatus(session)
+        for _writer in self.report_writers:
+            _writer.close()
         if self.which_tests != "none":
             self.print_results(session.config.rootdir)
+            if self.report_html is not None and self.results:
+                self.write_html_report(self.report_html)
+
+    def write_final_records(self):
+        """
+        Streams a final record of each two-sample comparison to the machine-readable reports, once the session's q-values are computed. (The records streamed as results were produced are provisional, see :func:`~pytest_marcabanca.export.result_record`.)
+        """
+        for _result in self.results:
+            if _result.q_value is not None:
+                record = self.result_record(_result)
+                for _writer in self.report_writers:
+                    _writer.write(record)
+
+    def write_html_report(self, path):
+        """
+        Writes the session's results to an HTML report (see :mod:`pytest_marcabanca.htmlreport`), with links to the profiles of regressed tests.
+        """
+        report_dir = osp.dirname(osp.abspath(path))
+        mb_htmlreport.write_html(
+            path,
+            [
+                mb_htmlreport.summarize_test(
+                    _result.test_node_id
+                    + (f" [{_result.metric}]" if _result.metric else "")
+                    + (" (unchanged)" if _result.carried_forward else ""),
+                    _result.ref_model,
+                    _result.test_runtimes,
+                    self.data_manager.get_history(
+                        _result.test_node_id, metric=_result.metric
+                    ),
+                    regressed=self.is_regressed(_result),
+                    stats=[
+                        ("Rank", f"{_result.rank:.2%}"),
+                        ("Rltv", f"{_result.rltv_runtime:1.1f}X"),
+                        ("Abs", pghm.secs(_result.runtime)),
+                        ("Ref", pghm.secs(_result.model_mean)),
+                        (
+                            "q",
+                            (
+                                f"{_result.q_value:.3f}"
+                                if _result.q_value is not None
+                                else "-"
+                            ),
+                        ),
+                    ],
+                    profile=_result.profile_prefix
+                    and {
+                        # Links relative to the report's folder.
+                        "pstats": osp.relpath(
+                            _result.profile_prefix + ".pstats", report_dir
+                        ),
+                        "collapsed": osp.relpath(
+                            _result.profile_prefix + ".collapsed", report_dir
+                        ),
+                        "diff": _result.profile_diff,
+                    },
+                )
+                for _result in self.results
+            ],
+        )
+
+    def enforce_exitstatus(self, session):
+        """
+        Collects the session's regressions (judged on their q-values) and, with ``--mb-enforce=fail``, sets the session's exit status to :data:`REGRESSION_EXIT_CODE` if these are the only test failures. Regressed tests whose outcome was not changed by :meth:`pytest_runtest_makereport` (e.g., with interleaved scheduling, or when only significant after the q-values are computed) are counted as ``regressed`` in the terminal's summary line.
+        """
+        self.regressions = [
+            _result for _result in self.results if self.is_regressed(_result)
+        ]
+        late = {
+            _result.test_node_id: _result
+            for _result in self.regressions
+            if _result.test_node_id not in self.enforced_tests
+        }
+        if late and (
+            reporter := session.config.pluginmanager.get_plugin("terminalreporter")
+        ):
+            reporter.stats.setdefault("regressed", []).extend(late.values())
+        if (
+            self.enforce == "fail"
+            and self.regressions
+            and session.exitstatus in (pytest.ExitCode.OK, pytest.ExitCode.TESTS_FAILED)
+            and session.testsfailed <= len(self.enforced_tests)
+        ):
+            session.exitstatus = REGRESSION_EXIT_CODE
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.regressions:
+            return
+        terminalreporter.write_sep("=", "marcabanca performance regressions", red=True)
+        for _result in self.regressions:
+            terminalreporter.line(
+                _result.test_node_id
+                + (f" [{_result.metric}]" if _result.metric else "")
+                + f": {TestIsSlow(_result.rank, _result.rltv_runtime)}"
+                + (
+                    ""
+                    if _result.test_node_id in self.enforced_tests
+                    else " (found after the test was reported)"
+                )
+            )
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        """
+        Applies ``--mb-enforce`` to the call report of a test that passed but whose benchmark results regressed, so that each regressed test is counted once and tests that failed functionally keep their outcome. Two-sample comparisons are judged on the provisional rule of :meth:`is_regressed`, as q-values are only available at the end of the session.
+        """
+        report = (yield).get_result()
+        if (
+            self.enforce == "none"
+            or self._sampling_round
+            or call.when != "call"
+            or not report.passed
+            or hasattr(report, "wasxfail")
+        ):
+            return
+        regressed = [
+            _result
+            for _result in getattr(item, "_marcabanca_results", [])
+            if self.is_regressed(_result)
+        ]
+        if not regressed:
+            return
+        message = "Performance regression: " + "; ".join(
+            (f"[{_result.metric}] " if _result.metric else "")
+            + str(TestIsSlow(_result.rank, _result.rltv_runtime))
+            for _result in regressed
+        )
+        self.enforced_tests.add(item.nodeid)
+        if self.enforce == "fail":
+            report.outcome = "failed"
+            report.longrepr = message
+        elif self.enforce == "xfail":
+            report.outcome = "skipped"
+            report.wasxfail = message
+        else:
+            item.warn(RegressionWarning(message))
 
     def print_results(self, rootdir):
         from rich.console import Console
         from rich.table import Table
         from rich.text import Text
+        from rich.markup import escape
 
         # Specify table structure
         class ColumnSpec(
@@ -155,8 +722,13 @@ class PytestMarcabanca(object):
             ColumnSpec(
                 "Test",
                 "left",
-                lambda _result: _result.test_node_id,
-                lambda _value: osp.join(rel_cwd, _value),
+                lambda _result: (
+                    _result.test_node_id
+                    + (f" [{_result.metric}]" if _result.metric else "")
+                    + (" (unchanged)" if _result.carried_forward else "")
+                ),
+                # Escape brackets in parametrized test ids and metric labels.
+                lambda _value: escape(osp.join(rel_cwd, _value)),
                 np.mean,
             ),
             ColumnSpec(
@@ -183,26 +755,165 @@ class PytestMarcabanca(object):
             ColumnSpec(
                 "Machine",
                 "right",
-                lambda _result: _result.ref_model.reference_id["machine_config_id"],
-                clip_id := (lambda _value: _value[:7]),
-                lambda _x: "",
+                # Show the similarity of references from other machines.
+                lambda _result: (
+                    _result.ref_model.reference_id["machine_config_id"],
+                    (
+                        _result.machine_similarity
+                        if _result.reference_tier == "similar_machine"
+                        else None
+                    ),
+                ),
+                lambda _value: _value[0][:7]
+                + (f" ({_value[1]:.0%})" if _value[1] is not None else ""),
+                lambda _x: ("", None),
             ),
             ColumnSpec(
                 "Python",
                 "right",
                 lambda _result: _result.ref_model.reference_id["python_config_id"],
-                clip_id,
+                lambda _value: _value[:7],
                 lambda _x: "",
             ),
         ]
+        if self.comparison != "model":
+
+            def nanmean(_values):
+                # Avoids warnings when all values are missing.
+                return np.nan if np.all(np.isnan(_values)) else np.nanmean(_values)
+
+            columns[2:2] = [
+                # Carried-forward results have no q-value or effect size.
+                ColumnSpec(
+                    "q",
+                    "right",
+                    lambda _result: (
+                        np.nan if _result.q_value is None else _result.q_value
+                    ),
+                    lambda _value: "" if np.isnan(_value) else f"{_value:.3f}",
+                    nanmean,
+                ),
+                ColumnSpec(
+                    "Effect",
+                    "right",
+                    lambda _result: (
+                        np.nan if _result.effect_size is None else _result.effect_size
+                    ),
+                    lambda _value: "" if np.isnan(_value) else f"{_value:.2f}",
+                    nanmean,
+                ),
+            ]
+
+        if self.noise_monitor is not None:
+            columns[-2:-2] = [
+                ColumnSpec(
+                    "Noisy",
+                    "right",
+                    lambda _result: (
+                        (_result.noisy_samples, len(_result.test_runtimes))
+                        if _result.noisy_samples is not None
+                        else None
+                    ),
+                    lambda _value: f"{_value[0]}/{_value[1]}" if _value else "",
+                    lambda _x: None,
+                ),
+            ]
+
+        if any(_result.throughput is not None for _result in self.results):
+            columns[-2:-2] = [
+                ColumnSpec(
+                    "Thrpt",
+                    "right",
+                    lambda _result: (
+                        _result.throughput,
+                        _result.ref_model.work_unit_name,
+                    ),
+                    lambda _value: (
+                        f"{_value[0]:.3g} {_value[1]}/s"
+                        if _value[0] is not None
+                        else ""
+                    ),
+                    lambda _x: (None, None),
+                ),
+                ColumnSpec(
+                    "Ref Thrpt",
+                    "right",
+                    lambda _result: (
+                        _result.ref_throughput,
+                        _result.ref_model.work_unit_name,
+                    ),
+                    lambda _value: (
+                        f"{_value[0]:.3g} {_value[1]}/s"
+                        if _value[0] is not None
+                        else ""
+                    ),
+                    lambda _x: (None, None),
+                ),
+            ]
+
+        if any(_result.scaling for _result in self.results):
+
+            def max_efficiency(_scaling):
+                return mb_concurrency.scaling_efficiency(_scaling["curve"])[
+                    _scaling["curve"][-1]["workers"]
+                ]
+
+            columns[-2:-2] = [
+                ColumnSpec(
+                    "Scaling",
+                    "right",
+                    lambda _result: (
+                        (
+                            max_efficiency(_result.scaling),
+                            _result.scaling["curve"][-1]["workers"],
+                            _result.ref_model.scaling
+                            and max_efficiency(_result.ref_model.scaling),
+                        )
+                        if _result.scaling
+                        else None
+                    ),
+                    lambda _value: (
+                        f"{_value[0]:.0%}@{_value[1]}"
+                        + (f" ({_value[2]:.0%})" if _value[2] is not None else "")
+                        if _value
+                        else ""
+                    ),
+                    lambda _x: None,
+                ),
+            ]
+
+        if quantiles := sorted({_result.quantile for _result in self.results} - {None}):
+            q_label = f"p{quantiles[0]*100:g}" if len(quantiles) == 1 else "pXX"
+            columns[-2:-2] = [
+                ColumnSpec(
+                    f"Ref {q_label}",
+                    "right",
+                    lambda _result: (
+                        _result.ref_quantile,
+                        _result.ref_empirical_quantile,
+                    ),
+                    lambda _value: (
+                        f"{pghm.secs(_value[0])} ({pghm.secs(_value[1])})"
+                        if _value[0] is not None
+                        else ""
+                    ),
+                    lambda _x: (None, None),
+                ),
+                ColumnSpec(
+                    f"{q_label} Rltv",
+                    "right",
+                    lambda _result: (
+                        _result.test_quantile / _result.ref_quantile
+                        if _result.quantile is not None
+                        else np.nan
+                    ),
+                    lambda _value: "" if np.isnan(_value) else f"{_value:1.1f}X",
+                    np.nanmean,
+                ),
+            ]
 
         def row_style(_result):
-            return (
-                "red"
-                if _result.rank > self.rank_thresh
-                or _result.rltv_runtime > self.rltv_thresh
-                else "green"
-            )
+            return "red" if self.is_regressed(_result) else "green"
 
         # Create table structure
         table = Table(title="Marcabanca benchmarking results")
@@ -210,7 +921,18 @@ class PytestMarcabanca(object):
             table.add_column(_col.header, justify=_col.justify)
 
         # Add table content
-        results = sorted(self.results, key=lambda r: r.rank, reverse=True)
+        results = (
+            sorted(self.results, key=lambda r: r.rank, reverse=True)
+            if self.comparison == "model"
+            else sorted(
+                self.results,
+                key=lambda r: (
+                    (r.q_value, -r.effect_size)
+                    if r.q_value is not None
+                    else (np.inf, -r.rank)
+                ),
+            )
+        )
         for _result in results:
             table.add_row(
                 *[_col.get_formatted(_result) for _col in columns],
@@ -233,6 +955,23 @@ class PytestMarcabanca(object):
         console.print("\n")
         if results:
             console.print(table)
+        if results and quantiles:
+            # Model-predicted and (in parentheses) empirical reference quantiles.
+            quantiles_table = Table(title="Marcabanca reference quantiles")
+            quantiles_table.add_column("Test", justify="left")
+            for _result in results:
+                summary = _result.ref_model.quantile_summary()
+                if len(quantiles_table.columns) == 1:
+                    for _label in summary:
+                        quantiles_table.add_column(_label, justify="right")
+                quantiles_table.add_row(
+                    columns[0].get_formatted(_result),
+                    *[
+                        f"{pghm.secs(_model)} ({pghm.secs(_empirical)})"
+                        for _model, _empirical in summary.values()
+                    ],
+                )
+            console.print(quantiles_table)
 
         # Print warnings
         if self.missing_references:
@@ -252,6 +991,356 @@ class PytestMarcabanca(object):
                 f"MARCABANCA: {inexact}/{len(results)} tests ran with a mis-matched reference.",
                 style="red",
             )
+        if similar := sum(_x.reference_tier == "similar_machine" for _x in results):
+            console.print(
+                f"MARCABANCA: {similar}/{len(results)} tests ran with a reference from a similar machine (similarity shown in the Machine column).",
+                style="red",
+            )
+
+        if self.sampling_plans:
+            console.print(
+                f"MARCABANCA: Samples of {len(self.sampling_plans)} tests were interleaved in randomized order (seed={self.seed}).",
+            )
+        if self.noise_monitor is not None and (
+            self.num_discarded_samples or self.noise_wait
+        ):
+            console.print(
+                f"MARCABANCA: Sampling paused for {pghm.secs(self.noise_wait)} waiting for system noise to subside; {self.num_discarded_samples} noisy samples were discarded.",
+                style="yellow",
+            )
+        if carried := sum(bool(_x.carried_forward) for _x in results):
+            console.print(
+                f"MARCABANCA: {carried} tests with unchanged source dependencies were not benchmarked; the results of their last recorded runs were carried forward.",
+            )
+        if self.resumed_tests:
+            console.print(
+                f"MARCABANCA: Resumed an interrupted session; {len(self.resumed_tests)} tests completed by that session were deselected.",
+            )
+        if self.budget_plan is not None:
+            console.print(
+                f"MARCABANCA: Runs of {len(self.budget_plan)} tests were planned under a time budget of {pghm.secs(self.time_budget)}, of which {pghm.secs(self.fixed_cost)} were reserved for reference creation, concurrency and cold-start measurements"
+                + (
+                    f"; {len(self.unplanned_tests)} tests without a reference were not planned."
+                    if self.unplanned_tests
+                    else "."
+                ),
+            )
+            if self.planned_cost > self.time_budget:
+                console.print(
+                    f"MARCABANCA: The minimum planned benchmarking time of {pghm.secs(self.planned_cost)} exceeds the time budget.",
+                    style="yellow",
+                )
+            if self.loop_time is not None and self.loop_time > self.time_budget:
+                console.print(
+                    f"MARCABANCA: The tests took {pghm.secs(self.loop_time)}, exceeding the time budget of {pghm.secs(self.time_budget)} (planned: {pghm.secs(self.planned_cost)}).",
+                    style="red",
+                )
+        if self.reduced_tests:
+            console.print(
+                f"MARCABANCA: {len(self.reduced_tests)} tests got fewer runs than requested due to the time budget: "
+                + ", ".join(
+                    f"{_test_node_id} ({_runs}/{_requested})"
+                    for _test_node_id, _runs, _requested in self.reduced_tests
+                ),
+                style="yellow",
+            )
+        if self.failed_samplings:
+            console.print(
+                f"MARCABANCA: {len(self.failed_samplings)} tests failed while being sampled and were not benchmarked: {', '.join(self.failed_samplings)}",
+                style="red",
+            )
+        if self.stopped_samplings:
+            console.print(
+                f"MARCABANCA: {len(self.stopped_samplings)} tests were not benchmarked because the session was stopped before their interleaved samples were taken: {', '.join(self.stopped_samplings)}",
+                style="yellow",
+            )
+        if self.unsupported_cold_starts:
+            console.print(
+                f"MARCABANCA: Cold-start benchmarking was skipped for {len(self.unsupported_cold_starts)} tests with fixtures or parameters.",
+                style="yellow",
+            )
+        if self.failed_cold_starts:
+            console.print(
+                f"MARCABANCA: Cold-start benchmarking failed for {len(self.failed_cold_starts)} tests in a fresh interpreter: "
+                + ", ".join(
+                    f"{_test_node_id} ({_error})"
+                    for _test_node_id, _error in self.failed_cold_starts
+                ),
+                style="yellow",
+            )
+        for _result in results:
+            if _result.importtime_diff and self.is_regressed(_result):
+                console.print(
+                    f"MARCABANCA: Largest import time increases for '{_result.test_node_id}': "
+                    + ", ".join(
+                        f"{_module} (+{pghm.secs(_increase)})"
+                        for _module, _increase in _result.importtime_diff
+                    ),
+                    style="red",
+                )
+            if _result.profile_prefix:
+                console.print(
+                    f"MARCABANCA: Profile of regressed '{_result.test_node_id}' saved to '{_result.profile_prefix}.pstats' and '.collapsed'."
+                    + (
+                        " Largest self time increases per run: "
+                        + ", ".join(
+                            f"{_function} ({pghm.secs(_ref_time)} -> {pghm.secs(_test_time)})"
+                            for _function, _ref_time, _test_time in _result.profile_diff
+                        )
+                        if _result.profile_diff
+                        else ""
+                    ),
+                    style="red",
+                )
+
+        for test_node_id, shift, entry in self.detect_drifts():
+            console.print(
+                f"MARCABANCA: Runtime drift of {shift.ratio-1:+.1%} detected for '{test_node_id}' starting at run {shift.index} ({entry.kind}"
+                + (f", commit {entry.commit}" if entry.commit else "")
+                + f", {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry.timestamp))}).",
+                style="red",
+            )
+
+    def is_regressed(self, result):
+        """
+        Whether the result exceeds the rank (or, for two-sample comparisons, the false discovery rate), relative runtime, quantile or scaling efficiency thresholds. Carried-forward results are always compared using their rank.
+
+        Before the session-wide q-values are available (see :meth:`compute_qvalues`), two-sample comparisons are judged provisionally on the Bonferroni-corrected p-value, using the number of comparisons planned for the session. This correction bounds the q-value from above, so that provisionally regressed results remain regressed once q-values are computed, and results found significant by their q-values only are reported at the end of the session.
+        """
+        if self.comparison == "model" or result.carried_forward:
+            significant = result.rank > self.rank_thresh
+        elif result.q_value is None:
+            num_comparisons = max(
+                self.num_comparisons,
+                sum(_result.p_value is not None for _result in self.results),
+                1,
+            )
+            significant = result.p_value * num_comparisons <= self.fdr
+        else:
+            significant = result.q_value <= self.fdr
+        return (
+            significant
+            or result.rltv_runtime > self.rltv_thresh
+            or (
+                result.quantile is not None
+                and result.test_quantile / result.ref_quantile > result.quantile_thresh
+            )
+            or (
+                result.scaling_ratio is not None
+                and result.scaling_ratio < self.scaling_thresh
+            )
+        )
+
+    def compute_qvalues(self):
+        """
+        Sets the Benjamini-Hochberg q-values of all the session's results.
+        """
+        if self.comparison != "model":
+            compared = [
+                _result for _result in self.results if _result.p_value is not None
+            ]
+            qvalues = iter(
+                mb_stats.benjamini_hochberg([_result.p_value for _result in compared])
+            )
+            self.results = [
+                (
+                    _result._replace(q_value=float(next(qvalues)))
+                    if _result.p_value is not None
+                    else _result
+                )
+                for _result in self.results
+            ]
+
+    def apply_reference_updates(self):
+        """
+        Updates online (``--mb-update-references``) the references of the tests evaluated against an exact reference, unless any of their results is regressed. Called once the session's q-values are computed (see :meth:`compute_qvalues`), so that regressions found by their q-values only do not update the references.
+        """
+        regressed = {
+            (_result.test_node_id, _result.metric)
+            for _result in self.results
+            if self.is_regressed(_result)
+        }
+        for test_node_id, metric, runtimes, noise, ref_model in self.pending_updates:
+            if (test_node_id, metric) in regressed:
+                continue
+            self.data_manager.update_reference(
+                test_node_id,
+                runtimes,
+                metric=metric,
+                noise=noise,
+                **self.update_kwargs,
+            )
+            if ref_model.dependencies is not None:
+                # The updated reference describes the current sources.
+                ref_model.dependencies = mb_impact.hash_files(
+                    ref_model.dependencies, self.rootdir
+                )
+        self.pending_updates = []
+
+    def detect_drifts(self):
+        """
+        Searches the history of each benchmarked test for a level shift.
+
+        :return: A list of ``(test_node_id, level_shift, history_entry)`` tuples, where ``history_entry`` is the first entry at the new level.
+        """
+        out = []
+        for test_node_id, metric in sorted(
+            {(_result.test_node_id, _result.metric or "") for _result in self.results}
+        ):
+            history = self.data_manager.get_history(test_node_id, metric=metric or None)
+            if shift := find_level_shift(
+                [_entry.mean for _entry in history], min_shift=self.drift_thresh
+            ):
+                out.append(
+                    (
+                        test_node_id + (f" [{metric}]" if metric else ""),
+                        shift,
+                        history[shift.index],
+                    )
+                )
+        return out
+
+    def pytest_collection_modifyitems(self, session, config, items):
+        if self.resumed_tests:
+            deselected = [
+                _item for _item in items if _item.nodeid in self.resumed_tests
+            ]
+            if deselected:
+                items[:] = [
+                    _item for _item in items if _item.nodeid not in self.resumed_tests
+                ]
+                config.hook.pytest_deselected(items=deselected)
+        if self.comparison != "model":
+            self.plan_comparisons(items)
+        if self.time_budget is not None and self.which_tests != "none":
+            self.plan_budget(items)
+        if self.live is not None:
+            self.plan_live(items)
+
+    def plan_comparisons(self, items):
+        """
+        Counts the two-sample comparisons planned for the session (one per benchmarked item, plus one per cold-start benchmark), used by the provisional rule of :meth:`is_regressed`.
+        """
+        self.num_comparisons = 0
+        for _item in items:
+            options = self._item_options(_item)
+            if is_skipped(_item) or not self._is_benchmarked(options):
+                continue
+            self.num_comparisons += 1 + bool(options.get("cold_start", self.cold_start))
+
+    def plan_live(self, items):
+        """
+        Sets the reference means and planned samples of the benchmarked items in the live display, for the estimation of the remaining time.
+        """
+        means, num_samples = {}, {}
+        for _item in items:
+            options = self._item_options(_item)
+            if is_skipped(_item) or not self._is_benchmarked(options):
+                continue
+            test_node_id = _item.nodeid
+            _, ref_model = self.data_manager.get_reference_model(test_node_id)
+            means[test_node_id] = (
+                float(ref_model.model.stats("m")) if ref_model is not None else None
+            )
+            num_samples[test_node_id] = self._planned_test_runs(test_node_id, options)
+            if self.create_references == "overwrite" or (
+                self.create_references == "missing" and ref_model is None
+            ):
+                num_samples[test_node_id] += self.num_ref_runs
+        self.live.plan(means, num_samples)
+
+    def plan_budget(self, items):
+        """
+        Plans the number of test runs of each benchmarked item under the ``--mb-time-budget`` (see :func:`~pytest_marcabanca.budget.allocate_runs`), using the mean of the item's reference model as the cost of a run.
+
+        Costs that do not depend on the number of test runs are deducted from the budget first (see :meth:`_fixed_cost`). Tests without any reference are not planned, but their reference creation is deducted using the median cost of a run of the planned tests. Sets :attr:`planned_cost` to the total estimated cost, which exceeds the budget when the fixed costs and the minimum runs of each test do not fit.
+        """
+        costs, priorities, requested = {}, {}, {}
+        fixed_cost = 0.0
+        num_unplanned_references = 0
+        for _item in items:
+            options = self._item_options(_item)
+            if is_skipped(_item) or not self._is_benchmarked(options):
+                continue
+            test_node_id = _item.nodeid
+            _, ref_model = self.data_manager.get_reference_model(test_node_id)
+            if ref_model is None:
+                self.unplanned_tests.append(test_node_id)
+                if self.create_references != "none":
+                    num_unplanned_references += 1
+                continue
+            costs[test_node_id] = float(ref_model.model.stats("m"))
+            requested[test_node_id] = self._requested_test_runs(options)
+            history = [
+                _entry
+                for _entry in self.data_manager.get_history(test_node_id)
+                if _entry.kind == "test"
+            ]
+            priorities[test_node_id] = mb_budget.sampling_priority(
+                ref_model.runtimes,
+                history[-1] if history else None,
+                rank_thresh=self.rank_thresh,
+                rltv_thresh=self.rltv_thresh,
+            )
+            fixed_cost += self._fixed_cost(test_node_id, options, ref_model)
+        if costs and num_unplanned_references:
+            fixed_cost += (
+                num_unplanned_references
+                * float(np.median(list(costs.values())))
+                * (1 + self.num_ref_runs + (self.profile_runs if self.profile else 0))
+            )
+
+        self.budget_plan = mb_budget.allocate_runs(
+            costs,
+            priorities,
+            requested,
+            self.time_budget - fixed_cost,
+            max_runs=self.max_test_runs,
+        )
+        self.fixed_cost = fixed_cost
+        self.planned_cost = fixed_cost + sum(
+            costs[_test_node_id] * (1 + _runs)
+            for _test_node_id, _runs in self.budget_plan.items()
+        )
+        self.reduced_tests = [
+            (_test_node_id, _runs, requested[_test_node_id])
+            for _test_node_id, _runs in self.budget_plan.items()
+            if _runs < requested[_test_node_id]
+        ]
+
+    def _fixed_cost(self, test_node_id, options, ref_model):
+        """
+        Estimates the benchmarking time of a test that does not depend on its number of test runs: reference creation runs (including reference profiling runs with ``--mb-profile``), concurrency scaling measurements (see :func:`~pytest_marcabanca.budget.scaling_cost`) and cold-start measurements (if the test has a cold-start reference). Profiles of regressions are not known in advance and are not included.
+        """
+        cost = float(ref_model.model.stats("m"))
+        num_measurements = 1
+        out = 0.0
+        if self.create_references == "overwrite" or (
+            self.create_references == "missing"
+            and not self.data_manager.check_reference_exists(test_node_id)
+        ):
+            num_measurements += 1
+            out += cost * (
+                self.num_ref_runs + (self.profile_runs if self.profile else 0)
+            )
+        if ladder := options.get("concurrency", self.concurrency):
+            out += num_measurements * mb_budget.scaling_cost(
+                cost,
+                ladder,
+                self.concurrency_calls,
+                ref_model.scaling["curve"] if ref_model.scaling else None,
+            )
+        if options.get("cold_start", self.cold_start):
+            _, cold_model = self.data_manager.get_reference_model(
+                test_node_id, mb_coldstart.METRIC
+            )
+            if cold_model is not None:
+                out += (
+                    (1 + (self.create_references == "overwrite"))
+                    * (self.num_cold_runs + (1 if self.importtime else 0))
+                    * float(cold_model.model.stats("m"))
+                )
+        return out
 
     def pytest_runtest_call(self, item):
         """
@@ -259,71 +1348,753 @@ class PytestMarcabanca(object):
         """
         if is_skipped(item):
             return
-        orig_runtest = item.runtest
-        item.runtest = lambda: self._item_runtest_wrapper(item, orig_runtest)
+        # Items are run more than once with interleaved scheduling: keep the original.
+        if not hasattr(item, "_marcabanca_runtest"):
+            item._marcabanca_runtest = item.runtest
+        item.runtest = lambda: self._item_runtest(item)
+
+    def _item_runtest(self, item):
+        """
+        Runs the benchmarked item, keeps the results it produces for ``--mb-enforce`` (see :meth:`pytest_runtest_makereport`), and attaches their key metrics as JUnit XML properties. (Results of interleaved sampling rounds are only available after all tests have been reported.)
+        """
+        num_results = len(self.results)
+        self._item_runtest_wrapper(item, item._marcabanca_runtest)
+        if (
+            self.live is not None
+            and not (self._sampling_round or self._profile_round)
+            and item.nodeid not in self.sampling_plans
+        ):
+            self.live.end(item.nodeid)
+        item._marcabanca_results = self.results[num_results:]
+        if self.junit_xml:
+            for _result in item._marcabanca_results:
+                item.user_properties.extend(
+                    mb_export.junit_properties(
+                        self.result_record(_result, quantiles=False)
+                    )
+                )
+
+    def result_record(self, result, quantiles=True):
+        """
+        Returns the machine-readable record of the result (see :func:`~pytest_marcabanca.export.result_record`).
+        """
+        return mb_export.result_record(
+            result,
+            self.is_regressed(result),
+            {
+                "comparison": self.comparison,
+                "rank_thresh": self.rank_thresh,
+                "fdr": self.fdr,
+                "rltv_thresh": self.rltv_thresh,
+                "scaling_thresh": self.scaling_thresh,
+            },
+            quantiles=quantiles,
+        )
+
+    def _add_result(self, result):
+        """
+        Stores the result and streams it to the machine-readable reports.
+        """
+        self.results.append(result)
+        if self.live is not None and self.is_regressed(result):
+            self.live.add_regression(
+                result.test_node_id + (f" [{result.metric}]" if result.metric else "")
+            )
+        if self.report_writers:
+            record = self.result_record(result)
+            for _writer in self.report_writers:
+                _writer.write(record)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtestloop(self, session):
+        """
+        Runs the interleaved sampling rounds (see :meth:`_run_sampling_rounds`) after all tests were reported, unless the test loop was interrupted (e.g., by ``-x``, ``--maxfail``, collection errors or Ctrl-C). Also measures the time taken by the test loop, which is compared to ``--mb-time-budget`` in the report.
+        """
+        start = time.perf_counter()
+        outcome = yield
+        if self.schedule == "interleaved" and self.sampling_plans:
+            if outcome.excinfo is None and not self._stopped(session):
+                self._run_sampling_rounds(session)
+            else:
+                self._end_samplings()
+        self.loop_time = time.perf_counter() - start
+
+    @staticmethod
+    def _stopped(session):
+        return bool(session.shouldstop or session.shouldfail)
+
+    def _next_sampling_round(self, rng, running=None):
+        """
+        Returns the plans with pending samples in randomized order, not counting the sample being taken by the ``running`` plan.
+        """
+        out = [
+            _plan
+            for _plan in self.sampling_plans.values()
+            if _plan.remaining - (_plan is running) > 0
+        ]
+        rng.shuffle(out)
+        return out
+
+    def _run_sampling_rounds(self, session):
+        """
+        Takes the samples of all scheduled tests in randomized round-robin order. Each round runs the full test protocol (including fixture setup and teardown) of each test with pending samples once, without reporting it, and times a single call of the test. Rounds stop early if the session is stopped.
+
+        The order of each round is drawn before the last test of the previous round runs, so that fixtures shared with the next test to run are kept. For this reason, a test that fails in the last run of a round still runs at the start of the next round if it was drawn first.
+        """
+        rng = random.Random(self.seed)
+        self._sampling_round = True
+        try:
+            order = self._next_sampling_round(rng)
+            while order and not self._stopped(session):
+                next_order = []
+                for k, _plan in enumerate(order):
+                    if self._stopped(session):
+                        break
+                    if _plan.failed and k > 0:
+                        continue
+                    if not (pending := [_x for _x in order[k + 1 :] if not _x.failed]):
+                        pending = next_order = self._next_sampling_round(
+                            rng, running=_plan
+                        )
+                    reports = runtestprotocol(
+                        _plan.item,
+                        log=False,
+                        nextitem=pending[0].item if pending else None,
+                    )
+                    if any(_report.failed for _report in reports):
+                        # Drop tests that fail while sampling.
+                        _plan.failed = True
+                order = next_order
+        finally:
+            self._sampling_round = False
+
+        self._end_samplings()
+
+        if self.profile and not self._stopped(session):
+            # Profile regressed tests in a final round. All comparisons are done, so that
+            # regressions are judged on their q-values.
+            self.compute_qvalues()
+            regressed_ids = {
+                _result.test_node_id
+                for _result in self.results
+                if _result.metric is None and self.is_regressed(_result)
+            }
+            regressed = [
+                _plan
+                for _plan in self.sampling_plans.values()
+                if _plan.result is not None and _plan.item.nodeid in regressed_ids
+            ]
+            self._profile_round = True
+            try:
+                for k, _plan in enumerate(regressed):
+                    runtestprotocol(
+                        _plan.item,
+                        log=False,
+                        nextitem=(
+                            regressed[k + 1].item if k + 1 < len(regressed) else None
+                        ),
+                    )
+            finally:
+                self._profile_round = False
+
+    def _end_samplings(self):
+        """
+        Evaluates the completed sampling plans, and records those that failed or that were not completed because the session was stopped.
+        """
+        for _plan in self.sampling_plans.values():
+            if _plan.failed:
+                self.failed_samplings.append(_plan.item.nodeid)
+            elif _plan.remaining:
+                self.stopped_samplings.append(_plan.item.nodeid)
+            else:
+                self._finalize_runtimes(_plan)
+                continue
+            if self.live is not None:
+                self.live.end(_plan.item.nodeid)
 
     def _item_runtest_wrapper(self, item, item_runtest):
 
+        if self._profile_round:
+            self._profile_regression(
+                item_runtest, self.sampling_plans[item.nodeid].result
+            )
+            return
+
+        if self._sampling_round:
+            # Interleaved sampling rounds take a single timed sample.
+            noise = []
+            if self.live is not None:
+                plan = self.sampling_plans[item.nodeid]
+                self.live.begin(
+                    item.nodeid,
+                    "interleaved",
+                    plan.num_ref_runs + plan.num_test_runs,
+                    num_done=len(plan.ref_runtimes) + len(plan.test_runtimes),
+                )
+            self.sampling_plans[item.nodeid].add(
+                self._time_runs(item_runtest, 1, noise), noise
+            )
+            return
+
+        options = self._item_options(item)
+
         # The first run loads all modules, avoiding overhead when measuring run times.
+        # When creating references, it also records the source files executed by the test.
         # TODO: Convert this into an option.
-        item_runtest()
+        dependencies = None
+        if self.create_references != "none" and self._is_benchmarked(options):
+            dependencies = mb_impact.trace_dependencies(item_runtest, self.rootdir)
+        else:
+            item_runtest()
 
-        is_decorated = hasattr(item.function, "_marcabanca")
-        do_benchmark = is_decorated and item.function._marcabanca["benchmark"]
-        if (self.which_tests == "all" and (not is_decorated or do_benchmark)) or (
-            self.which_tests == "decorated" and do_benchmark
-        ):
+        work_units = self._item_work_units(item, options)
+        if self._is_benchmarked(options):
 
             # Use the whole nodeid so you can copy/paste it to run the test
             test_node_id = item.nodeid
+            quantile = options.get("quantile", self.quantile)
+            ladder = options.get("concurrency", self.concurrency)
+            concurrency_kind = options.get("concurrency_kind", self.concurrency_kind)
+            plan = _SamplingPlan(
+                item,
+                num_test_runs=self._planned_test_runs(test_node_id, options),
+                reference_kwargs={"work_units": work_units},
+                evaluate_kwargs={
+                    "quantile": quantile,
+                    "quantile_thresh": options.get(
+                        "quantile_thresh", self.quantile_thresh
+                    ),
+                    "work_units": work_units[0] if work_units else None,
+                },
+            )
 
             # Create reference
             if self.create_references == "overwrite" or (
                 self.create_references == "missing"
                 and not self.data_manager.check_reference_exists(test_node_id)
             ):
+                plan.num_ref_runs = self.num_ref_runs
+                if quantile is not None:
+                    # Ensure the reference's empirical quantile is observable.
+                    plan.num_ref_runs = min(
+                        max(
+                            plan.num_ref_runs, mb_stats.min_runs_for_quantile(quantile)
+                        ),
+                        self.max_test_runs,
+                    )
+                plan.reference_kwargs["dependencies"] = dependencies
 
-                # Assemble ref_runtimes test
-                ref_runtimes = []
-                for k in range(self.num_ref_runs):
-                    with pgprof.Time() as timer:
-                        item_runtest()
-                    ref_runtimes.append(timer.elapsed)
-
-                # Create reference model
-                self.data_manager.create_reference(
-                    test_node_id, ref_runtimes, self.model_name
-                )
+            elif self.select == "changed" and (
+                result := self._carry_forward(test_node_id)
+            ):
+                # The test's source dependencies did not change.
+                self._add_result(result)
+                return
 
             elif self.data_manager.get_reference_model(test_node_id) == (None, None):
                 # A reference did not exist and was not created.
                 self.missing_references.append(test_node_id)
                 return
 
-            # Capture test run times
-            test_runtimes = []
-            for k in range(self.num_test_runs):
-                with pgprof.Time() as test_timer:
+            if plan.num_ref_runs and self.profile:
+                plan.reference_kwargs["profile"] = self._profile_reference(
+                    item_runtest, test_node_id
+                )
+
+            if self.schedule == "interleaved":
+                # Samples are taken after all tests have run (see pytest_runtestloop).
+                if ladder:
+                    if plan.num_ref_runs:
+                        plan.reference_kwargs["scaling"] = self._measure_scaling(
+                            item_runtest, ladder, concurrency_kind
+                        )
+                    plan.evaluate_kwargs["scaling"] = self._measure_scaling(
+                        item_runtest, ladder, concurrency_kind
+                    )
+                self.sampling_plans[test_node_id] = plan
+            else:
+                if plan.num_ref_runs:
+                    if self.live is not None:
+                        self.live.begin(test_node_id, "reference", plan.num_ref_runs)
+                    plan.ref_runtimes = self._time_runs(
+                        item_runtest, plan.num_ref_runs, plan.ref_noise
+                    )
+                    plan.reference_kwargs["scaling"] = ladder and self._measure_scaling(
+                        item_runtest, ladder, concurrency_kind
+                    )
+                    self._create_runtime_reference(plan)
+
+                # Capture test run times
+                if self.live is not None:
+                    _, ref_model = self.data_manager.get_reference_model(test_node_id)
+                    self.live.begin(
+                        test_node_id,
+                        "test",
+                        (
+                            plan.num_test_runs
+                            if quantile is None
+                            else (self.budget_plan or {}).get(
+                                test_node_id, self.max_test_runs
+                            )
+                        ),
+                        ref_model=ref_model,
+                    )
+                if quantile is None:
+                    plan.test_runtimes = self._time_runs(
+                        item_runtest, plan.num_test_runs, plan.test_noise
+                    )
+                else:
+                    plan.test_runtimes = self._time_runs_for_quantile(
+                        item_runtest,
+                        quantile,
+                        plan.test_noise,
+                        # The budget caps adaptive sampling.
+                        max_runs=(self.budget_plan or {}).get(test_node_id),
+                    )
+                plan.evaluate_kwargs["scaling"] = ladder and self._measure_scaling(
+                    item_runtest, ladder, concurrency_kind
+                )
+                result = self._evaluate(
+                    test_node_id,
+                    plan.test_runtimes,
+                    noise=self._plan_noise(plan.test_noise),
+                    **plan.evaluate_kwargs,
+                )
+                if self.profile and result is not None and self.is_regressed(result):
+                    self._profile_regression(item_runtest, result)
+
+            if options.get("cold_start", self.cold_start):
+                self._benchmark_cold_start(item, test_node_id)
+            if self.schedule != "interleaved":
+                self._journal_completed(test_node_id)
+
+    def _carry_forward(self, test_node_id):
+        """
+        Returns a :class:`Result` carried forward from the last run of the test recorded with the test's exact reference id, provided that the test's exact reference records source dependencies that are all unchanged and that the run was recorded after the reference was created. Returns ``None`` otherwise.
+        """
+        if not (
+            posn_reference := self.data_manager.check_reference_exists(test_node_id)
+        ):
+            return None
+        ref_model = posn_reference[1]
+        if ref_model.dependencies is None or mb_impact.changed_files(
+            ref_model.dependencies, self.rootdir
+        ):
+            return None
+        # Runs recorded under other python configs are not comparable.
+        history = [
+            _entry
+            for _entry in self.data_manager.get_history(test_node_id)
+            if _entry.reference_id == ref_model.reference_id
+        ]
+        if not history or (entry := history[-1]).kind != "test":
+            return None
+        self.data_manager.mark_used(ref_model)
+        return Result(
+            test_node_id=test_node_id,
+            exact=True,
+            reference_tier="exact",
+            machine_similarity=1.0,
+            rank=entry.rank,
+            runtime=entry.mean,
+            rltv_runtime=entry.rltv_runtime,
+            model_mean=ref_model.model.stats("m"),
+            empirical_mean=np.mean(ref_model.runtimes),
+            ref_model=ref_model,
+            test_runtimes=[],
+            carried_forward=True,
+        )
+
+    def _profile_reference(self, item_runtest, test_node_id):
+        """
+        Profiles the test for the reference being created (see :func:`~pytest_marcabanca.profiles.save_profile`).
+
+        :return: The reference's profile description.
+        """
+        mb_profiles.save_profile(
+            mb_profiles.profile_runs(item_runtest, self.profile_runs),
+            mb_profiles.profile_prefix(
+                str(self.root),
+                self.data_manager.build_reference_id(test_node_id),
+                "reference",
+            ),
+        )
+        return {"num_runs": self.profile_runs}
+
+    def _profile_regression(self, item_runtest, result):
+        """
+        Profiles a regressed test, and adds the profile's location and its diff relative to the reference's profile (if any) to the test's result.
+
+        Tests run sequentially are profiled right after their comparison, so two-sample comparisons are judged by the provisional rule of :meth:`is_regressed`: profiled tests remain regressed once q-values are computed, but tests only found significant by their q-values are not profiled. Interleaved tests are profiled after all comparisons, using their q-values.
+        """
+        stats = mb_profiles.profile_runs(item_runtest, self.profile_runs)
+        ref_model = result.ref_model
+        prefix = mb_profiles.profile_prefix(
+            str(self.root), ref_model.reference_id, "regressed"
+        )
+        mb_profiles.save_profile(stats, prefix)
+        profile_diff = None
+        if ref_model.profile and (
+            ref_stats := mb_profiles.load_profile(
+                mb_profiles.profile_prefix(
+                    str(self.root), ref_model.reference_id, "reference"
+                )
+            )
+        ):
+            profile_diff = mb_profiles.diff_top_functions(
+                ref_stats,
+                ref_model.profile["num_runs"],
+                stats,
+                self.profile_runs,
+            )
+        # Results may have been replaced since (e.g., by compute_qvalues).
+        self.results = [
+            (
+                _result._replace(profile_prefix=prefix, profile_diff=profile_diff)
+                if (_result.test_node_id, _result.metric)
+                == (result.test_node_id, result.metric)
+                else _result
+            )
+            for _result in self.results
+        ]
+
+    def _create_runtime_reference(self, plan):
+        self.data_manager.create_reference(
+            plan.item.nodeid,
+            plan.ref_runtimes,
+            self.model_name,
+            noise=self._plan_noise(plan.ref_noise),
+            **plan.reference_kwargs,
+        )
+
+    def _plan_noise(self, noise):
+        # Annotations are only stored when the noise monitor is enabled.
+        return noise if self.noise_monitor is not None else None
+
+    def _finalize_runtimes(self, plan):
+        """
+        Creates the reference (if requested) and evaluates the test runtimes of a test sampled in interleaved sampling rounds.
+        """
+        if plan.num_ref_runs:
+            self._create_runtime_reference(plan)
+        plan.result = self._evaluate(
+            plan.item.nodeid,
+            plan.test_runtimes,
+            noise=self._plan_noise(plan.test_noise),
+            **plan.evaluate_kwargs,
+        )
+        self._journal_completed(plan.item.nodeid)
+        if self.live is not None:
+            self.live.end(plan.item.nodeid)
+
+    def _journal_completed(self, test_node_id):
+        # Only sessions creating references can be resumed.
+        if self.create_references != "none":
+            self.data_manager.journal_completed(test_node_id)
+
+    def _benchmark_cold_start(self, item, test_node_id):
+        """
+        Creates (if requested) the cold-start reference of the test and evaluates the test's cold-start cost against it.
+        """
+        metric = mb_coldstart.METRIC
+        try:
+            script = mb_coldstart.build_script(item)
+        except mb_coldstart.ColdStartUnsupported as err:
+            self.unsupported_cold_starts.append((test_node_id, str(err)))
+            return
+        cwd = str(item.config.rootdir)
+
+        def measure():
+            runtimes = [
+                sum(mb_coldstart.measure_cold_start(script, cwd).values())
+                for _ in range(self.num_cold_runs)
+            ]
+            importtime = self.importtime and mb_coldstart.measure_importtime(
+                script, cwd
+            )
+            return runtimes, importtime or None
+
+        try:
+            if self.create_references == "overwrite" or (
+                self.create_references == "missing"
+                and not self.data_manager.check_reference_exists(test_node_id, metric)
+            ):
+                ref_runtimes, ref_importtime = measure()
+                self.data_manager.create_reference(
+                    test_node_id,
+                    ref_runtimes,
+                    self.model_name,
+                    importtime=ref_importtime,
+                    metric=metric,
+                )
+            elif self.data_manager.get_reference_model(test_node_id, metric) == (
+                None,
+                None,
+            ):
+                self.missing_references.append(f"{test_node_id} [{metric}]")
+                return
+
+            test_runtimes, importtime = measure()
+        except mb_coldstart.ColdStartFailed as err:
+            # The test passed under pytest, so its outcome is kept.
+            self.failed_cold_starts.append((test_node_id, str(err)))
+            return
+        self._evaluate(
+            test_node_id, test_runtimes, metric=metric, importtime=importtime
+        )
+
+    def _measure_scaling(self, item_runtest, ladder, kind):
+        """
+        Returns a scaling curve (see :func:`~pytest_marcabanca.concurrency.measure_scaling`) tagged with the kind of concurrent worker. The noise monitor is stopped while processes are forked, as its thread could hold locks that the forked workers inherit.
+        """
+        pause_monitor = kind == "process" and self.noise_monitor is not None
+        if pause_monitor:
+            self.noise_monitor.stop()
+        try:
+            return {
+                "kind": kind,
+                "curve": mb_concurrency.measure_scaling(
+                    item_runtest, ladder, self.concurrency_calls, kind
+                ),
+            }
+        finally:
+            if pause_monitor:
+                self.noise_monitor.start()
+
+    def _is_benchmarked(self, options):
+        """
+        Whether a test with the specified :meth:`_item_options` is benchmarked as per the ``--mb`` option.
+        """
+        do_benchmark = options.get("benchmark")
+        return bool(
+            (self.which_tests == "all" and do_benchmark is not False)
+            or (self.which_tests == "decorated" and do_benchmark)
+        )
+
+    def _requested_test_runs(self, options):
+        """
+        Returns the number of test runs requested for a test with the specified :meth:`_item_options`, increased as needed to observe the test's quantile (if any).
+        """
+        if (quantile := options.get("quantile", self.quantile)) is None:
+            return self.num_test_runs
+        return min(
+            max(self.num_test_runs, mb_stats.min_runs_for_quantile(quantile)),
+            self.max_test_runs,
+        )
+
+    def _planned_test_runs(self, test_node_id, options):
+        """
+        Returns the number of test runs planned for the test under the time budget or, for tests without a plan, the requested number of runs.
+        """
+        if self.budget_plan and test_node_id in self.budget_plan:
+            return self.budget_plan[test_node_id]
+        return self._requested_test_runs(options)
+
+    @staticmethod
+    def _item_options(item):
+        """
+        Returns the options set with the :func:`marcabanca.benchmark` decorator, or an empty dictionary for undecorated tests.
+        """
+        return getattr(getattr(item, "function", None), "_marcabanca", {})
+
+    @staticmethod
+    def _item_work_units(item, options):
+        """
+        Returns the ``(work_units, work_unit_name)`` declared for each run of the test using the :func:`mb_work_units` fixture or the :func:`marcabanca.benchmark` decorator, or ``None`` if no work units were declared.
+        """
+        if declared := getattr(item, "_marcabanca_work_units", None):
+            return declared
+        if (work_units := options.get("work_units")) is None:
+            return None
+        if callable(work_units):
+            # Pass in the requested fixture values.
+            params = inspect.signature(work_units).parameters
+            work_units = work_units(
+                **{
+                    _key: _val
+                    for _key, _val in getattr(item, "funcargs", {}).items()
+                    if _key in params
+                }
+            )
+        return work_units, options.get("work_unit_name", "items")
+
+    def _time_runs(self, item_runtest, num_runs, noise=None):
+        """
+        Runs the test the specified number of times and returns the measured runtimes.
+
+        With the noise monitor enabled, each run is preceded by a pause while the system is noisy, and noisy runs are retaken if ``--mb-noise-action='discard'`` (up to twice per requested run, after which they are kept).
+
+        :param noise: Optional list extended with the noise annotation of each returned runtime.
+        """
+        runtimes = []
+        max_attempts = 3 * num_runs
+        num_attempts = 0
+        while len(runtimes) < num_runs:
+            num_attempts += 1
+            if self.noise_monitor is None:
+                with pgprof.Time() as timer:
+                    item_runtest()
+                runtimes.append(timer.elapsed)
+                if self.live is not None:
+                    self.live.add_sample(timer.elapsed)
+                continue
+
+            self.noise_wait += self.noise_monitor.wait_until_quiet(self.noise_max_wait)
+            with self.noise_monitor.sample() as annotation:
+                with pgprof.Time() as timer:
                     item_runtest()
-                test_runtimes.append(test_timer.elapsed)
-            mean_test_time = np.mean(test_runtimes)
+            if (
+                annotation["noisy"]
+                and self.noise_action == "discard"
+                and num_attempts < max_attempts
+            ):
+                self.num_discarded_samples += 1
+                continue
+            runtimes.append(timer.elapsed)
+            if noise is not None:
+                noise.append(annotation)
+            if self.live is not None:
+                self.live.add_sample(timer.elapsed)
+        return runtimes
+
+    def _time_runs_for_quantile(
+        self, item_runtest, quantile, noise=None, rtol=0.05, max_runs=None
+    ):
+        """
+        Adaptively samples runtimes in batches of ``--mb-num-test-runs`` until at least :func:`~pytest_marcabanca.stats.min_runs_for_quantile` runs have been carried out and the empirical quantile changes by less than ``rtol`` between batches, or until ``max_runs`` (by default, ``--mb-max-test-runs``) runs have been carried out.
+        """
+        max_runs = max_runs or self.max_test_runs
+        min_runs = mb_stats.min_runs_for_quantile(quantile)
+        batch_size = max(1, min(self.num_test_runs, max_runs))
+        runtimes = self._time_runs(item_runtest, batch_size, noise)
+        estimate = np.quantile(runtimes, quantile)
+        while len(runtimes) < max_runs:
+            runtimes += self._time_runs(
+                item_runtest,
+                min(batch_size, max_runs - len(runtimes)),
+                noise,
+            )
+            prev_estimate, estimate = estimate, np.quantile(runtimes, quantile)
+            if len(runtimes) >= min_runs and abs(estimate / prev_estimate - 1) < rtol:
+                break
+        return runtimes
+
+    def _evaluate(
+        self,
+        test_node_id,
+        test_runtimes,
+        quantile=None,
+        quantile_thresh=None,
+        work_units=None,
+        scaling=None,
+        metric=None,
+        importtime=None,
+        noise=None,
+    ):
+        """
+        Compares the test runtimes to the test's reference, stores the :class:`Result` and carries out any requested reference update and history recording.
+
+        :param quantile: Optional quantile (e.g., 0.99) of the test runtimes to compare to the reference model's quantile.
+        :param quantile_thresh: Threshold applied to the ratio of the test runtime quantile to the reference quantile.
+        :param work_units: Optional units of work carried out by each test run. If both the test and the reference declare work units, test runtimes are normalized to the reference's work units, so that all comparisons are in terms of throughput.
+        :param scaling: Optional scaling curve (see :meth:`_measure_scaling`) to compare to the reference's scaling curve.
+        :param metric: The measured quantity, if not the test runtime (see :meth:`~pytest_marcabanca.utils.Manager.build_reference_id`).
+        :param importtime: Optional ``-X importtime`` breakdown to compare to the reference's.
+        :param noise: Optional system noise annotations of the test runtimes (see :meth:`_time_runs`).
+        """
+        tier, ref_model, machine_similarity = self.data_manager.get_reference_match(
+            test_node_id, metric
+        )
+        if ref_model is None:
+            return None
+        exact = tier == "exact"
+        self.data_manager.mark_used(ref_model)
 
-            # Compute results
-            exact, ref_model = self.data_manager.get_reference_model(test_node_id)
+        raw_runtimes = test_runtimes
+        if work_units and ref_model.work_units:
+            test_runtimes = [
+                _runtime * ref_model.work_units / work_units
+                for _runtime in raw_runtimes
+            ]
 
-            if ref_model is not None:
-                rank = np.mean(
-                    [ref_model.rank_runtime(_runtime) for _runtime in test_runtimes]
+        mean_test_time = np.mean(test_runtimes)
+        result = Result(
+            test_node_id=test_node_id,
+            rank=np.mean(
+                [ref_model.rank_runtime(_runtime) for _runtime in test_runtimes]
+            ),
+            exact=exact,
+            runtime=np.mean(raw_runtimes),
+            rltv_runtime=(mean_test_time / ref_model.model.stats("m")),
+            model_mean=ref_model.model.stats("m"),
+            empirical_mean=np.mean(ref_model.runtimes),
+            ref_model=ref_model,
+            test_runtimes=list(test_runtimes),
+            metric=metric,
+            reference_tier=tier,
+            machine_similarity=machine_similarity,
+            noisy_samples=(
+                sum(_x["noisy"] for _x in noise) if noise is not None else None
+            ),
+        )
+        if importtime and ref_model.importtime:
+            result = result._replace(
+                importtime_diff=mb_coldstart.diff_importtime(
+                    importtime, ref_model.importtime
                 )
-                self.results.append(
-                    Result(
-                        test_node_id=test_node_id,
-                        rank=rank,
-                        exact=exact,
-                        runtime=mean_test_time,
-                        rltv_runtime=(mean_test_time / ref_model.model.stats("m")),
-                        model_mean=ref_model.model.stats("m"),
-                        empirical_mean=np.mean(ref_model.runtimes),
-                        ref_model=ref_model,
+            )
+        if work_units:
+            result = result._replace(
+                work_units=work_units,
+                throughput=work_units / np.mean(raw_runtimes),
+                ref_throughput=ref_model.mean_throughput(),
+            )
+        if scaling:
+            result = result._replace(
+                scaling=scaling,
+                scaling_ratio=(
+                    mb_concurrency.efficiency_ratio(
+                        scaling["curve"], ref_model.scaling["curve"]
                     )
+                    if ref_model.scaling
+                    and ref_model.scaling["kind"] == scaling["kind"]
+                    else None
+                ),
+            )
+        if quantile is not None:
+            result = result._replace(
+                quantile=quantile,
+                quantile_thresh=quantile_thresh,
+                test_quantile=float(np.quantile(test_runtimes, quantile)),
+                ref_quantile=float(ref_model.quantiles([quantile])[0]),
+                ref_empirical_quantile=float(
+                    ref_model.empirical_quantiles([quantile])[0]
+                ),
+            )
+        if self.comparison != "model":
+            result = result._replace(
+                p_value=mb_stats.COMPARISONS[self.comparison](
+                    test_runtimes, ref_model.runtimes
+                ),
+                effect_size=mb_stats.common_language_effect_size(
+                    test_runtimes, ref_model.runtimes
+                ),
+            )
+        self._add_result(result)
+
+        if self.update_references and exact:
+            # Applied once the session's q-values are known (see apply_reference_updates).
+            self.pending_updates.append(
+                (test_node_id, metric, test_runtimes, noise, ref_model)
+            )
+        if self.record_history:
+            self.data_manager.append_history(
+                HistoryEntry.from_runtimes(
+                    "test",
+                    self.data_manager.build_reference_id(test_node_id, metric),
+                    test_runtimes,
+                    rank=float(result.rank),
+                    rltv_runtime=float(result.rltv_runtime),
                 )
+            )
+        return result
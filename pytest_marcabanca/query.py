@@ -0,0 +1,109 @@
+"""
+Queries of the references in a data store.
+"""
+
+from fnmatch import fnmatchcase
+import time
+import numpy as np
+from .maintenance import reference_key
+
+
+def filter_references(
+    references,
+    node_glob=None,
+    machine_prefix=None,
+    python_prefix=None,
+    model_name=None,
+    min_samples=None,
+    max_samples=None,
+    usage=None,
+    max_age=None,
+    min_age=None,
+    now=None,
+):
+    """
+    Returns the references matching all the specified filters. Filters only use the references' ids and metadata, so that neither runtimes nor models are loaded.
+
+    :param node_glob: Shell-style pattern (see :mod:`fnmatch`) matched against the test node ids.
+    :param machine_prefix: Prefix of the machine config ids.
+    :param python_prefix: Prefix of the python config ids.
+    :param model_name: Name of the :mod:`scipy.stats` model family (e.g., ``'gamma'``).
+    :param min_samples: Minimum number of samples.
+    :param max_samples: Maximum number of samples.
+    :param usage: Dictionary of last uses (see :func:`~pytest_marcabanca.maintenance.last_used`), required by the age filters. References with an unknown last use do not match the age filters.
+    :param max_age: Keep only references used within this many seconds.
+    :param min_age: Keep only references not used within this many seconds.
+    :param now: The current timestamp (defaults to the current time).
+    """
+    now = time.time() if now is None else now
+    if (max_age is not None or min_age is not None) and usage is None:
+        raise ValueError("Filtering by age requires the last uses.")
+
+    def matches(reference):
+        reference_id = reference.reference_id
+        if node_glob is not None and not fnmatchcase(
+            reference_id["test_node_id"], node_glob
+        ):
+            return False
+        if machine_prefix is not None and not reference_id[
+            "machine_config_id"
+        ].startswith(machine_prefix):
+            return False
+        if python_prefix is not None and not reference_id[
+            "python_config_id"
+        ].startswith(python_prefix):
+            return False
+        if model_name is not None and reference.model_name != model_name:
+            return False
+        if min_samples is not None and reference.num_samples < min_samples:
+            return False
+        if max_samples is not None and reference.num_samples > max_samples:
+            return False
+        if max_age is not None or min_age is not None:
+            if (last := usage.get(reference_key(reference_id))) is None:
+                return False
+            if max_age is not None and last < now - max_age:
+                return False
+            if min_age is not None and last >= now - min_age:
+                return False
+        return True
+
+    return [_ref for _ref in references if matches(_ref)]
+
+
+def reference_stats(reference, empirical=False):
+    """
+    Returns the mean, coefficient of variation and p99 runtime of the reference, as predicted by its model or, if ``empirical`` is ``True``, computed from its stored runtimes.
+
+    :return: Dictionary with keys ``'mean'``, ``'cv'``, ``'p99'`` and ``'n'`` (the number of samples).
+    """
+    if empirical:
+        runtimes = np.asarray(reference.runtimes, dtype=float)
+        mean, std, p99 = runtimes.mean(), runtimes.std(), np.quantile(runtimes, 0.99)
+    else:
+        mean, var = reference.model.stats("mv")
+        std, p99 = np.sqrt(var), reference.quantiles(0.99)
+    return {
+        "mean": float(mean),
+        "cv": float(std / mean) if mean else float("nan"),
+        "p99": float(p99),
+        "n": reference.num_samples,
+    }
+
+
+def query_records(references, usage=None, empirical=False):
+    """
+    Returns a record of each reference with its id fields, model family, summary statistics (see :func:`reference_stats`) and last use timestamp (``None`` if unknown or if ``usage`` is not provided). Statistics can be non-finite (see :func:`~pytest_marcabanca.export.to_builtin`).
+
+    :param usage: See :func:`filter_references`.
+    """
+    usage = usage or {}
+    return [
+        {
+            **_ref.reference_id,
+            "model_name": _ref.model_name,
+            **reference_stats(_ref, empirical=empirical),
+            "last_used": usage.get(reference_key(_ref.reference_id)),
+        }
+        for _ref in references
+    ]
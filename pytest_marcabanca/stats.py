@@ -0,0 +1,174 @@
+"""
+Two-sample comparisons between reference and test runtimes, and multiple-comparison corrections across a test session.
+"""
+
+import numpy as np
+import scipy.stats as scipy_stats
+
+
+def mann_whitney_pvalue(test_runtimes, ref_runtimes):
+    """
+    One-sided Mann-Whitney U test p-value for the hypothesis that test runtimes are stochastically greater (slower) than reference runtimes.
+    """
+    return float(
+        scipy_stats.mannwhitneyu(
+            test_runtimes, ref_runtimes, alternative="greater"
+        ).pvalue
+    )
+
+
+def bootstrap_median_pvalue(test_runtimes, ref_runtimes, num_resamples=2000, rng=None):
+    """
+    One-sided bootstrap p-value for the difference of medians (test minus reference). Resamples are drawn from the pooled runtimes, as prescribed by the null hypothesis of identical distributions.
+
+    :param num_resamples: Number of bootstrap resamples.
+    :param rng: A :class:`numpy.random.Generator` (optional).
+    """
+    rng = rng or np.random.default_rng()
+    test_runtimes = np.asarray(test_runtimes, dtype=float)
+    ref_runtimes = np.asarray(ref_runtimes, dtype=float)
+    observed = np.median(test_runtimes) - np.median(ref_runtimes)
+
+    pooled = np.concatenate([test_runtimes, ref_runtimes])
+    resamples = rng.choice(pooled, size=(num_resamples, len(pooled)))
+    diffs = np.median(resamples[:, : len(test_runtimes)], axis=1) - np.median(
+        resamples[:, len(test_runtimes) :], axis=1
+    )
+    return float((1 + np.sum(diffs >= observed)) / (1 + num_resamples))
+
+
+def common_language_effect_size(test_runtimes, ref_runtimes):
+    """
+    Probability that a test runtime is greater than a reference runtime (ties count as one half). A value of 0.5 indicates no effect.
+    """
+    test_runtimes = np.asarray(test_runtimes, dtype=float)[:, None]
+    ref_runtimes = np.asarray(ref_runtimes, dtype=float)[None, :]
+    return float(
+        np.mean(test_runtimes > ref_runtimes)
+        + 0.5 * np.mean(test_runtimes == ref_runtimes)
+    )
+
+
+def min_runs_for_quantile(quantile, tail_samples=2):
+    """
+    Minimum number of runs needed for the empirical quantile to be supported by ``tail_samples`` runtimes above it (e.g., 200 runs for p99).
+    """
+    # Rounding avoids spurious increments from floating-point error (e.g., 1 / (1 - 0.9)).
+    return int(np.ceil(np.round(tail_samples / (1 - quantile), 6)))
+
+
+def benjamini_hochberg(pvalues):
+    """
+    Benjamini-Hochberg q-values (false discovery rate adjusted p-values).
+
+    :param pvalues: Sequence of p-values.
+    :return: Array of q-values in the same order.
+    """
+    pvalues = np.asarray(pvalues, dtype=float)
+    num = len(pvalues)
+    if num == 0:
+        return pvalues
+    order = np.argsort(pvalues)
+    scaled = pvalues[order] * num / np.arange(1, num + 1)
+    # Enforce monotonicity from the largest p-value down.
+    qvalues = np.minimum(1.0, np.minimum.accumulate(scaled[::-1])[::-1])
+    out = np.empty(num)
+    out[order] = qvalues
+    return out
+
+
+MAX_BOOTSTRAP_BATCH = 2**22
+"""
+Maximum number of resampled values drawn at once by :func:`bootstrap_means`, which bounds its memory use.
+"""
+
+
+def bootstrap_means(samples, num_resamples=2000, rng=None):
+    """
+    Bootstrap resampled means of several samples of possibly different sizes. All the samples are resampled together, drawing the resampled values of a batch of resamples in a single vectorized operation.
+
+    :param samples: Sequence of non-empty samples.
+    :return: Array of shape ``(num_resamples, len(samples))``.
+    """
+    rng = rng or np.random.default_rng()
+    samples = [np.asarray(_sample, dtype=float) for _sample in samples]
+    lengths = np.array([len(_sample) for _sample in samples])
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    values = np.concatenate(samples)
+    # The sample length and start of each position of a resample.
+    position_lengths = np.repeat(lengths, lengths)
+    position_starts = np.repeat(starts, lengths)
+
+    out = []
+    batch_size = max(1, MAX_BOOTSTRAP_BATCH // len(values))
+    for _start in range(0, num_resamples, batch_size):
+        draws = rng.random((min(batch_size, num_resamples - _start), len(values)))
+        indices = position_starts + (draws * position_lengths).astype(int)
+        out.append(np.add.reduceat(values[indices], starts, axis=1) / lengths)
+    return np.concatenate(out)
+
+
+def bootstrap_ratio_cis(sample_pairs, confidence=0.95, num_resamples=2000, rng=None):
+    """
+    Ratios of the mean new runtime to the mean base runtime of several ``(new_runtimes, base_runtimes)`` pairs, with percentile bootstrap confidence intervals. All the samples are resampled independently, and together (see :func:`bootstrap_means`).
+
+    :param confidence: Confidence level of the intervals.
+    :param num_resamples: Number of bootstrap resamples.
+    :param rng: A :class:`numpy.random.Generator` (optional).
+    :return: List of ``(ratio, lower bound, upper bound)`` tuples.
+    """
+    if not sample_pairs:
+        return []
+    new_samples, base_samples = zip(*sample_pairs)
+    ratios = bootstrap_means(new_samples, num_resamples, rng) / bootstrap_means(
+        base_samples, num_resamples, rng
+    )
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(ratios, [alpha, 1 - alpha], axis=0)
+    return [
+        (
+            float(np.mean(_new) / np.mean(_base)),
+            float(_lower),
+            float(_upper),
+        )
+        for (_new, _base), _lower, _upper in zip(sample_pairs, lower, upper)
+    ]
+
+
+def bootstrap_ratio_ci(
+    new_runtimes, base_runtimes, confidence=0.95, num_resamples=2000, rng=None
+):
+    """
+    Ratio of the mean new runtime to the mean base runtime, with a percentile bootstrap confidence interval (see :func:`bootstrap_ratio_cis`).
+
+    :return: ``(ratio, lower bound, upper bound)``.
+    """
+    return bootstrap_ratio_cis(
+        [(new_runtimes, base_runtimes)],
+        confidence=confidence,
+        num_resamples=num_resamples,
+        rng=rng,
+    )[0]
+
+
+def geometric_mean_ci(ratios, confidence=0.95, num_resamples=2000, rng=None):
+    """
+    Geometric mean of per-test ratios, with a percentile bootstrap confidence interval obtained by resampling the tests.
+
+    :return: ``(geometric mean, lower bound, upper bound)``.
+    """
+    rng = rng or np.random.default_rng()
+    logs = np.log(np.asarray(ratios, dtype=float))
+    resampled = rng.choice(logs, size=(num_resamples, len(logs))).mean(1)
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(resampled, [alpha, 1 - alpha])
+    return float(np.exp(logs.mean())), float(np.exp(lower)), float(np.exp(upper))
+
+
+COMPARISONS = {
+    "mannwhitney": mann_whitney_pvalue,
+    "bootstrap": bootstrap_median_pvalue,
+}
+"""
+Two-sample test p-value functions by name.
+"""
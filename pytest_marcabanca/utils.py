@@ -1,12 +1,16 @@
 import uuid
+import hashlib
+import json
+from functools import lru_cache
 import jsondiff as jd
 import os
 from jztools.rentemp import RenTempFiles
 import os.path as osp
 import abc
-from contextlib import ExitStack
+from contextlib import ExitStack, nullcontext
 from jztools.validation import checked_get_single
 import scipy.stats as scipy_stats
+import numpy as np
 from jztools.serializer.abstract_type_serializer import (
     AbstractTypeSerializer as _AbstractTypeSerializer,
 )
@@ -20,7 +24,10 @@ import psutil
 import re
 from dataclasses import dataclass
 import platform
+import time
 from secrets import token_hex
+from glob import glob
+from . import minhash
 
 
 def find(obj_id, obj_list: List, id_attr_name):
@@ -35,35 +42,185 @@ def find(obj_id, obj_list: List, id_attr_name):
     ]
 
 
+def store_paths(root):
+    """
+    Returns a dictionary mapping the keys of the data store files to their paths in the specified root.
+    """
+    return {
+        "lock": osp.join(root, ".lock.tmp"),
+        "machine_configs": osp.join(root, "machine_configs.json"),
+        "python_configs": osp.join(root, "python_configs.json"),
+        "references": osp.join(root, "references.json"),
+        "history": osp.join(root, "history.json"),
+        "runtimes": osp.join(root, "runtimes.npy"),
+        "usage": osp.join(root, "usage.json"),
+    }
+
+
+_LIVE_JOURNALS = set()
+"""
+Paths of the journals written by managers of this process that were not closed (see :meth:`Manager.close_journal`).
+"""
+
+
+def journal_paths(root):
+    """
+    Returns the paths of the journal files of the sessions that wrote to the store (see :meth:`Manager._journal`), from the least to the most recently modified.
+    """
+    out = []
+    for _path in glob(osp.join(root, "references*.journal")):
+        try:
+            out.append((os.stat(_path).st_mtime_ns, _path))
+        except FileNotFoundError:
+            # Removed by a session that compacted it.
+            pass
+    return [_path for _, _path in sorted(out)]
+
+
+def journal_is_live(path):
+    """
+    Whether the journal is being written by a running session. Journals are named after the process of their session (see :meth:`Manager.__init__`), and are live while that process runs. Journals named otherwise (e.g., by older versions) are never live.
+    """
+    if not (
+        match := re.fullmatch(
+            r"references\.(\d+)\.(\d+)\.\w+\.journal", osp.basename(path)
+        )
+    ):
+        return False
+    pid, create_time = map(int, match.groups())
+    if pid == os.getpid():
+        return path in _LIVE_JOURNALS
+    try:
+        return int(psutil.Process(pid).create_time()) == create_time
+    except psutil.NoSuchProcess:
+        return False
+
+
+def _remap_config_ids(reference_id, aliases):
+    # Replaces in place the config ids of the reference id that have an alias (see :meth:`Manager._add_configs`).
+    for _key in ["machine_config_id", "python_config_id"]:
+        if (config_id := reference_id.get(_key)) in aliases:
+            reference_id[_key] = aliases[config_id]
+
+
+def reference_key(reference_id):
+    """
+    Returns a hashable key of the reference id.
+    """
+    return json.dumps(reference_id, sort_keys=True)
+
+
+def apply_usage(references, usage):
+    """
+    Sets the :attr:`ReferenceModel.last_used` timestamp of the references to the latest of their own and of the last uses in the usage dictionary (mapping reference keys to timestamps, see :meth:`Manager.mark_used`).
+
+    :return: The keys of the references found in the usage dictionary.
+    """
+    applied = set()
+    for _ref in references:
+        if (
+            timestamp := usage.get(key := reference_key(_ref.reference_id))
+        ) is not None:
+            applied.add(key)
+            _ref.last_used = max(_ref.last_used or timestamp, timestamp)
+    return applied
+
+
+def merge_usage(usage, other):
+    """
+    Merges the last uses of the other usage dictionary into ``usage``, keeping the latest of each.
+    """
+    for _key, _timestamp in other.items():
+        usage[_key] = max(usage.get(_key, _timestamp), _timestamp)
+    return usage
+
+
+def _file_stamp(path):
+    # Changes whenever the file is replaced (see :meth:`Manager.write`).
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def load_references(root):
+    """
+    Loads the references of a data store without its configurations or the current environment's, which is much faster than :class:`Manager` for read-only queries. Runtimes and models are loaded lazily (see :class:`ReferenceModel`). References in the journals of interrupted sessions are not included.
+    """
+    paths = store_paths(root)
+    serializer = _Serializer()
+    with FileLock(paths["lock"]).with_acquire(create=True):
+        references = serializer.load_safe(paths["references"])[0] or []
+        usage = serializer.load_safe(paths["usage"])[0] or {}
+        runtimes_store = RuntimesStore(paths["runtimes"])
+        runtimes_store.open()
+    for _ref in references:
+        _ref.runtimes_store = runtimes_store
+    apply_usage(references, usage)
+    return references
+
+
 class Manager:
     """
-    Loads all data upon initialization and re-writes it with any updates upon calling :meth:`write`.
+    Loads all data upon initialization and re-writes it with any updates upon calling :meth:`write`. Sessions that only use references record their last uses with :meth:`write_usage` instead, which leaves the data files untouched.
+
+    Created references are further appended to a journal file of the session as soon as they are created, so that they survive interrupted sessions. The journals of sessions that are no longer running are replayed upon initialization and compacted into the data files by :meth:`write`.
     """
 
-    def __init__(self, root, add_this_env=True):
+    num_reranked_python_configs = 8
+    """
+    Number of python configurations with the highest estimated similarity that :meth:`find_approx_reference_model` re-ranks by their exact module set overlap.
+    """
+
+    def __init__(self, root, add_this_env=True, min_machine_similarity=None):
         """
         Loads all machine configurations, python configurations and references from disk.
 
         :param root: Root directory to json files containing the machine configurations, the python configurations and the references.
         :param add_this_env: Whether to add the current environment to the list of in-memory data.
+        :param min_machine_similarity: Minimum :meth:`MachineConfiguration.similarity` of other machines whose references can be used when this machine has none (see :meth:`get_reference_match`). Disabled if ``None``.
         """
+        self.min_machine_similarity = min_machine_similarity
 
         self.serializer = _Serializer()
         self.created_new_reference = False
+        self.modified = False
+        self.session_id = token_hex(8)
+        self.interrupted_session = None
+        self.usage = {}
+        self._journaled_configs = False
+        self._updated_references = set()
 
         # Load all data from the data files.
         serializer = _Serializer()
         self.root = root
-        self.paths = {
-            "lock": osp.join(root, ".lock.tmp"),
-            "machine_configs": osp.join(root, "machine_configs.json"),
-            "python_configs": osp.join(root, "python_configs.json"),
-            "references": osp.join(root, "references.json"),
-        }
-        self.data = {
-            _key: serializer.load_safe(self.paths[_key])[0] or []
-            for _key in set(self.paths) - {"lock"}
-        }
+        self.paths = store_paths(root)
+        # Named after this process, so that other sessions do not replay it while it runs (see :func:`journal_is_live`).
+        self.journal_name = f"references.{os.getpid()}.{int(psutil.Process().create_time())}.{self.session_id}.journal"
+        self._replayed_journals = []
+        # The references and the runtimes file must be from the same write, as references hold spans into the runtimes file.
+        with (
+            FileLock(self.paths["lock"]).with_acquire(create=True)
+            if osp.isdir(root)
+            else nullcontext()
+        ):
+            self.data = {
+                _key: serializer.load_safe(self.paths[_key])[0] or []
+                for _key in set(self.paths) - {"lock", "history", "runtimes", "usage"}
+            }
+            usage = serializer.load_safe(self.paths["usage"])[0] or {}
+            self._references_stamp = _file_stamp(self.paths["references"])
+            # Runtimes are read lazily from the memory-mapped runtimes file.
+            self.runtimes_store = RuntimesStore(self.paths["runtimes"])
+            self.runtimes_store.open()
+        for _ref in self.data["references"]:
+            _ref.runtimes_store = self.runtimes_store
+        apply_usage(self.data["references"], usage)
+        self.data["python_configs"] = decode_python_configs(self.data["python_configs"])
+        self.history = serializer.load_safe(self.paths["history"])[0] or []
+        self._snapshot_loaded()
+        self._replay_journal()
 
         # Get this environment's configuration
         this_machine_config = MachineConfiguration()
@@ -95,12 +252,97 @@ class Manager:
             else this_python_config
         )
 
-    def build_reference_id(self, test_node_id):
-        return {
+    @property
+    def journal_path(self):
+        return osp.join(self.root, self.journal_name)
+
+    def _replay_journal(self):
+        """
+        Applies the records of the journals left behind by interrupted sessions, and sets :attr:`interrupted_session` to the ``(session_id, completed_test_node_ids)`` of the last such session. The journals of running sessions are skipped (see :func:`journal_is_live`).
+        """
+        completed = {}
+        session_id = None
+        aliases = {}
+        for _path in journal_paths(self.root):
+            if journal_is_live(_path):
+                continue
+            try:
+                with open(_path, "rt") as fo:
+                    lines = fo.readlines()
+            except FileNotFoundError:
+                continue
+            self._replayed_journals.append(osp.basename(_path))
+
+            for _line in lines:
+                try:
+                    record = self.serializer.deserialize(_line)
+                except ValueError:
+                    # A record truncated by a crash.
+                    continue
+                completed.setdefault(session_id := record["session_id"], set())
+                if record["kind"] == "configs":
+                    for _key in ["machine_configs", "python_configs"]:
+                        aliases.update(self._add_configs(_key, [record[_key]]))
+                elif record["kind"] == "reference":
+                    reference = record["reference"]
+                    _remap_config_ids(reference.reference_id, aliases)
+                    _remap_config_ids(record["history"].reference_id, aliases)
+                    if posn_reference := self.find_exact_reference_model(
+                        reference.reference_id
+                    ):
+                        self.data["references"][posn_reference[0]] = reference
+                    else:
+                        self.data["references"].append(reference)
+                    self.history.append(record["history"])
+                elif record["kind"] == "completed":
+                    completed[session_id].add(record["test_node_id"])
+                self.modified = True
+
+        if session_id is not None:
+            # Resumed sessions keep journaling under the id of the session they resume, in their own journal.
+            self.interrupted_session = (session_id, completed[session_id])
+
+    def _journal(self, kind, **fields):
+        """
+        Appends a record to the session's journal, flushing it to disk.
+        """
+        try:
+            os.mkdir(self.root)
+        except FileExistsError:
+            pass
+        line = self.serializer.serialize(
+            {"kind": kind, "session_id": self.session_id, **fields}
+        )
+        _LIVE_JOURNALS.add(self.journal_path)
+        with open(self.journal_path, "at") as fo:
+            fo.write(line + "\n")
+            fo.flush()
+            os.fsync(fo.fileno())
+
+    def close_journal(self):
+        """
+        Marks the session's journal as no longer written, e.g., when the session is interrupted without calling :meth:`write`. The journal is kept, and replayed by the next session.
+        """
+        _LIVE_JOURNALS.discard(self.journal_path)
+
+    def journal_completed(self, test_node_id):
+        """
+        Records in the journal that the session completed the specified test (see :attr:`interrupted_session`).
+        """
+        self._journal("completed", test_node_id=test_node_id)
+
+    def build_reference_id(self, test_node_id, metric=None):
+        """
+        :param metric: The measured quantity for references other than test runtimes (e.g., 'cold_start'). Test runtime references have no metric.
+        """
+        out = {
             "machine_config_id": self.this_machine_config.config_id,
             "python_config_id": self.this_python_config.config_id,
             "test_node_id": test_node_id,
         }
+        if metric is not None:
+            out["metric"] = metric
+        return out
 
     def rank_runtime(self, test_node_id, runtime):
         r"""
@@ -116,43 +358,103 @@ class Manager:
         else:
             return None, None
 
-    def get_reference_model(self, test_node_id):
+    def get_reference_model(self, test_node_id, metric=None):
         """
         Get an exact or approximate reference model. An approximate model is one for which the environment (machine and python configurations) is not the same as the caller's.
 
         :param test_node_id: Pytest test node name, e.g., 'test_module.test_submodule.py::MyTestClass::my_test_method'
+        :param metric: See :meth:`build_reference_id`.
+        :return: ``(exact_match, reference)`` or ``(None, None)``.
+        """
+        tier, reference, _ = self.get_reference_match(test_node_id, metric)
+        if reference is None:
+            return None, None
+        return tier == "exact", reference
+
+    def get_reference_match(self, test_node_id, metric=None):
         """
+        Same as :meth:`get_reference_model`, but further returns the fallback tier used to find the reference:
 
-        reference_id = self.build_reference_id(test_node_id)
+        * ``'exact'``: The reference is from this environment.
+        * ``'same_machine'``: The reference is from this machine, with the most similar python configuration (see :meth:`find_approx_reference_model`).
+        * ``'similar_machine'``: This machine has no reference, and the reference is from the most similar machine (see :meth:`find_similar_machine_reference_model`). Only used if :attr:`min_machine_similarity` is not ``None``.
+
+        :return: ``(tier, reference, machine_similarity)`` or ``(None, None, None)``.
+        """
+        reference_id = self.build_reference_id(test_node_id, metric)
 
         if posn_reference := self.find_exact_reference_model(reference_id):
-            exact_match = True
+            return "exact", posn_reference[1], 1.0
         elif posn_reference := self.find_approx_reference_model(
             reference_id, same_machine=True, same_python_version=False
         ):
-            exact_match = False
-        else:
-            return None, None
-
-        return exact_match, posn_reference[1]
+            return "same_machine", posn_reference[1], 1.0
+        elif self.min_machine_similarity is not None and (
+            match := self.find_similar_machine_reference_model(
+                reference_id, self.min_machine_similarity
+            )
+        ):
+            return "similar_machine", match[1], match[2]
+        return None, None, None
 
-    def check_reference_exists(self, test_node_id):
+    def check_reference_exists(self, test_node_id, metric=None):
         """
         Returns the found (index,reference) tuple or None.
         """
-        reference_id = self.build_reference_id(test_node_id)
+        reference_id = self.build_reference_id(test_node_id, metric)
         return self.find_exact_reference_model(reference_id)
 
-    def create_reference(self, test_node_id, runtimes, model_name="gamma"):
+    def create_reference(
+        self,
+        test_node_id,
+        runtimes,
+        model_name="gamma",
+        work_units=None,
+        scaling=None,
+        importtime=None,
+        noise=None,
+        dependencies=None,
+        profile=None,
+        metric=None,
+    ):
         """
-        Creates a reference model for the specified test and the current environment.
+        Creates a reference model for the specified test and the current environment. The creation is also recorded in the history store.
+
+        :param work_units: Optional ``(work_units, work_unit_name)`` tuple declaring the units of work carried out by each run.
+        :param scaling: Optional concurrent-load scaling curve (a dictionary with the worker ``'kind'`` and the ``'curve'`` from :func:`~pytest_marcabanca.concurrency.measure_scaling`).
+        :param importtime: Optional ``-X importtime`` breakdown (see :func:`~pytest_marcabanca.coldstart.measure_importtime`).
+        :param noise: Optional system noise annotations of each run (see :meth:`~pytest_marcabanca.noise.NoiseMonitor.sample`).
+        :param dependencies: Optional source files executed by the test, mapped to their content hashes (see :func:`~pytest_marcabanca.impact.trace_dependencies`).
+        :param profile: Optional description (``{'num_runs': <int>}``) of the reference's saved profile (see :func:`~pytest_marcabanca.profiles.save_profile`).
+        :param metric: See :meth:`build_reference_id`.
         """
         self.created_new_reference = True
+        self.modified = True
         #
-        reference_id = self.build_reference_id(test_node_id)
+        reference_id = self.build_reference_id(test_node_id, metric)
         #
         reference = ReferenceModel(reference_id, model_name=model_name)
         reference.fit(runtimes)
+        if work_units:
+            reference.work_units, reference.work_unit_name = work_units
+        reference.scaling = scaling
+        reference.importtime = importtime
+        reference.noise = noise
+        reference.dependencies = dependencies
+        reference.profile = profile
+        history_entry = HistoryEntry.from_runtimes("reference", reference_id, runtimes)
+        reference.last_used = history_entry.timestamp
+        self.append_history(history_entry)
+
+        # Persist the reference immediately.
+        if not self._journaled_configs:
+            self._journal(
+                "configs",
+                machine_configs=self.this_machine_config,
+                python_configs=self.this_python_config,
+            )
+            self._journaled_configs = True
+        self._journal("reference", reference=reference, history=history_entry)
         #
         posn_reference = self.find_exact_reference_model(reference_id)
         if posn_reference:
@@ -164,9 +466,159 @@ class Manager:
 
         return existed, reference_id
 
+    def update_reference(self, test_node_id, runtimes, metric=None, **kwargs):
+        """
+        Updates the current environment's reference for the specified test online (see :meth:`ReferenceModel.update`). Approximate references from other environments are never updated.
+
+        :param metric: See :meth:`build_reference_id`.
+        :param kwargs: Passed to :meth:`ReferenceModel.update`.
+        :return: The relative change of the model mean, or ``None`` if no exact reference exists.
+        """
+        if not (posn_reference := self.check_reference_exists(test_node_id, metric)):
+            return None
+        self.modified = True
+        self._updated_references.add(reference_key(posn_reference[1].reference_id))
+        return posn_reference[1].update(runtimes, **kwargs)
+
+    def mark_used(self, reference, timestamp=None):
+        """
+        Records that the session used the reference (see :attr:`ReferenceModel.last_used`). Last uses are kept in :attr:`usage` and persisted by :meth:`write_usage` or :meth:`write`, so that they do not require re-writing the data files.
+
+        :param timestamp: The time of use (defaults to the current time).
+        """
+        reference.last_used = time.time() if timestamp is None else timestamp
+        merge_usage(
+            self.usage, {reference_key(reference.reference_id): reference.last_used}
+        )
+
+    def append_history(self, entry: "HistoryEntry"):
+        """
+        Appends an entry to the history store.
+        """
+        self.modified = True
+        self.history.append(entry)
+
+    def get_history(self, test_node_id, same_machine=True, metric=None):
+        """
+        Returns the chronologically-sorted history of reference creations and test runs for the specified test.
+
+        :param test_node_id: Pytest test node name.
+        :param same_machine: Restrict the history to entries from the current machine.
+        :param metric: See :meth:`build_reference_id`.
+        """
+        return sorted(
+            (
+                _entry
+                for _entry in self.history
+                if _entry.reference_id["test_node_id"] == test_node_id
+                and _entry.reference_id.get("metric") == metric
+                and (
+                    not same_machine
+                    or _entry.reference_id["machine_config_id"]
+                    == self.this_machine_config.config_id
+                )
+            ),
+            key=lambda _entry: _entry.timestamp,
+        )
+
+    def write_usage(self):
+        """
+        Merges the last uses recorded by the session (see :meth:`mark_used`) into the usage file of the data store, without touching the data files.
+        """
+        if not self.usage:
+            return
+        try:
+            os.mkdir(self.root)
+        except FileExistsError:
+            pass
+        with FileLock(self.paths["lock"]).with_acquire(create=True):
+            usage = merge_usage(
+                self.serializer.load_safe(self.paths["usage"])[0] or {}, self.usage
+            )
+            with RenTempFiles([self.paths["usage"]], overwrite=True) as (tmp_path,):
+                self.serializer.dump(usage, tmp_path.name)
+        self.usage = {}
+
+    def _add_configs(self, key, configs, removed=()):
+        """
+        Adds to the in-memory data the configurations with new ids, except those in ``removed``. Configurations equal to an existing one with another id (e.g., created by concurrent sessions in the same environment) are not added.
+
+        :param key: ``'machine_configs'`` or ``'python_configs'``.
+        :return: Dictionary mapping the ids of the configurations that were not added to the ids of the equal existing configurations.
+        """
+        aliases = {}
+        known = {_x.config_id for _x in self.data[key]} | set(removed)
+        for _config in configs:
+            if _config.config_id in known:
+                continue
+            if equal := [_x for _x in self.data[key] if _x == _config]:
+                aliases[_config.config_id] = equal[0].config_id
+            else:
+                self.data[key].append(_config)
+                known.add(_config.config_id)
+        return aliases
+
+    def _merge_stored(self):
+        """
+        Merges the changes that other sessions wrote to the data files since they were loaded. References, configs and history entries created by other sessions are added, and references they updated replace those not changed by this session. Items removed from the in-memory data (e.g., by :func:`~pytest_marcabanca.maintenance.apply_prune`) stay removed. Must be called while holding the lock.
+        """
+        stored = {
+            _key: self.serializer.load_safe(self.paths[_key])[0] or []
+            for _key in ["references", "machine_configs", "python_configs", "history"]
+        }
+        stored["python_configs"] = decode_python_configs(stored["python_configs"])
+        runtimes_store = RuntimesStore(self.paths["runtimes"])
+        runtimes_store.open()
+        for _ref in stored["references"]:
+            _ref.runtimes_store = runtimes_store
+
+        # Configs
+        aliases = {}
+        for _key in ["machine_configs", "python_configs"]:
+            aliases.update(
+                self._add_configs(
+                    _key,
+                    stored[_key],
+                    removed=self._loaded[_key]
+                    - {_x.config_id for _x in self.data[_key]},
+                )
+            )
+        for _x in stored["references"] + stored["history"]:
+            _remap_config_ids(_x.reference_id, aliases)
+
+        # References
+        current = {
+            reference_key(_ref.reference_id): _ref for _ref in self.data["references"]
+        }
+        removed = set(self._loaded["references"]) - set(current)
+        stored_references = {
+            reference_key(_ref.reference_id): _ref for _ref in stored["references"]
+        }
+        for _k, (_key, _ref) in enumerate(current.items()):
+            if (
+                _key in stored_references
+                and self._loaded["references"].get(_key) is _ref
+                and _key not in self._updated_references
+            ):
+                self.data["references"][_k] = stored_references[_key]
+        self.data["references"].extend(
+            _ref
+            for _key, _ref in stored_references.items()
+            if _key not in current and _key not in removed
+        )
+
+        # History
+        def history_key(_entry):
+            return (_entry.kind, reference_key(_entry.reference_id), _entry.timestamp)
+
+        known = {history_key(_x) for _x in self._loaded["history"] + self.history}
+        self.history.extend(
+            _x for _x in stored["history"] if history_key(_x) not in known
+        )
+
     def write(self):
         """
-        Write to disk all machine configurations, python configurations and references.
+        Write to disk all machine configurations, python configurations and references, and remove the session's journal and the replayed ones (see :meth:`_replay_journal`). Changes written by other sessions since the data was loaded are merged first (see :meth:`_merge_stored`), and so are the last uses of the usage file (see :meth:`write_usage`).
         """
 
         # Create root directory if it does not exist.
@@ -177,16 +629,72 @@ class Manager:
 
         # Attempts to be atomic, and protected from other competing processes.
         with FileLock(self.paths["lock"]).with_acquire(create=True):
+            if _file_stamp(self.paths["references"]) != self._references_stamp:
+                self._merge_stored()
+            # Last uses of the written references are folded into them.
+            usage = merge_usage(
+                self.serializer.load_safe(self.paths["usage"])[0] or {}, self.usage
+            )
+            for _key in apply_usage(self.data["references"], usage):
+                usage.pop(_key)
+
             data_keys = list(set(self.data) - {"lock"})
-            data = [self.data[_key] for _key in data_keys]
+            data = [
+                (
+                    encode_python_configs(self.data[_key])
+                    if _key == "python_configs"
+                    else self.data[_key]
+                )
+                for _key in data_keys
+            ]
+            if self.history:
+                data_keys.append("history")
+                data.append(self.history)
+            data_keys.append("usage")
+            data.append(usage)
             paths = [self.paths[_key] for _key in data_keys]
-            with RenTempFiles(paths, overwrite=True) as tmp_paths:
+            with RenTempFiles(
+                paths + [self.paths["runtimes"]], overwrite=True
+            ) as tmp_paths:
                 # TODO: Possibility of corrupt data if a failure happens during the final move
                 # operation in RenTempFiles' __exit__ method. Notify of problem with an exception.
+                # Runtimes are written first, as this sets the references' runtime spans.
+                RuntimesStore.dump(self.data["references"], tmp_paths[-1])
                 [
                     self.serializer.dump(_data, _tmp_path.name, indent=4)
                     for _data, _tmp_path in zip(data, tmp_paths)
                 ]
+            # Re-open the memory map while holding the lock, as the spans now refer to the new file.
+            self.runtimes_store.open()
+            for _ref in self.data["references"]:
+                _ref.runtimes_store = self.runtimes_store
+            self._references_stamp = _file_stamp(self.paths["references"])
+            # The journals' records are now part of the data files.
+            for _path in [self.journal_path] + [
+                osp.join(self.root, _name) for _name in self._replayed_journals
+            ]:
+                try:
+                    os.remove(_path)
+                except FileNotFoundError:
+                    pass
+            self.close_journal()
+            self._replayed_journals = []
+            self._journaled_configs = False
+        self.usage = {}
+        self._updated_references = set()
+        self._snapshot_loaded()
+
+    def _snapshot_loaded(self):
+        # The stored state, to merge the changes of other sessions when writing (see :meth:`_merge_stored`).
+        self._loaded = {
+            "references": {
+                reference_key(_ref.reference_id): _ref
+                for _ref in self.data["references"]
+            },
+            "machine_configs": {_x.config_id for _x in self.data["machine_configs"]},
+            "python_configs": {_x.config_id for _x in self.data["python_configs"]},
+            "history": list(self.history),
+        }
 
     def find_machine_config(
         self, machine_config_id: Union[str, "ReferenceModel"]
@@ -243,16 +751,20 @@ class Manager:
         self, reference_id, same_machine=True, same_python_version=False
     ):
         """
-        Finds the reference from the same machine (by default) and python version (optionally) containing the greatest number of exactly-matching (including version) python modules.
+        Finds the reference from the same machine (by default) and python version (optionally) with the python module set (including versions) most similar to this environment's. Candidates are pre-selected by the similarity estimated from the configurations' MinHash signatures (see :attr:`num_reranked_python_configs`), and ranked by their exact module set overlap (Jaccard index).
 
         :return: ``(position, reference)`` or ``None``.
         """
+        python_configs = {
+            _config.config_id: _config for _config in self.data["python_configs"]
+        }
 
-        # Prune reference list to same test node id.
+        # Prune reference list to same test node id and metric.
         references = [
             (_posn, _ref)
             for _posn, _ref in enumerate(self.data["references"])
             if _ref.reference_id["test_node_id"] == reference_id["test_node_id"]
+            and _ref.reference_id.get("metric") == reference_id.get("metric")
         ]
         if same_machine:
             # Prune reference list to same machine.
@@ -267,29 +779,170 @@ class Manager:
             references = [
                 (_posn, _ref)
                 for (_posn, _ref) in references
-                if _ref.reference_id["specs"]["python"]
+                if python_configs[_ref.reference_id["python_config_id"]].specs["python"]
                 == self.this_python_config.specs["python"]
             ]
 
-        if references:
-            # Get reference id with highest number of matching modules.
-            return max(
-                references,
-                key=(
-                    lambda _posn_ref: len(
-                        set(self.this_python_config.specs["modules"]).intersection(
-                            self.find_python_config(_posn_ref[1])[1].specs["modules"]
-                        )
-                    )
-                ),
+        if not references:
+            return None
+
+        # Rank the candidates by their estimated similarity, and re-rank the top ones by their exact module set overlap, as 64-hash signatures can tie or misorder module sets that differ by a few modules.
+        similarities = {
+            _config_id: minhash.similarity(
+                self.this_python_config.signature, python_configs[_config_id].signature
             )
-        else:
+            for _config_id in {
+                _ref.reference_id["python_config_id"] for _, _ref in references
+            }
+        }
+        this_tokens = PythonConfiguration.module_tokens(
+            self.this_python_config.specs["modules"]
+        )
+        overlaps = {}
+        for _config_id in sorted(
+            similarities, key=lambda _id: similarities[_id], reverse=True
+        )[: self.num_reranked_python_configs]:
+            tokens = PythonConfiguration.module_tokens(
+                python_configs[_config_id].specs["modules"]
+            )
+            overlaps[_config_id] = len(this_tokens & tokens) / max(
+                len(this_tokens | tokens), 1
+            )
+        return max(
+            (
+                _posn_ref
+                for _posn_ref in references
+                if _posn_ref[1].reference_id["python_config_id"] in overlaps
+            ),
+            key=lambda _posn_ref: (
+                overlaps[(_config_id := _posn_ref[1].reference_id["python_config_id"])],
+                similarities[_config_id],
+            ),
+        )
+
+    def find_similar_machine_reference_model(self, reference_id, min_similarity):
+        """
+        Finds the reference from the machine most similar to this one (see :meth:`MachineConfiguration.similarity`), provided that the similarity is at least ``min_similarity``. Ties are broken by python configuration similarity (see :meth:`find_approx_reference_model`).
+
+        :return: ``(position, reference, machine_similarity)`` or ``None``.
+        """
+        machine_configs = {
+            _config.config_id: _config for _config in self.data["machine_configs"]
+        }
+        python_configs = {
+            _config.config_id: _config for _config in self.data["python_configs"]
+        }
+        similarities = {}
+        candidates = []
+        for _posn, _ref in enumerate(self.data["references"]):
+            if _ref.reference_id["test_node_id"] != reference_id[
+                "test_node_id"
+            ] or _ref.reference_id.get("metric") != reference_id.get("metric"):
+                continue
+            if (machine_config_id := _ref.reference_id["machine_config_id"]) not in (
+                similarities
+            ):
+                similarities[machine_config_id] = (
+                    self.this_machine_config.similarity(
+                        machine_configs[machine_config_id]
+                    )
+                    if machine_config_id in machine_configs
+                    else 0.0
+                )
+            if (similarity := similarities[machine_config_id]) >= min_similarity:
+                python_config = python_configs.get(
+                    _ref.reference_id["python_config_id"]
+                )
+                candidates.append(
+                    (
+                        similarity,
+                        (
+                            minhash.similarity(
+                                self.this_python_config.signature,
+                                python_config.signature,
+                            )
+                            if python_config
+                            else 0.0
+                        ),
+                        _posn,
+                        _ref,
+                    )
+                )
+        if not candidates:
             return None
+        similarity, _, posn, reference = max(candidates, key=lambda _x: _x[:2])
+        return posn, reference, similarity
+
+
+class RuntimesStore:
+    """
+    Binary storage of the raw runtimes of all references as a single ``.npy`` array, memory-mapped when the references are loaded (see :meth:`open`). Each reference holds an ``(offset, length)`` span into the array.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._array = None
+
+    def open(self):
+        """
+        Memory-maps the runtimes file, if it exists. The map keeps referring to the opened file even if other sessions later replace it (see :meth:`Manager.write`), so that the spans of the references loaded with it remain valid. No runtimes are read.
+        """
+        try:
+            self._array = np.load(self.path, mmap_mode="r")
+        except FileNotFoundError:
+            self._array = None
+
+    def read(self, offset, length):
+        """
+        Returns a copy of the runtimes in the specified span.
+        """
+        if self._array is None:
+            raise Exception(f"The runtimes file '{self.path}' was not opened.")
+        return np.array(self._array[offset : offset + length])
+
+    @staticmethod
+    def dump(references, fo):
+        """
+        Writes the runtimes of all the references to the binary file object, and sets their runtime spans accordingly. Runtimes that were not loaded are copied from their store one reference at a time, without loading them into the references.
+        """
+        lengths = [
+            (
+                len(_ref._runtimes)
+                if _ref._runtimes is not None or _ref.runtimes_span is None
+                else _ref.runtimes_span[1]
+            )
+            for _ref in references
+        ]
+        np.lib.format.write_array_header_1_0(
+            fo,
+            {
+                "descr": np.lib.format.dtype_to_descr(np.dtype(float)),
+                "fortran_order": False,
+                "shape": (sum(lengths),),
+            },
+        )
+        offset = 0
+        for _ref, _length in zip(references, lengths):
+            runtimes = (
+                _ref._runtimes
+                if _ref._runtimes is not None or _ref.runtimes_span is None
+                else _ref.runtimes_store.read(*_ref.runtimes_span)
+            )
+            fo.write(np.asarray(runtimes, dtype=float).tobytes())
+            _ref.runtimes_span = (offset, _length)
+            offset += _length
+        fo.flush()
 
 
 class ReferenceModel(_AbstractTypeSerializer):
     """
     Represents runtimes together with a probabilistic model fitted to those runtimes.
+
+    Stored references keep their raw runtimes in a :class:`RuntimesStore`, and only load them on first access of :attr:`runtimes`. Likewise, the :mod:`scipy.stats` distribution is only built from :attr:`model_args` on first access of :attr:`model`.
+
+    The :attr:`original_mean` is the model mean when the reference was created, and bounds the cumulative drift of online updates (see :meth:`update`). It is ``None`` for references stored before it was recorded.
+
+    The :attr:`last_used` timestamp is that of the latest session that created or evaluated the reference (see :meth:`Manager.mark_used`), and is ``None`` for references stored before it was recorded.
     """
 
     def __init__(self, reference_id, model_name="gamma"):
@@ -299,19 +952,144 @@ class ReferenceModel(_AbstractTypeSerializer):
         """
         #
         self.reference_id = reference_id
-        self.model_type = getattr(scipy_stats, model_name)
         self.model_name = model_name
         #
+        self.runtimes_store = None
         self.runtimes = None
+        self.num_samples = 0
+        self.num_updates = 0
+        self.original_mean = None
+        self.last_used = None
+        #
+        self.work_units = None
+        self.work_unit_name = None
+        self.scaling = None
+        self.importtime = None
+        self.noise = None
+        self.dependencies = None
+        self.profile = None
         #
-        self.model = None
         self.model_args = None
 
+    @property
+    def model_type(self):
+        return getattr(scipy_stats, self.model_name)
+
+    @property
+    def model_args(self):
+        return self._model_args
+
+    @model_args.setter
+    def model_args(self, model_args):
+        self._model_args = model_args
+        # The frozen distribution is rebuilt from the new arguments on first access.
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None and self._model_args is not None:
+            self._model = self.model_type(*self._model_args)
+        return self._model
+
+    @property
+    def runtimes(self):
+        if self._runtimes is None and self.runtimes_span is not None:
+            self._runtimes = self.runtimes_store.read(*self.runtimes_span)
+        return self._runtimes
+
+    @runtimes.setter
+    def runtimes(self, runtimes):
+        self._runtimes = runtimes
+        # Any stored runtimes are now stale.
+        self.runtimes_span = None
+
     def fit(self, runtimes):
         self.runtimes = runtimes
+        self.num_samples = len(runtimes)
         # Convert to list to make json file less verbose.
         self.model_args = list(self.model_type.fit(runtimes))
-        self.model = self.model_type(*self.model_args)
+        self.original_mean = float(self.model.stats("m"))
+
+    def update(
+        self,
+        runtimes,
+        weight=0.2,
+        max_shift=0.02,
+        max_drift=0.1,
+        reservoir_size=100,
+        rng=None,
+        noise=None,
+    ):
+        """
+        Updates the reference online with new runtimes. The runtimes are added to a bounded reservoir sample of all runtimes seen so far, and the model parameters are moved towards those fitted to the reservoir using an exponentially-weighted update.
+
+        :param runtimes: The new runtimes.
+        :param weight: Weight of the parameters fitted to the reservoir in the updated parameters.
+        :param max_shift: Maximum relative change of the model mean caused by the update. The update weight is reduced as needed to satisfy this cap, so that a regression can only be absorbed slowly.
+        :param max_drift: Maximum relative change of the model mean from :attr:`original_mean` accumulated over all updates, so that a steady regression is not absorbed by successive updates either. Models at this bound are only updated back towards the original mean.
+        :param reservoir_size: Maximum number of runtimes kept.
+        :param rng: A :class:`numpy.random.Generator` (optional).
+        :param noise: Optional system noise annotations of the new runtimes. Annotations are kept alongside the reservoir runtimes only if all runtimes are annotated.
+        :return: The relative change of the model mean.
+        """
+        if self.model is None:
+            raise Exception("Cannot update a model that has not been fitted.")
+        rng = rng or np.random.default_rng()
+
+        # Reservoir sampling (Vitter's algorithm R).
+        reservoir = list(self.runtimes)
+        annotations = (
+            list(self.noise) if self.noise is not None and noise is not None else None
+        )
+        for k_new, _runtime in enumerate(runtimes):
+            self.num_samples += 1
+            if len(reservoir) < reservoir_size:
+                reservoir.append(_runtime)
+                if annotations is not None:
+                    annotations.append(noise[k_new])
+            elif (k := rng.integers(self.num_samples)) < reservoir_size:
+                reservoir[k] = _runtime
+                if annotations is not None:
+                    annotations[k] = noise[k_new]
+
+        # Exponentially-weighted parameter update, capped by the resulting shift in the mean
+        # and by the drift from the original mean.
+        old_args = np.asarray(self.model_args)
+        fitted_args = np.asarray(self.model_type.fit(reservoir))
+        old_mean = self.model.stats("m")
+        if self.original_mean is None:
+            # References stored before the original mean was recorded.
+            self.original_mean = float(old_mean)
+        lower = min(
+            0.0, max(-max_shift, self.original_mean * (1 - max_drift) / old_mean - 1)
+        )
+        upper = max(
+            0.0, min(max_shift, self.original_mean * (1 + max_drift) / old_mean - 1)
+        )
+        shift = (
+            self.model_type(*(old_args + weight * (fitted_args - old_args))).stats("m")
+            / old_mean
+            - 1
+        )
+        if not lower <= shift <= upper:
+            weight *= (upper if shift > 0 else lower) / shift
+        new_args = old_args + weight * (fitted_args - old_args)
+        new_model = self.model_type(*new_args)
+        shift = new_model.stats("m") / old_mean - 1
+        tolerance = 1e-6 * max_shift
+        if (
+            not np.isfinite(shift)
+            or not lower - tolerance <= shift <= upper + tolerance
+        ):
+            # The mean is not (close to) linear in the parameters: only update the reservoir.
+            new_args, new_model, shift = old_args, self.model, 0.0
+
+        self.runtimes = reservoir
+        self.noise = annotations
+        self.model_args = [float(_x) for _x in new_args]
+        self._model = new_model
+        self.num_updates += 1
+        return float(shift)
 
     def rank_runtime(self, x):
         """
@@ -322,8 +1100,51 @@ class ReferenceModel(_AbstractTypeSerializer):
             raise Exception("Cannot compute a cdf because a model has not been fitted.")
         return self.model.cdf(x)
 
+    def throughputs(self):
+        """
+        Returns the throughput (work units per second) of each stored run, or ``None`` if the reference declares no work units.
+        """
+        if self.work_units is None:
+            return None
+        return self.work_units / np.asarray(self.runtimes, dtype=float)
+
+    def mean_throughput(self):
+        """
+        Returns the throughput (work units per second) at the model's mean runtime, or ``None`` if the reference declares no work units.
+        """
+        if self.work_units is None:
+            return None
+        return float(self.work_units / self.model.stats("m"))
+
+    def quantiles(self, qs):
+        """
+        Returns the model-predicted runtime quantiles (e.g., ``qs=[0.5, 0.9, 0.99]`` for p50, p90 and p99).
+        """
+        if self.model is None:
+            raise Exception(
+                "Cannot compute quantiles because a model has not been fitted."
+            )
+        return self.model.ppf(qs)
+
+    def empirical_quantiles(self, qs):
+        """
+        Returns the empirical quantiles of the stored runtimes.
+        """
+        return np.quantile(self.runtimes, qs)
+
+    def quantile_summary(self, qs=(0.5, 0.9, 0.99)):
+        """
+        Returns a dictionary mapping quantile labels (e.g., 'p99') to ``(model, empirical)`` runtime quantile tuples.
+        """
+        return {
+            f"p{_q*100:g}": (float(_model), float(_empirical))
+            for _q, _model, _empirical in zip(
+                qs, self.quantiles(qs), self.empirical_quantiles(qs)
+            )
+        }
+
     def __eq__(self, obj):
-        if self.model is None or obj.model is None:
+        if self.model_args is None or obj.model_args is None:
             raise Exception(
                 "Cannot compare models because one of the models has not been fitted."
             )
@@ -331,26 +1152,127 @@ class ReferenceModel(_AbstractTypeSerializer):
 
     @classmethod
     def _as_serializable(cls, obj):
-        if obj.model is None:
+        if obj.model_args is None:
             raise Exception(
                 "The model cannot be serialized because it has not been fitted."
             )
         return {
             "reference_id": obj.reference_id,
             "model_name": obj.model_name,
-            "runtimes": obj.runtimes,
+            # Runtimes are stored inline unless written to a RuntimesStore.
+            **(
+                {"runtimes_span": list(obj.runtimes_span)}
+                if obj.runtimes_span is not None
+                else {"runtimes": obj.runtimes}
+            ),
             "model_args": obj.model_args,
+            "num_samples": obj.num_samples,
+            "num_updates": obj.num_updates,
+            "original_mean": obj.original_mean,
+            "last_used": obj.last_used,
+            "work_units": obj.work_units,
+            "work_unit_name": obj.work_unit_name,
+            "scaling": obj.scaling,
+            "importtime": obj.importtime,
+            "noise": obj.noise,
+            "dependencies": obj.dependencies,
+            "profile": obj.profile,
         }
 
     @classmethod
     def _from_serializable(cls, data):
         obj = cls(data["reference_id"], data["model_name"])
-        obj.runtimes = data["runtimes"]
-        obj.model = obj.model_type(*data["model_args"])
+        if "runtimes_span" in data:
+            obj.runtimes_span = tuple(data["runtimes_span"])
+        else:
+            obj.runtimes = data["runtimes"]
+        obj.num_samples = (
+            data["num_samples"] if "num_samples" in data else len(obj.runtimes)
+        )
+        obj.num_updates = data.get("num_updates", 0)
+        obj.original_mean = data.get("original_mean")
+        obj.last_used = data.get("last_used")
+        obj.work_units = data.get("work_units")
+        obj.work_unit_name = data.get("work_unit_name")
+        obj.scaling = data.get("scaling")
+        obj.importtime = data.get("importtime")
+        obj.noise = data.get("noise")
+        obj.dependencies = data.get("dependencies")
+        obj.profile = data.get("profile")
+        # The distribution is built lazily (see :attr:`model`).
         obj.model_args = data["model_args"]
         return obj
 
 
+@dataclass
+class HistoryEntry(_AbstractTypeSerializer):
+    """
+    Summary of a reference creation (``kind='reference'``), a test run (``kind='test'``) or a reference discarded when merging data stores (``kind='merged'``, see :func:`~pytest_marcabanca.maintenance.merge_stores`) stored in the per-test history.
+    """
+
+    _keys = [
+        "kind",
+        "reference_id",
+        "timestamp",
+        "commit",
+        "num_samples",
+        "mean",
+        "median",
+        "rank",
+        "rltv_runtime",
+    ]
+    kind: str
+    reference_id: dict
+    timestamp: float
+    commit: Optional[str]
+    num_samples: int
+    mean: float
+    median: float
+    rank: Optional[float] = None
+    rltv_runtime: Optional[float] = None
+
+    @classmethod
+    def from_runtimes(cls, kind, reference_id, runtimes, commit=None, **kwargs):
+        """
+        Builds an entry summarizing the specified runtimes. The commit defaults to the current git commit, if any.
+        """
+        runtimes = np.asarray(runtimes, dtype=float)
+        return cls(
+            kind=kind,
+            reference_id=dict(reference_id),
+            timestamp=time.time(),
+            commit=commit or get_git_commit(),
+            num_samples=len(runtimes),
+            mean=float(np.mean(runtimes)),
+            median=float(np.median(runtimes)),
+            **kwargs,
+        )
+
+    @classmethod
+    def _as_serializable(cls, obj):
+        return {key: getattr(obj, key) for key in cls._keys}
+
+    @classmethod
+    def _from_serializable(cls, data):
+        return cls(**data)
+
+
+@lru_cache
+def get_git_commit(cwd=None):
+    """
+    Returns the short hash of the current git commit, or ``None`` if not in a git repository.
+    """
+    try:
+        return subp.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=cwd,
+            text=True,
+            stderr=subp.DEVNULL,
+        ).strip()
+    except (OSError, subp.CalledProcessError):
+        return None
+
+
 @dataclass
 class PythonModule(_AbstractTypeSerializer):
     _keys = ["package", "version", "location"]
@@ -379,11 +1301,11 @@ class PythonModule(_AbstractTypeSerializer):
 class _AbstractConfiguration(_AbstractTypeSerializer, abc.ABC):
     def __init__(self, config_id=None, specs=None):
         """
-        :param config_id: An arbitrary identifier. If none is provided, a random 32-char hash will be generated internally.
+        :param config_id: An arbitrary identifier. If none is provided, a 32-char hash will be generated internally (see :meth:`_generate_new_id`).
         :param specs: The configuration parameters. If None is provided, these will be extracted automatically.
         """
-        self.config_id = config_id or self._generate_new_id()
         self.specs = specs or self._get_this_specs()
+        self.config_id = config_id or self._generate_new_id()
 
     @abc.abstractmethod
     def _get_this_specs(self):
@@ -433,10 +1355,54 @@ class PythonConfiguration(_AbstractConfiguration):
             },
         }
 
+    def _generate_new_id(self):
+        """
+        Python configurations are identified by a hash of their contents, so that identical environments share the same id.
+        """
+        return self.content_hash(self.specs)
+
+    @staticmethod
+    def module_tokens(modules):
+        return {f"{_mdl.package}=={_mdl.version}" for _mdl in modules}
+
+    @classmethod
+    def content_hash(cls, specs):
+        """
+        Returns a 32-char hash of the python version and module set (including versions) of the specs.
+        """
+        return hashlib.sha256(
+            json.dumps(
+                [specs["python"], sorted(cls.module_tokens(specs["modules"]))]
+            ).encode()
+        ).hexdigest()[:32]
+
+    @property
+    def signature(self):
+        """
+        The (cached) MinHash signature of the module set (see :mod:`pytest_marcabanca.minhash`).
+        """
+        if getattr(self, "_signature", None) is None:
+            self._signature = minhash.signature(
+                self.module_tokens(self.specs["modules"])
+            )
+        return self._signature
+
+    @property
+    def content_id(self):
+        """
+        The (cached) :meth:`content_hash` of the specs. The :attr:`config_id` of configurations stored by older versions is not a content hash.
+        """
+        if getattr(self, "_content_id", None) is None:
+            self._content_id = self.content_hash(self.specs)
+        return self._content_id
+
     def __eq__(self, other: "PythonConfiguration"):
-        return self.specs["python"] == other.specs["python"] and set(
-            self.specs["modules"]
-        ) == set(other.specs["modules"])
+        # Module sets are only compared when the content hashes match.
+        return (
+            self.content_id == other.content_id
+            and self.specs["python"] == other.specs["python"]
+            and set(self.specs["modules"]) == set(other.specs["modules"])
+        )
 
     def for_display(self, as_str=True):
         assert set(self.specs.keys()) == {
@@ -450,6 +1416,70 @@ class PythonConfiguration(_AbstractConfiguration):
         return str(out) if as_str else out
 
 
+def encode_python_configs(configs):
+    """
+    Encodes python configurations for storage. The module set of each configuration is stored as a delta (added and removed modules) against the most similar previously-encoded configuration, when smaller than the full set, together with its MinHash signature. Similar configurations are looked up in a :class:`~pytest_marcabanca.minhash.LSHIndex`, falling back to the previous configuration if none is found.
+    """
+    entries = []
+    index = minhash.LSHIndex()
+    for k, _config in enumerate(configs):
+        modules = set(_config.specs["modules"])
+        entry = {
+            "config_id": _config.config_id,
+            "python": _config.specs["python"],
+            "signature": _config.signature,
+            "base": None,
+            "added": sorted(modules, key=str),
+            "removed": [],
+        }
+        if k:
+            base = configs[
+                max(
+                    index.query(_config.signature) or [k - 1],
+                    key=lambda _k: minhash.similarity(
+                        _config.signature, configs[_k].signature
+                    ),
+                )
+            ]
+            base_modules = set(base.specs["modules"])
+            added, removed = modules - base_modules, base_modules - modules
+            if len(added) + len(removed) < len(modules):
+                entry.update(
+                    base=base.config_id,
+                    added=sorted(added, key=str),
+                    removed=sorted(removed, key=str),
+                )
+        index.add(k, _config.signature)
+        entries.append(entry)
+    return {"encoding": "delta", "configs": entries}
+
+
+def decode_python_configs(data):
+    """
+    Decodes python configurations encoded with :func:`encode_python_configs`. Lists of configurations (the legacy storage format) are returned as is.
+    """
+    if isinstance(data, list):
+        return data
+    configs = []
+    by_id = {}
+    for _entry in data["configs"]:
+        modules = (
+            set(by_id[_entry["base"]].specs["modules"]) if _entry["base"] else set()
+        )
+        config = PythonConfiguration(
+            config_id=_entry["config_id"],
+            specs={
+                "python": _entry["python"],
+                "modules": (modules - set(_entry["removed"])) | set(_entry["added"]),
+            },
+        )
+        if len(_entry.get("signature") or []) == minhash.NUM_HASHES:
+            config._signature = _entry["signature"]
+        configs.append(config)
+        by_id[config.config_id] = config
+    return configs
+
+
 class MachineConfiguration(_AbstractConfiguration):
     """
     Represents the machine's hardware configuration.
@@ -476,9 +1506,68 @@ class MachineConfiguration(_AbstractConfiguration):
         "l2_cache_associativity",
     ]
 
+    similarity_weights = {
+        "model": 0.3,
+        "brand": 0.1,
+        "count": 0.1,
+        "caches": 0.2,
+        "memory": 0.1,
+        "flags": 0.2,
+    }
+    """
+    Weights of the components of :meth:`similarity`.
+    """
+
     def __init__(self, *args, with_id=False, **kwargs):
         super().__init__(*args, **kwargs)
 
+    def similarity(self, other: "MachineConfiguration"):
+        """
+        Returns a hardware similarity score in the [0, 1] range. Machines with a different architecture or word size have zero similarity. Otherwise, the score is a weighted combination (see :attr:`similarity_weights`) of matching cpu vendor, family and model, matching cpu brand, close core counts, close cache sizes, close memory sizes and overlapping cpu flags. Fields that change with microcode or BIOS updates (e.g., the advertised frequency or stepping) are ignored.
+        """
+        this, that = self.specs["cpuinfo"], other.specs["cpuinfo"]
+        if (this.get("arch"), this.get("bits")) != (that.get("arch"), that.get("bits")):
+            return 0.0
+
+        def closeness(_a, _b):
+            if isinstance(_a, (int, float)) and isinstance(_b, (int, float)):
+                return min(_a, _b) / max(_a, _b) if max(_a, _b) > 0 else 1.0
+            return float(_a == _b)
+
+        this_flags, that_flags = set(this.get("flags", [])), set(that.get("flags", []))
+        scores = {
+            "model": float(
+                all(
+                    this.get(_key) == that.get(_key)
+                    for _key in ["vendor_id_raw", "family", "model"]
+                )
+            ),
+            "brand": float(this.get("brand_raw") == that.get("brand_raw")),
+            "count": closeness(this.get("count"), that.get("count")),
+            "caches": float(
+                np.mean(
+                    [
+                        closeness(this.get(_key), that.get(_key))
+                        for _key in [
+                            "l1_data_cache_size",
+                            "l1_instruction_cache_size",
+                            "l2_cache_size",
+                            "l3_cache_size",
+                        ]
+                    ]
+                )
+            ),
+            "memory": closeness(self.specs.get("memory"), other.specs.get("memory")),
+            "flags": (
+                len(this_flags & that_flags) / len(this_flags | that_flags)
+                if this_flags | that_flags
+                else 1.0
+            ),
+        }
+        return float(
+            sum(self.similarity_weights[_key] * scores[_key] for _key in scores)
+        )
+
     @classmethod
     def _get_this_specs(cls):
         out = {
@@ -522,5 +1611,11 @@ class MachineConfiguration(_AbstractConfiguration):
 
 # Register type serializers
 _Serializer.default_extension_types.extend(
-    [PythonConfiguration, MachineConfiguration, PythonModule, ReferenceModel]
+    [
+        PythonConfiguration,
+        MachineConfiguration,
+        PythonModule,
+        ReferenceModel,
+        HistoryEntry,
+    ]
 )
@@ -0,0 +1,135 @@
+import marcabanca._bin_helpers.compare as mdl
+from marcabanca._bin_helpers import main
+from pytest_marcabanca.utils import Manager, PythonConfiguration, ReferenceModel
+from rich.console import Console
+import copy
+import io
+import numpy as np
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+
+
+def build_reference(test_node_id, machine, python, num_samples, metric=None):
+    ref = ReferenceModel(
+        {
+            "test_node_id": test_node_id,
+            "machine_config_id": machine,
+            "python_config_id": python,
+            **({"metric": metric} if metric else {}),
+        },
+        "norm",
+    )
+    ref.fit(np.linspace(1.0, 2.0, num_samples))
+    return ref
+
+
+def build_store(root):
+    """
+    Creates references for tests ``test_a``, ``test_b`` and ``test_c`` in this environment, and references twice as slow for ``test_a`` and ``test_b`` in another python config.
+    """
+    mngr = Manager(root)
+    for _test_node_id in ["test_a", "test_b", "test_c"]:
+        mngr.create_reference(_test_node_id, np.linspace(1.0, 2.0, 10), "norm")
+    mngr.data["python_configs"].append(
+        PythonConfiguration(
+            config_id="other", specs=dict(mngr.this_python_config.specs, python="0.0")
+        )
+    )
+    for _ref in mngr.data["references"][:2]:
+        other_ref = copy.deepcopy(_ref)
+        other_ref.reference_id = dict(_ref.reference_id, python_config_id="other")
+        other_ref.fit(2 * np.asarray(_ref.runtimes))
+        mngr.data["references"].append(other_ref)
+    mngr.write()
+    return mngr
+
+
+class TestCompare(TestCase):
+    def test_pair_references(self):
+        refs = {
+            # Matching python configs are preferred over more samples.
+            "a_base": build_reference("test_a", "m1", "p1", 10),
+            "a_base_more": build_reference("test_a", "m1", "p2", 50),
+            "a_new": build_reference("test_a", "m2", "p1", 10),
+            # Ties are broken by the number of samples.
+            "b_base": build_reference("test_b", "m1", "p1", 10),
+            "b_base_more": build_reference("test_b", "m1", "p2", 30),
+            "b_new": build_reference("test_b", "m2", "p1", 20),
+            "b_new_more": build_reference("test_b", "m2", "p2", 40),
+            # Metrics are paired separately.
+            "a_cold": build_reference("test_a", "m1", "p1", 10, "cold_start"),
+            "a_cold_new": build_reference("test_a", "m2", "p3", 10, "cold_start"),
+            # Unpaired tests.
+            "c_base": build_reference("test_c", "m1", "p1", 10),
+            "d_new": build_reference("test_d", "m2", "p1", 10),
+            "e_other": build_reference("test_e", "m3", "p1", 10),
+        }
+        pairs, base_only, new_only = mdl.pair_references(
+            list(refs.values()), "machine", "m1", "m2"
+        )
+        self.assertEqual(
+            pairs,
+            {
+                ("test_a", None): (refs["a_base"], refs["a_new"]),
+                ("test_b", None): (refs["b_base_more"], refs["b_new_more"]),
+                ("test_a", "cold_start"): (refs["a_cold"], refs["a_cold_new"]),
+            },
+        )
+        self.assertEqual(base_only, [("test_c", None)])
+        self.assertEqual(new_only, [("test_d", None)])
+
+        # Comparing python configs.
+        pairs, base_only, new_only = mdl.pair_references(
+            list(refs.values()), "python", "p1", "p2"
+        )
+        self.assertEqual(
+            pairs,
+            {
+                ("test_a", None): (refs["a_base"], refs["a_base_more"]),
+                ("test_b", None): (refs["b_new"], refs["b_new_more"]),
+            },
+        )
+        self.assertEqual(
+            base_only,
+            [
+                ("test_a", "cold_start"),
+                ("test_c", None),
+                ("test_d", None),
+                ("test_e", None),
+            ],
+        )
+        self.assertEqual(new_only, [])
+
+    def test_resolve_configs(self):
+        with TemporaryDirectory() as root:
+            mngr = build_store(root)
+            python_id = mngr.this_python_config.config_id
+            machine_id = mngr.this_machine_config.config_id
+
+            kind, base, new = mdl.resolve_configs(mngr, python_id[:6], "oth")
+            self.assertEqual(kind, "python")
+            self.assertEqual((base.config_id, new.config_id), (python_id, "other"))
+
+            for _base, _new in [
+                # Configs of different kinds.
+                (machine_id, "other"),
+                # Missing and ambiguous prefixes.
+                (python_id, "missing"),
+                ("", "other"),
+            ]:
+                with self.subTest(base=_base, new=_new), self.assertRaises(SystemExit):
+                    mdl.resolve_configs(mngr, _base, _new)
+
+    def test_compare(self):
+        with TemporaryDirectory() as root:
+            python_id = build_store(root).this_python_config.config_id
+            console = Console(file=io.StringIO(), width=200)
+            with mock.patch.object(mdl, "CONSOLE", console):
+                main(["compare", root, "--base", python_id, "--new", "other"])
+            output = console.file.getvalue()
+            self.assertEqual(output.count("2.000X"), 2)
+            self.assertIn("Geometric-mean speedup over 2 tests: 0.500X", output)
+            self.assertIn(
+                "1 tests only have base references and 0 tests only have new references.",
+                output,
+            )
@@ -0,0 +1,25 @@
+from marcabanca._bin_helpers import main
+from pytest_marcabanca.utils import Manager
+import contextlib
+import io
+import json
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+
+class TestInfo(TestCase):
+    def test_references_json(self):
+        with TemporaryDirectory() as root:
+            mngr = Manager(root)
+            # A zero mean has an undefined coefficient of variation.
+            mngr.create_reference("test_a", [0.0, 0.0, 0.0], "norm")
+            mngr.create_reference("test_b", [1.0, 2.0, 3.0], "norm")
+            mngr.write()
+            with contextlib.redirect_stdout(stdout := io.StringIO()):
+                main(["info", "references", root, "--json", "--empirical"])
+            records = json.loads(stdout.getvalue())
+            self.assertEqual(
+                [_x["test_node_id"] for _x in records], ["test_a", "test_b"]
+            )
+            self.assertIsNone(records[0]["cv"])
+            self.assertAlmostEqual(records[1]["mean"], 2.0)
@@ -0,0 +1,64 @@
+import pytest_marcabanca.budget as mdl
+from pytest_marcabanca.utils import HistoryEntry
+from unittest import TestCase
+
+
+def entry(rank, rltv_runtime):
+    return HistoryEntry(
+        kind="test",
+        reference_id={},
+        timestamp=0.0,
+        commit=None,
+        num_samples=2,
+        mean=1.0,
+        median=1.0,
+        rank=rank,
+        rltv_runtime=rltv_runtime,
+    )
+
+
+class TestBudget(TestCase):
+    def test_sampling_priority(self):
+        stable = [1.0, 1.0, 1.0]
+        self.assertEqual(mdl.sampling_priority(stable), 1.0)
+        self.assertGreater(mdl.sampling_priority([0.5, 1.0, 1.5]), 2.0)
+        self.assertEqual(mdl.sampling_priority(stable, entry(0.5, 1.0)), 1.0)
+        self.assertEqual(mdl.sampling_priority(stable, entry(0.9, 1.0)), 2.0)
+        self.assertEqual(mdl.sampling_priority(stable, entry(0.5, 1.6)), 3.0)
+
+    def test_allocate_runs(self):
+        costs = {"fast": 0.01, "slow": 1.0, "noisy": 0.1}
+        priorities = {"fast": 1.0, "slow": 1.0, "noisy": 4.0}
+        requested = {"fast": 10, "slow": 10, "noisy": 10}
+
+        # Generous budgets saturate at the requested runs scaled by priority.
+        self.assertEqual(
+            mdl.allocate_runs(costs, priorities, requested, 1000.0),
+            {"fast": 10, "slow": 10, "noisy": 40},
+        )
+
+        # Tight budgets keep the minimum.
+        self.assertEqual(
+            mdl.allocate_runs(costs, priorities, requested, 0.0),
+            {"fast": 2, "slow": 2, "noisy": 2},
+        )
+
+        # Intermediate budgets are not exceeded and favor high priorities.
+        runs = mdl.allocate_runs(costs, priorities, requested, 6.0)
+        self.assertLessEqual(sum(costs[_id] * (1 + runs[_id]) for _id in costs), 6.0)
+        self.assertEqual(runs["fast"], 10)
+        self.assertLess(runs["slow"], 10)
+        self.assertGreater(runs["noisy"], 10)
+
+        # Tests requesting fewer runs than the minimum.
+        self.assertEqual(
+            mdl.allocate_runs({"a": 1.0}, {"a": 1.0}, {"a": 1}, 0.0), {"a": 1}
+        )
+
+    def test_scaling_cost(self):
+        self.assertEqual(mdl.scaling_cost(0.1, [1, 2], 5), 1.5)
+        curve = [
+            {"workers": 1, "throughput": 10.0},
+            {"workers": 2, "throughput": 20.0},
+        ]
+        self.assertEqual(mdl.scaling_cost(0.1, [1, 2, 4], 5, curve), 3.0)
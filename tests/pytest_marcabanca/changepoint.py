@@ -0,0 +1,40 @@
+import pytest_marcabanca.changepoint as mdl
+import numpy as np
+from unittest import TestCase
+
+
+class TestFindLevelShift(TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def noise(self, num, scale=0.01):
+        return 1 + scale * self.rng.standard_normal(num)
+
+    def test_step(self):
+        runtimes = np.r_[np.ones(10), 1.3 * np.ones(10)] * self.noise(20)
+        shift = mdl.find_level_shift(runtimes)
+        self.assertEqual(shift.index, 10)
+        self.assertAlmostEqual(shift.ratio, 1.3, delta=0.05)
+
+    def test_creep(self):
+        # Ten 3% regressions, each well below a 1.5x threshold.
+        runtimes = 1.03 ** np.arange(12) * self.noise(12)
+        shift = mdl.find_level_shift(runtimes)
+        self.assertIsNotNone(shift)
+        self.assertGreater(shift.ratio, 1.2)
+
+    def test_stationary(self):
+        self.assertIsNone(mdl.find_level_shift(self.noise(30, 0.02)))
+
+    def test_improvement(self):
+        runtimes = np.r_[1.3 * np.ones(10), np.ones(10)] * self.noise(20)
+        self.assertIsNone(mdl.find_level_shift(runtimes))
+
+    def test_short(self):
+        self.assertIsNone(mdl.find_level_shift([1.0, 2.0, 3.0]))
+
+
+class TestPelt(TestCase):
+    def test_two_steps(self):
+        values = np.r_[np.zeros(8), np.ones(8), 3 * np.ones(8)]
+        self.assertEqual(mdl.pelt(values, 0.1), [8, 16])
@@ -0,0 +1,45 @@
+import pytest_marcabanca.coldstart as mdl
+from types import SimpleNamespace
+from unittest import TestCase
+
+
+def build_item(**kwargs):
+    return SimpleNamespace(
+        **{
+            "module": SimpleNamespace(__name__="gc"),
+            "cls": None,
+            "originalname": "collect",
+            "fixturenames": [],
+            "callspec": None,
+            **kwargs,
+        }
+    )
+
+
+class TestColdStart(TestCase):
+    def test_measure(self):
+        script = mdl.build_script(build_item())
+        times = mdl.measure_cold_start(script)
+        self.assertEqual(set(times), {"import", "first_call"})
+        self.assertTrue(all(_x >= 0 for _x in times.values()))
+
+        importtime = mdl.measure_importtime(script, top=3)
+        self.assertLessEqual(len(importtime), 3)
+        self.assertTrue(all(_x >= 0 for _x in importtime.values()))
+
+    def test_unsupported(self):
+        with self.assertRaises(mdl.ColdStartUnsupported):
+            mdl.build_script(build_item(fixturenames=["tmp_path"]))
+        with self.assertRaises(mdl.ColdStartUnsupported):
+            mdl.build_script(build_item(callspec=object()))
+
+    def test_failed(self):
+        script = mdl.build_script(build_item(originalname="no_such_function"))
+        with self.assertRaisesRegex(mdl.ColdStartFailed, "AttributeError"):
+            mdl.measure_cold_start(script)
+
+    def test_diff_importtime(self):
+        self.assertEqual(
+            mdl.diff_importtime({"a": 1.0, "b": 2.0, "c": 0.5}, {"a": 1.5, "b": 1.0}),
+            [("b", 1.0), ("c", 0.5)],
+        )
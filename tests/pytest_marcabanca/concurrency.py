@@ -0,0 +1,53 @@
+import pytest_marcabanca.concurrency as mdl
+import os
+import signal
+import time
+from unittest import TestCase
+
+
+class TestMeasureScaling(TestCase):
+    def test_measure(self):
+        for kind in mdl.KINDS:
+            with self.subTest(kind):
+                curve = mdl.measure_scaling(
+                    lambda: time.sleep(0.01), [2, 1], num_calls=2, kind=kind
+                )
+                self.assertEqual([_x["workers"] for _x in curve], [1, 2])
+                for _point in curve:
+                    self.assertGreater(_point["latency"], 0.009)
+                    self.assertGreater(_point["throughput"], 0)
+
+    def test_errors(self):
+        def fail():
+            raise ValueError("Failed")
+
+        with self.assertRaises(ValueError):
+            mdl.measure_concurrency(fail, 2, kind="thread")
+        with self.assertRaisesRegex(RuntimeError, "Failed"):
+            mdl.measure_concurrency(fail, 2, kind="process")
+        with self.assertRaises(ValueError):
+            mdl.measure_concurrency(fail, 2, kind="fiber")
+
+    def test_crashed_workers(self):
+        # Workers that die without a result do not hang the caller.
+        for fxn, exitcode in [
+            (lambda: os._exit(3), 3),
+            (lambda: os.kill(os.getpid(), signal.SIGKILL), -signal.SIGKILL),
+        ]:
+            start = time.perf_counter()
+            with self.assertRaisesRegex(RuntimeError, f"code {exitcode} "):
+                mdl.measure_concurrency(fxn, 2, kind="process")
+            self.assertLess(time.perf_counter() - start, 5 * mdl.POLL_INTERVAL)
+
+    def test_efficiency(self):
+        ideal = [
+            {"workers": 1, "throughput": 10.0},
+            {"workers": 4, "throughput": 40.0},
+        ]
+        contended = [
+            {"workers": 1, "throughput": 10.0},
+            {"workers": 4, "throughput": 20.0},
+        ]
+        self.assertEqual(mdl.scaling_efficiency(contended), {1: 1.0, 4: 0.5})
+        self.assertEqual(mdl.efficiency_ratio(contended, ideal), 0.5)
+        self.assertIsNone(mdl.efficiency_ratio(contended[:1], ideal))
@@ -0,0 +1,89 @@
+import pytest_marcabanca.export as mdl
+from pytest_marcabanca.pytest_marcabanca import Result
+from pytest_marcabanca.utils import ReferenceModel
+import csv
+import json
+import numpy as np
+import os.path as osp
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+
+def build_record(metric=None, quantiles=True, **kwargs):
+    ref_model = ReferenceModel({"test_node_id": "test_a"}, "norm")
+    ref_model.fit([1.0, 2.0, 3.0])
+    return mdl.result_record(
+        Result(
+            test_node_id="test_a",
+            exact=True,
+            rank=np.float64(0.5),
+            runtime=np.float64(2.0),
+            rltv_runtime=1.0,
+            model_mean=2.0,
+            empirical_mean=2.0,
+            ref_model=ref_model,
+            test_runtimes=[np.float64(1.5), 2.5],
+            metric=metric,
+        )._replace(**kwargs),
+        np.bool_(False),
+        {"rank_thresh": 0.99},
+        quantiles=quantiles,
+    )
+
+
+class TestExport(TestCase):
+    def test_result_record(self):
+        record = build_record()
+        self.assertEqual(record["reference_id"], {"test_node_id": "test_a"})
+        self.assertEqual(record["test_runtimes"], [1.5, 2.5])
+        self.assertIs(record["regressed"], False)
+        self.assertEqual(record["rank_thresh"], 0.99)
+        self.assertEqual(list(record["ref_quantiles"]), ["p50", "p90", "p99"])
+        self.assertEqual(record["ref_quantiles"]["p50"], [2.0, 2.0])
+        self.assertIs(type(record["rank"]), float)
+        json.dumps(record)
+        self.assertIsNone(build_record(quantiles=False)["ref_quantiles"])
+
+    def test_non_finite(self):
+        record = build_record(effect_size=np.float64(np.nan), rltv_runtime=np.inf)
+        self.assertIsNone(record["effect_size"])
+        self.assertIsNone(record["rltv_runtime"])
+        self.assertIn("null", json.dumps(record, allow_nan=False))
+
+    def test_final(self):
+        self.assertIs(build_record()["final"], True)
+        self.assertIs(build_record(p_value=0.01)["final"], False)
+        record = build_record(p_value=0.01, q_value=0.02)
+        self.assertIs(record["final"], True)
+        self.assertEqual(record["q_value"], 0.02)
+
+    def test_junit_properties(self):
+        properties = dict(mdl.junit_properties(build_record()))
+        self.assertEqual(properties["marcabanca_rank"], 0.5)
+        self.assertNotIn("marcabanca_p_value", properties)
+        self.assertIn(
+            "marcabanca_regressed_cold_start",
+            dict(mdl.junit_properties(build_record("cold_start"))),
+        )
+
+    def test_writers(self):
+        records = [build_record(), build_record("cold_start")]
+        with TemporaryDirectory() as root:
+            for _writer_type, _name in [
+                (mdl.JsonLinesWriter, "results.jsonl"),
+                (mdl.CsvWriter, "results.csv"),
+            ]:
+                writer = _writer_type(path := osp.join(root, _name))
+                for _record in records:
+                    writer.write(_record)
+                writer.close()
+
+            with open(osp.join(root, "results.jsonl"), "rt") as fo:
+                self.assertEqual([json.loads(_line) for _line in fo], records)
+
+            with open(osp.join(root, "results.csv"), "rt", newline="") as fo:
+                rows = list(csv.DictReader(fo))
+            self.assertEqual(len(rows), 2)
+            self.assertEqual(rows[1]["metric"], "cold_start")
+            self.assertEqual(rows[0]["metric"], "")
+            self.assertEqual(json.loads(rows[0]["test_runtimes"]), [1.5, 2.5])
@@ -0,0 +1,87 @@
+import pytest_marcabanca.htmlreport as mdl
+from pytest_marcabanca.utils import ReferenceModel, HistoryEntry
+import numpy as np
+import numpy.testing as npt
+import re
+import xml.dom.minidom
+from unittest import TestCase
+
+
+def build_summary(num_runtimes, num_history, regressed=None, profile=None):
+    rng = np.random.default_rng(0)
+    ref_model = ReferenceModel({"test_node_id": "test_a"}, "gamma")
+    ref_model.fit(rng.gamma(10.0, 0.1, num_runtimes))
+    history = [
+        HistoryEntry.from_runtimes(
+            "test", ref_model.reference_id, [1.0 + _k / 100], commit="abc"
+        )
+        for _k in range(num_history)
+    ]
+    return mdl.summarize_test(
+        "test_a<1>",
+        ref_model,
+        rng.gamma(10.0, 0.1, num_runtimes),
+        history,
+        regressed=regressed,
+        stats=[("Rank", "50.00%")],
+        profile=profile,
+    )
+
+
+class TestHTMLReport(TestCase):
+    def test_downsample(self):
+        npt.assert_array_equal(mdl.downsample([1, 2, 3], 5), [1, 2, 3])
+        npt.assert_array_equal(mdl.downsample([1, 3, 5, 7], 2), [2, 6])
+
+    def test_summarize_test(self):
+        # Aggregated data does not grow with the number of runtimes.
+        summary = build_summary(10000, 1000)
+        self.assertEqual(len(summary["counts"]), mdl.NUM_BINS)
+        self.assertEqual(len(summary["test_runtimes"]), mdl.MAX_SAMPLE_MARKS)
+        self.assertEqual(len(summary["trend"]), mdl.MAX_TREND_POINTS)
+        self.assertEqual(summary["num_ref_runtimes"], 10000)
+        self.assertEqual(summary["num_history"], 1000)
+
+    def test_constant_runtimes(self):
+        ref_model = ReferenceModel({"test_node_id": "test_a"}, "norm")
+        ref_model.fit([2.0] * 10)
+        summary = mdl.summarize_test("test_a", ref_model, [2.0] * 5)
+        self.assertEqual(len(summary["counts"]), 1)
+        self.assertLess(summary["edges"][0], 2.0)
+        self.assertGreater(summary["edges"][1], 2.0)
+        self.assertTrue(np.isfinite(summary["pdf_y"]).all())
+        xml.dom.minidom.parseString(mdl.svg_distribution(summary))
+
+    def test_render_html(self):
+        html = mdl.render_html(
+            [build_summary(20, 0, regressed=False), build_summary(20, 5, True)]
+        )
+        # Labels are escaped and regressed tests are listed first.
+        self.assertNotIn("test_a<1>", html)
+        self.assertLess(html.index('class="regressed"'), html.index('class="ok"'))
+        # Tests without a history have no trend plot.
+        svgs = re.findall("<svg.*?</svg>", html)
+        self.assertEqual(len(svgs), 3)
+        [xml.dom.minidom.parseString(_svg) for _svg in svgs]
+
+    def test_profile(self):
+        summary = build_summary(
+            20,
+            0,
+            True,
+            profile={
+                "pstats": "profiles/abc.regressed.pstats",
+                "collapsed": "profiles/abc.regressed.collapsed",
+                "diff": [("mod.py:1(f<x>)", 0.001, 0.002)],
+            },
+        )
+        self.assertEqual(summary["profile"]["diff"], [["mod.py:1(f<x>)", 0.001, 0.002]])
+        html = mdl.render_html([summary, build_summary(20, 0, False)])
+        self.assertIn('href="profiles/abc.regressed.pstats"', html)
+        self.assertIn('href="profiles/abc.regressed.collapsed"', html)
+        self.assertIn("mod.py:1(f&lt;x&gt;)", html)
+        self.assertEqual(html.count("Profile:"), 1)
+
+        # References without a profile have no diff.
+        summary["profile"]["diff"] = None
+        self.assertNotIn("<th>Function</th>", mdl.render_html([summary]))
@@ -0,0 +1,38 @@
+import pytest_marcabanca.impact as mdl
+import importlib
+import os.path as osp
+import sys
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+
+class TestImpact(TestCase):
+    def test_dependencies(self):
+        with TemporaryDirectory() as root:
+            with open(osp.join(root, "mb_impact_helper.py"), "wt") as fo:
+                fo.write("def fxn():\n    return 1\n")
+            sys.path.insert(0, root)
+            try:
+                module = importlib.import_module("mb_impact_helper")
+                dependencies = mdl.trace_dependencies(module.fxn, root)
+            finally:
+                sys.path.remove(root)
+                sys.modules.pop("mb_impact_helper", None)
+
+            # Only files within the root are recorded.
+            self.assertEqual(list(dependencies), ["mb_impact_helper.py"])
+            self.assertEqual(mdl.changed_files(dependencies, root), [])
+
+            with open(osp.join(root, "mb_impact_helper.py"), "at") as fo:
+                fo.write("\n")
+            self.assertEqual(
+                mdl.changed_files(dependencies, root), ["mb_impact_helper.py"]
+            )
+            self.assertEqual(
+                mdl.changed_files({"missing.py": "abc"}, root), ["missing.py"]
+            )
+
+    def test_restores_tracer(self):
+        prev_tracer = sys.gettrace()
+        mdl.trace_files(lambda: None, ".")
+        self.assertIs(sys.gettrace(), prev_tracer)
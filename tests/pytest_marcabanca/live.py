@@ -0,0 +1,49 @@
+import pytest_marcabanca.live as mdl
+from pytest_marcabanca.utils import ReferenceModel
+from types import SimpleNamespace
+from unittest import TestCase
+
+
+def build_display():
+    config = SimpleNamespace(pluginmanager=SimpleNamespace(getplugin=lambda name: None))
+    return mdl.LiveDisplay(config, min_interval=1e9)
+
+
+class TestLiveDisplay(TestCase):
+    def test_eta(self):
+        display = build_display()
+        display.plan({"test_a": 1.0, "test_b": None}, {"test_a": 3, "test_b": 2})
+        self.assertEqual(display.eta(), (3.0, 1))
+
+        display.begin("test_a", "test", 3)
+        display.add_sample(1.0)
+        self.assertEqual(display.eta(), (2.0, 1))
+        display.end("test_a")
+        self.assertEqual(display.eta(), (0.0, 1))
+
+        # Tests without a reference are estimated from their samples.
+        display.begin("test_b", "reference", 2)
+        display.add_sample(4.0)
+        self.assertEqual(display.eta(), (4.0, 0))
+
+    def test_estimate(self):
+        ref_model = ReferenceModel({"test_node_id": "test_a"}, "norm")
+        ref_model.fit([1.0, 2.0, 3.0])
+        display = build_display()
+        display.begin("test_a", "test", 2, ref_model=ref_model)
+        self.assertIsNone(display.estimate())
+        display.add_sample(2.0)
+        self.assertEqual(display.estimate(), (0.5, 1.0))
+
+    def test_render(self):
+        display = build_display()
+        display.begin("test_a[1]", "test", 2)
+        try:
+            for _k in range(7):
+                display.add_regression(f"test_{_k}")
+            self.assertIsNotNone(display.live)
+        finally:
+            display.stop()
+        self.assertEqual(display.num_regressions, 7)
+        self.assertEqual(list(display.regressions)[0], "test_2")
+        self.assertIsNone(display.live)
@@ -0,0 +1,159 @@
+import pytest_marcabanca.maintenance as mdl
+from pytest_marcabanca import profiles as mb_profiles
+from pytest_marcabanca.utils import Manager, PythonConfiguration, HistoryEntry
+import numpy as np
+import copy
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+
+def build_store(root):
+    """
+    Creates references for tests ``a`` and ``b`` in this environment and for test ``a`` in another python config, with history entries one and three days old. The last uses of the references are only known from their history.
+    """
+    mngr = Manager(root)
+    for _test_node_id in ["test_a", "test_b"]:
+        mngr.create_reference(_test_node_id, np.linspace(1.0, 2.0, 10))
+    other_config = PythonConfiguration(
+        config_id="other", specs=dict(mngr.this_python_config.specs, python="0.0")
+    )
+    mngr.data["python_configs"].append(other_config)
+    other_ref = copy.deepcopy(mngr.data["references"][0])
+    other_ref.reference_id = dict(other_ref.reference_id, python_config_id="other")
+    mngr.data["references"].append(other_ref)
+
+    now = mngr.history[0].timestamp
+    for _ref in mngr.data["references"]:
+        _ref.last_used = None
+    for _entry in mngr.history:
+        _entry.timestamp = now - 3 * mdl.DAY
+    for _reference_id in [mngr.build_reference_id("test_a"), other_ref.reference_id]:
+        entry = HistoryEntry.from_runtimes("test", _reference_id, [1.0])
+        entry.timestamp = now - mdl.DAY
+        mngr.append_history(entry)
+    mngr.write()
+    return now
+
+
+class TestMaintenance(TestCase):
+    def test_plan_prune(self):
+        with TemporaryDirectory() as root:
+            now = build_store(root)
+            mngr = Manager(root, add_this_env=False)
+
+            plan = mdl.plan_prune(mngr, now=now)
+            self.assertEqual(plan.counts(), dict.fromkeys(plan.counts(), 0))
+
+            # Tests that no longer exist.
+            plan = mdl.plan_prune(mngr, node_ids={"test_a"}, now=now)
+            self.assertEqual(
+                [_ref.reference_id["test_node_id"] for _ref in plan.references],
+                ["test_b"],
+            )
+            self.assertEqual(len(plan.history), 1)
+
+            # Age and count retention.
+            plan = mdl.plan_prune(mngr, max_age=2 * mdl.DAY, now=now)
+            self.assertEqual(
+                [_ref.reference_id["test_node_id"] for _ref in plan.references],
+                ["test_b"],
+            )
+            self.assertEqual(len(plan.history), 2)
+            plan = mdl.plan_prune(mngr, keep_history=1, now=now)
+            self.assertEqual(len(plan.history), 1)
+
+            # References used since their creation are kept, even without test history.
+            mngr.mark_used(mngr.data["references"][1], now)
+            plan = mdl.plan_prune(mngr, max_age=2 * mdl.DAY, now=now)
+            self.assertEqual(plan.references, [])
+            mngr.data["references"][1].last_used = None
+
+            # The unused python config is removed with its references.
+            mngr.history[-1].timestamp = now - 2 * mdl.DAY
+            plan = mdl.plan_prune(mngr, keep_environments=1, now=now)
+            self.assertEqual(
+                [_ref.reference_id["python_config_id"] for _ref in plan.references],
+                ["other"],
+            )
+            self.assertEqual(
+                [_config.config_id for _config in plan.python_configs], ["other"]
+            )
+            self.assertEqual(len(plan.history), 1)
+
+    def test_apply_prune(self):
+        with TemporaryDirectory() as root:
+            now = build_store(root)
+            mngr = Manager(root, add_this_env=False)
+            prefix = mb_profiles.profile_prefix(
+                root, mngr.data["references"][1].reference_id, "reference"
+            )
+            mb_profiles.save_profile(mb_profiles.profile_runs(lambda: None, 1), prefix)
+
+            size = mdl.store_size(root)
+            plan = mdl.plan_prune(mngr, node_ids={"test_a"}, now=now)
+            mdl.apply_prune(mngr, plan)
+            orphans = mdl.orphaned_profiles(root, mngr.data["references"])
+            self.assertEqual(len(orphans), 2)
+
+            # Dry runs leave the store untouched.
+            estimated_size, _ = mdl.measure_store(mngr, orphans)
+            self.assertLess(estimated_size, size)
+            self.assertEqual(mdl.store_size(root), size)
+
+            mngr.write()
+            [os.remove(_path) for _path in orphans]
+            self.assertEqual(mdl.store_size(root), estimated_size)
+            mngr = Manager(root, add_this_env=False)
+            self.assertEqual(len(mngr.data["references"]), 2)
+            self.assertEqual(len(mngr.history), 3)
+
+    def test_merge_stores(self):
+        with TemporaryDirectory() as root, TemporaryDirectory() as source_root:
+            build_store(root)
+            build_store(source_root)
+            source = Manager(source_root, add_this_env=False)
+            # Machine config ids are random, so equivalent machines have different ids.
+            source.data["machine_configs"][0].config_id = "source_machine"
+            for _x in [_ref.reference_id for _ref in source.data["references"]] + [
+                _entry.reference_id for _entry in source.history
+            ]:
+                _x["machine_config_id"] = "source_machine"
+            source.data["references"][0].fit(np.linspace(1.0, 3.0, 20))
+            for _entry in source.history:
+                _entry.timestamp += 1.0
+            mb_profiles.save_profile(
+                mb_profiles.profile_runs(lambda: None, 1),
+                mb_profiles.profile_prefix(
+                    source_root, source.data["references"][0].reference_id, "reference"
+                ),
+            )
+
+            for policy, num_replaced, num_merged in [
+                ("newest", 3, 0),
+                ("most-samples", 1, 0),
+                ("history", 3, 3),
+            ]:
+                mngr = Manager(root, add_this_env=False)
+                result = mdl.merge_stores(mngr, source, policy=policy)
+                self.assertEqual(result.counts["unified configs"], 3)
+                self.assertEqual(result.counts["added configs"], 0)
+                self.assertEqual(result.counts["replaced references"], num_replaced)
+                self.assertEqual(result.counts["kept references"], 3 - num_replaced)
+                self.assertEqual(
+                    len([_x for _x in mngr.history if _x.kind == "merged"]),
+                    num_merged,
+                )
+                self.assertEqual(len(mngr.data["references"]), 3)
+                self.assertEqual(
+                    {
+                        _ref.reference_id["machine_config_id"]
+                        for _ref in mngr.data["references"]
+                    },
+                    {mngr.data["machine_configs"][0].config_id},
+                )
+                self.assertEqual(len(result.profiles), 2)
+                self.assertEqual(
+                    len(mngr.data["references"][0].runtimes),
+                    mngr.data["references"][0].num_samples,
+                )
@@ -0,0 +1,38 @@
+import pytest_marcabanca.minhash as mdl
+from unittest import TestCase
+
+
+class TestMinHash(TestCase):
+    def test_similarity(self):
+        tokens = {f"package{_k}==1.0" for _k in range(200)}
+        signature = mdl.signature(tokens)
+        self.assertEqual(len(signature), mdl.NUM_HASHES)
+        self.assertEqual(signature, mdl.signature(set(tokens)))
+        self.assertEqual(mdl.similarity(signature, signature), 1.0)
+
+        # Jaccard index of 150 / 250 = 0.6.
+        other = {f"package{_k}==1.0" for _k in range(50, 250)}
+        self.assertAlmostEqual(
+            mdl.similarity(signature, mdl.signature(other)), 0.6, delta=0.2
+        )
+        self.assertLess(mdl.similarity(signature, mdl.signature({"other==1.0"})), 0.1)
+
+    def test_lsh_index(self):
+        index = mdl.LSHIndex()
+        token_sets = [
+            {f"package{_k}==1.0" for _k in range(_start, _start + 100)}
+            for _start in [0, 1000, 2000]
+        ]
+        for _k, _tokens in enumerate(token_sets):
+            index.add(_k, mdl.signature(_tokens))
+        similar = token_sets[1] - {"package1000==1.0"} | {"new==1.0"}
+        self.assertEqual(index.query(mdl.signature(similar)), [1])
+        self.assertEqual(index.query(mdl.signature({"other==1.0"})), [])
+
+        # Buckets keep the most recently added keys.
+        for _k in range(3, 20):
+            index.add(_k, mdl.signature(token_sets[0]))
+        self.assertEqual(
+            index.query(mdl.signature(token_sets[0])),
+            list(range(19, 19 - index.max_bucket_size, -1)),
+        )
@@ -0,0 +1,43 @@
+import pytest_marcabanca.noise as mdl
+import time
+from unittest import TestCase
+
+
+def reading(competing_cpu, noisy, freq=2000.0):
+    return {
+        "competing_cpu": competing_cpu,
+        "steal": 0.0,
+        "load": None,
+        "freq": freq,
+        "noisy": noisy,
+    }
+
+
+class TestNoiseMonitor(TestCase):
+    def test_sample(self):
+        monitor = mdl.NoiseMonitor(noise_thresh=101.0, interval=0.01).start()
+        try:
+            with monitor.sample() as annotation:
+                time.sleep(0.05)
+        finally:
+            monitor.stop()
+        self.assertFalse(annotation["noisy"])
+        self.assertGreaterEqual(annotation["competing_cpu"], 0.0)
+        self.assertEqual(monitor._windows, [])
+
+    def test_wait_until_quiet(self):
+        monitor = mdl.NoiseMonitor(noise_thresh=10.0, interval=0.01)
+        monitor.latest = reading(50.0, True)
+        self.assertGreaterEqual(monitor.wait_until_quiet(0.03), 0.03)
+        monitor.latest = reading(0.0, False)
+        self.assertEqual(monitor.wait_until_quiet(1.0), 0.0)
+
+    def test_summarize(self):
+        self.assertEqual(mdl.summarize([]), {"noisy": False})
+        summary = mdl.summarize(
+            [reading(5.0, False, 2000.0), reading(30.0, True, 1200.0)]
+        )
+        self.assertTrue(summary["noisy"])
+        self.assertEqual(summary["competing_cpu"], 30.0)
+        self.assertEqual(summary["freq"], 1200.0)
+        self.assertIsNone(summary["load"])
@@ -0,0 +1,64 @@
+import pytest_marcabanca.profiles as mdl
+import os.path as osp
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+
+def inner(n):
+    return sum(range(n))
+
+
+def outer(n):
+    return inner(n) + inner(n)
+
+
+def fib(n):
+    return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+
+class TestProfiles(TestCase):
+    def test_save_load(self):
+        stats = mdl.profile_runs(lambda: outer(10000), 2)
+        with TemporaryDirectory() as root:
+            prefix = mdl.profile_prefix(root, {"test_node_id": "test_a"}, "reference")
+            self.assertEqual(osp.dirname(prefix), osp.join(root, "profiles"))
+            mdl.save_profile(stats, prefix)
+            self.assertEqual(
+                mdl.self_times(mdl.load_profile(prefix)), mdl.self_times(stats)
+            )
+            self.assertIsNone(mdl.load_profile(prefix + "_missing"))
+
+            with open(prefix + ".collapsed", "rt") as fo:
+                stacks = dict(_line.rsplit(" ", 1) for _line in fo.read().splitlines())
+            [inner_stack] = [_stack for _stack in stacks if _stack.endswith("(inner)")]
+            self.assertIn("(outer);", inner_stack)
+
+    def test_collapsed_stacks(self):
+        stats = mdl.profile_runs(lambda: outer(100000), 1)
+        stacks = mdl.collapsed_stacks(stats)
+        # Self times are split between the stacks of each function.
+        self.assertAlmostEqual(
+            sum(stacks.values()) / 1e6, sum(mdl.self_times(stats).values()), places=4
+        )
+
+    def test_collapsed_stacks_recursive(self):
+        stats = mdl.profile_runs(lambda: fib(18) + outer(1000), 1)
+        stacks = mdl.collapsed_stacks(stats, min_time=0.0)
+        # Recursive calls are not expanded.
+        fib_stacks = [_stack for _stack in stacks if "(fib)" in _stack]
+        self.assertTrue(fib_stacks)
+        self.assertTrue(all(_stack.count("(fib)") == 1 for _stack in fib_stacks))
+
+        depths = [_stack.count(";") + 1 for _stack in stacks]
+        self.assertGreater(max(depths), 2)
+        stacks = mdl.collapsed_stacks(stats, min_time=0.0, max_depth=2)
+        self.assertEqual(max(_stack.count(";") + 1 for _stack in stacks), 2)
+
+    def test_diff_top_functions(self):
+        ref_stats = mdl.profile_runs(lambda: outer(1000), 2)
+        test_stats = mdl.profile_runs(lambda: outer(1000000), 1)
+        [(label, ref_time, test_time)] = mdl.diff_top_functions(
+            ref_stats, 2, test_stats, 1, num_functions=1
+        )
+        self.assertIn("sum", label)
+        self.assertGreater(test_time, ref_time)
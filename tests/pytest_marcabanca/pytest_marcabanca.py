@@ -0,0 +1,416 @@
+import pytest
+import json
+from pytest_marcabanca.pytest_marcabanca import REGRESSION_EXIT_CODE
+from pytest_marcabanca import stats as mb_stats
+from pytest_marcabanca.utils import load_references, journal_paths
+import numpy as np
+from unittest import TestCase
+
+TESTS = """
+import time
+from marcabanca import benchmark
+
+def test_slow():
+    time.sleep({delay})
+    {body}
+
+def test_slower():
+    time.sleep({delay})
+
+@benchmark(False)
+def test_fast():
+    pass
+"""
+
+
+class PytesterTestCase(TestCase):
+    @pytest.fixture(autouse=True)
+    def _pytester(self, pytester):
+        self.pytester = pytester
+
+    def run_benchmarks(self, *args):
+        return self.pytester.runpytest(
+            "-p", "pytest_marcabanca.pytest_marcabanca", "--mb=all", *args
+        )
+
+
+class TestReferences(PytesterTestCase):
+    def test_last_used(self):
+        self.pytester.makepyfile(test_module=TESTS.format(delay=0.001, body=""))
+        self.run_benchmarks(
+            "--mb-create-references=missing", "--mb-model-name=norm"
+        ).assert_outcomes(passed=3)
+        root = str(self.pytester.path / ".marcabanca")
+        created = {
+            _ref.reference_id["test_node_id"]: _ref.last_used
+            for _ref in load_references(root)
+        }
+        self.assertEqual(len(created), 2)
+        self.assertTrue(all(created.values()))
+
+        # Sessions evaluating the references record their use, without --mb-history.
+        self.run_benchmarks().assert_outcomes(passed=3)
+        for _ref in load_references(root):
+            self.assertGreater(
+                _ref.last_used, created[_ref.reference_id["test_node_id"]]
+            )
+
+    def test_resume_interrupted(self):
+        self.pytester.makepyfile(test_module="""
+            import os
+
+            def test_a():
+                pass
+
+            def test_b():
+                if os.path.exists("interrupt"):
+                    raise KeyboardInterrupt
+
+            def test_c():
+                pass
+            """)
+        root = str(self.pytester.path / ".marcabanca")
+        (self.pytester.path / "interrupt").write_text("")
+        reprec = self.pytester.inline_run(
+            "-p",
+            "pytest_marcabanca.pytest_marcabanca",
+            "--mb=all",
+            "--mb-create-references=missing",
+            no_reraise_ctrlc=True,
+        )
+        self.assertEqual(reprec.ret, pytest.ExitCode.INTERRUPTED)
+
+        # The data files are not written, and the journal is kept.
+        self.assertEqual(load_references(root), [])
+        self.assertEqual(len(journal_paths(root)), 1)
+
+        (self.pytester.path / "interrupt").unlink()
+        result = self.run_benchmarks("--mb-create-references=missing", "--mb-resume")
+        result.assert_outcomes(passed=2, deselected=1)
+        self.assertEqual(
+            sorted(_ref.reference_id["test_node_id"] for _ref in load_references(root)),
+            [f"test_module.py::test_{_x}" for _x in "abc"],
+        )
+        self.assertEqual(journal_paths(root), [])
+
+
+class TestColdStart(PytesterTestCase):
+    def test_failed(self):
+        # Passes under pytest only.
+        self.pytester.makepyfile(test_module="""
+            import sys
+
+            def test_a():
+                assert "_pytest" in sys.modules
+            """)
+        result = self.run_benchmarks(
+            "--mb-create-references=missing",
+            "--mb-cold-start",
+            "--mb-num-cold-runs=2",
+        )
+        result.assert_outcomes(passed=1)
+        result.stdout.fnmatch_lines(["*Cold-start benchmarking failed for 1*"])
+
+
+class TestEnforce(PytesterTestCase):
+    def build_regression(self, body=""):
+        """
+        Creates the references of a test module and then slows down ``test_slow`` and ``test_slower``. (Normal models are used, as gamma fits of near-constant runtimes are unreliable.)
+        """
+        self.pytester.makepyfile(test_module=TESTS.format(delay=0.001, body=""))
+        self.run_benchmarks(
+            "--mb-create-references=missing", "--mb-model-name=norm"
+        ).assert_outcomes(passed=3)
+        self.pytester.makepyfile(test_module=TESTS.format(delay=0.03, body=body))
+
+    def test_outcomes(self):
+        self.build_regression()
+        for enforce, outcomes, ret in [
+            ("fail", dict(passed=1, failed=2), REGRESSION_EXIT_CODE),
+            ("xfail", dict(passed=1, xfailed=2), 0),
+            ("warn", dict(passed=3, warnings=2), 0),
+            ("none", dict(passed=3), 0),
+        ]:
+            result = self.run_benchmarks(
+                "--mb-num-test-runs=5", f"--mb-enforce={enforce}"
+            )
+            result.assert_outcomes(**outcomes)
+            self.assertEqual(result.ret, ret)
+            if enforce != "none":
+                result.stdout.fnmatch_lines(
+                    ["*marcabanca performance regressions*", "*::test_slow: *"]
+                )
+                result.stdout.no_fnmatch_line("*found after the test was reported*")
+
+    def test_functional_failure(self):
+        # Tests that fail functionally keep their outcome and are not counted twice.
+        self.build_regression(body="assert False")
+        result = self.run_benchmarks("--mb-num-test-runs=5", "--mb-enforce=fail")
+        self.assertEqual(result.parseoutcomes(), dict(passed=1, failed=2))
+        self.assertEqual(result.ret, pytest.ExitCode.TESTS_FAILED)
+
+    def test_two_sample(self):
+        self.build_regression()
+        args = [
+            "--mb-num-test-runs=10",
+            "--mb-compare=mannwhitney",
+            "--mb-enforce=fail",
+        ]
+        result = self.run_benchmarks(*args, "--mb-report-json=results.jsonl")
+        result.assert_outcomes(passed=1, failed=2)
+        self.assertEqual(result.ret, REGRESSION_EXIT_CODE)
+
+        # Provisional records are followed by final records with q-values.
+        with open(self.pytester.path / "results.jsonl", "rt") as fo:
+            records = [json.loads(_line) for _line in fo]
+        self.assertEqual([_x["final"] for _x in records], [False] * 2 + [True] * 2)
+        self.assertTrue(all(_x["q_value"] is not None for _x in records[2:]))
+        self.assertTrue(all(_x["regressed"] for _x in records))
+
+        # Not significant by the provisional (Bonferroni) rule, but significant by their q-values.
+        p_value = mb_stats.mann_whitney_pvalue(np.arange(10, 20), np.arange(10))
+        result = self.run_benchmarks(
+            *args, f"--mb-fdr={1.5*p_value}", "--mb-rltv-thresh=1000"
+        )
+        self.assertEqual(result.parseoutcomes(), dict(passed=3, regressed=2))
+        self.assertEqual(result.ret, REGRESSION_EXIT_CODE)
+
+    def test_junit_xml(self):
+        self.build_regression()
+        self.run_benchmarks("--mb-num-test-runs=5", "--junitxml=report.xml")
+        xml = (self.pytester.path / "report.xml").read_text()
+        self.assertEqual(xml.count('name="marcabanca_regressed" value="True"'), 2)
+
+    def test_update_after_qvalues(self):
+        self.build_regression()
+        root = str(self.pytester.path / ".marcabanca")
+        p_value = mb_stats.mann_whitney_pvalue(np.arange(10, 20), np.arange(10))
+        args = [
+            "--mb-num-test-runs=10",
+            "--mb-compare=mannwhitney",
+            "--mb-rltv-thresh=1000",
+            "--mb-enforce=fail",
+            "--mb-update-references",
+        ]
+
+        # Regressions found by their q-values only do not update the references.
+        result = self.run_benchmarks(*args, f"--mb-fdr={1.5*p_value}")
+        self.assertEqual(result.parseoutcomes(), dict(passed=3, regressed=2))
+        self.assertEqual([_ref.num_updates for _ref in load_references(root)], [0, 0])
+
+        result = self.run_benchmarks(*args, "--mb-fdr=1e-12")
+        self.assertEqual(result.parseoutcomes(), dict(passed=3))
+        self.assertEqual([_ref.num_updates for _ref in load_references(root)], [1, 1])
+
+    def test_interleaved(self):
+        self.build_regression()
+        result = self.run_benchmarks(
+            "--mb-num-test-runs=5", "--mb-schedule=interleaved", "--mb-enforce=fail"
+        )
+        # Regressions found after the tests were reported are counted once.
+        self.assertEqual(result.parseoutcomes(), dict(passed=3, regressed=2))
+        self.assertEqual(result.ret, REGRESSION_EXIT_CODE)
+        result.stdout.fnmatch_lines(
+            ["*::test_slow: *(found after the test was reported)"]
+        )
+
+
+class TestInterleaved(PytesterTestCase):
+    def test_module_fixtures(self):
+        # Fixtures shared by consecutive tests are kept across rounds.
+        self.pytester.makepyfile(test_module="""
+            import pytest
+
+            @pytest.fixture(scope="module")
+            def setups(pytestconfig):
+                with open(pytestconfig.rootpath / "setups.txt", "at") as fo:
+                    fo.write("x")
+
+            def test_a(setups):
+                pass
+
+            def test_b(setups):
+                pass
+            """)
+        self.run_benchmarks(
+            "--mb-create-references=missing",
+            "--mb-num-ref-runs=5",
+            "--mb-schedule=interleaved",
+        ).assert_outcomes(passed=2)
+        # Once for the reported runs and once for the sampling rounds.
+        self.assertEqual((self.pytester.path / "setups.txt").read_text(), "xx")
+
+    def test_stopped(self):
+        self.pytester.makepyfile(test_module="""
+            def test_a():
+                pass
+
+            def test_b():
+                assert False
+
+            def test_c():
+                pass
+            """)
+        args = ["--mb-create-references=missing", "--mb-schedule=interleaved"]
+        result = self.run_benchmarks(*args, "-x")
+        result.assert_outcomes(passed=1, failed=1)
+        result.stdout.fnmatch_lines(
+            ["*1 tests were not benchmarked because the session was stopped*"]
+        )
+        self.assertEqual(load_references(str(self.pytester.path / ".marcabanca")), [])
+
+        result = self.run_benchmarks(*args)
+        result.assert_outcomes(passed=2, failed=1)
+        result.stdout.no_fnmatch_line("*the session was stopped*")
+        self.assertEqual(
+            len(load_references(str(self.pytester.path / ".marcabanca"))), 2
+        )
+
+
+class TestBudget(PytesterTestCase):
+    def test_overrun(self):
+        self.pytester.makepyfile(test_module=TESTS.format(delay=0.01, body=""))
+        self.run_benchmarks(
+            "--mb-create-references=missing", "--mb-model-name=norm"
+        ).assert_outcomes(passed=3)
+
+        # Reference creation runs are part of the plan.
+        result = self.run_benchmarks(
+            "--mb-create-references=overwrite", "--mb-time-budget=0.05"
+        )
+        result.assert_outcomes(passed=3)
+        result.stdout.fnmatch_lines(
+            [
+                "*planned under a time budget of 50 ms, of which *",
+                "*minimum planned benchmarking time of *",
+                "*exceeding the time budget of 50 ms*",
+            ]
+        )
+
+        result = self.run_benchmarks("--mb-time-budget=10")
+        result.assert_outcomes(passed=3)
+        result.stdout.no_fnmatch_line("*exceed*")
+
+
+class TestQuantiles(PytesterTestCase):
+    def test_reference_quantiles(self):
+        self.pytester.makepyfile(test_module=TESTS.format(delay=0.001, body=""))
+        args = ["--mb-quantile=0.9", "--mb-max-test-runs=20"]
+        self.run_benchmarks(
+            *args, "--mb-create-references=missing", "--mb-model-name=norm"
+        ).assert_outcomes(passed=3)
+        result = self.run_benchmarks(*args, "--mb-report-json=results.jsonl")
+        result.assert_outcomes(passed=3)
+        result.stdout.fnmatch_lines(
+            ["*Marcabanca reference quantiles*", "*p50*p90*p99*"]
+        )
+        with open(self.pytester.path / "results.jsonl", "rt") as fo:
+            records = [json.loads(_line) for _line in fo]
+        self.assertEqual(len(records), 2)
+        for _record in records:
+            self.assertEqual(
+                _record["ref_quantiles"]["p90"][0], _record["ref_quantile"]
+            )
+
+
+class TestSelect(PytesterTestCase):
+    def test_changed(self):
+        self.pytester.makepyfile(test_module=TESTS.format(delay=0.001, body=""))
+        self.run_benchmarks(
+            "--mb-create-references=missing", "--mb-model-name=norm"
+        ).assert_outcomes(passed=3)
+
+        # Test runs are recorded without --mb-history, and then carried forward.
+        for carried_forward in [False, True]:
+            result = self.run_benchmarks("--mb-select=changed")
+            result.assert_outcomes(passed=3)
+            if carried_forward:
+                result.stdout.fnmatch_lines(
+                    ["*2 tests with unchanged source dependencies*"]
+                )
+            else:
+                result.stdout.no_fnmatch_line("*unchanged source dependencies*")
+
+        # Runs recorded under another python config are not carried forward.
+        path = self.pytester.path / ".marcabanca" / "history.json"
+        history = json.loads(path.read_text())
+        for _entry in history:
+            if _entry["__value__"]["kind"] == "test":
+                _entry["__value__"]["reference_id"]["python_config_id"] = "other"
+        path.write_text(json.dumps(history))
+        result = self.run_benchmarks("--mb-select=changed")
+        result.assert_outcomes(passed=3)
+        result.stdout.no_fnmatch_line("*unchanged source dependencies*")
+
+
+class TestProfile(PytesterTestCase):
+    def test_qvalues(self):
+        self.pytester.makepyfile(test_module=TESTS.format(delay=0.001, body=""))
+        # The runs that follow reference creation are not profiled as regressions.
+        self.run_benchmarks(
+            "--mb-create-references=missing",
+            "--mb-model-name=norm",
+            "--mb-profile",
+            "--mb-rank-thresh=1",
+            "--mb-rltv-thresh=1000",
+        ).assert_outcomes(passed=3)
+        self.pytester.makepyfile(test_module=TESTS.format(delay=0.03, body=""))
+        profiles = self.pytester.path / ".marcabanca" / "profiles"
+        self.assertEqual(len(list(profiles.glob("*.reference.pstats"))), 2)
+
+        # Regressions only found by their q-values (see TestEnforce.test_two_sample).
+        p_value = mb_stats.mann_whitney_pvalue(np.arange(10, 20), np.arange(10))
+        args = [
+            "--mb-num-test-runs=10",
+            "--mb-compare=mannwhitney",
+            f"--mb-fdr={1.5*p_value}",
+            "--mb-rltv-thresh=1000",
+            "--mb-profile",
+            "--mb-report-html=report.html",
+        ]
+
+        # Sequential tests are profiled before the q-values are known.
+        result = self.run_benchmarks(*args)
+        self.assertEqual(result.parseoutcomes(), dict(passed=3))
+        self.assertEqual(list(profiles.glob("*.regressed.*")), [])
+        self.assertNotIn("Profile:", (self.pytester.path / "report.html").read_text())
+
+        # Interleaved tests are profiled after the q-values are computed.
+        result = self.run_benchmarks(*args, "--mb-schedule=interleaved")
+        self.assertEqual(result.parseoutcomes(), dict(passed=3))
+        self.assertEqual(len(list(profiles.glob("*.regressed.pstats"))), 2)
+        html = (self.pytester.path / "report.html").read_text()
+        self.assertEqual(html.count("Profile:"), 2)
+        for _path in profiles.glob("*.regressed.*"):
+            self.assertIn(f'href=".marcabanca/profiles/{_path.name}"', html)
+        self.assertIn("<th>Function</th>", html)
+
+
+class TestSimilarMachine(PytesterTestCase):
+    def test_fallback(self):
+        self.pytester.makepyfile(test_module=TESTS.format(delay=0.001, body=""))
+        self.run_benchmarks(
+            "--mb-create-references=missing", "--mb-model-name=norm"
+        ).assert_outcomes(passed=3)
+        # Move the references to a machine with a little more memory.
+        root = self.pytester.path / ".marcabanca"
+        path = root / "machine_configs.json"
+        (machine_config,) = json.loads(path.read_text())
+        machine_id = machine_config["__value__"]["config_id"]
+        machine_config["__value__"]["config_id"] = "other_machine"
+        machine_config["__value__"]["specs"]["memory"] *= 1.05
+        path.write_text(json.dumps([machine_config]))
+        for _name in ["references.json", "history.json"]:
+            path = root / _name
+            path.write_text(path.read_text().replace(machine_id, "other_machine"))
+
+        # The fallback is disabled by default.
+        result = self.run_benchmarks()
+        result.assert_outcomes(passed=3)
+        result.stdout.fnmatch_lines(
+            ["*2 marcabanca benchmark references were missing*"]
+        )
+
+        result = self.run_benchmarks("--mb-min-machine-similarity=0.9")
+        result.assert_outcomes(passed=3)
+        result.stdout.fnmatch_lines(["*2/2 tests ran with a reference from a similar*"])
@@ -0,0 +1,79 @@
+import pytest_marcabanca.query as mdl
+from pytest_marcabanca.maintenance import last_used, DAY
+from pytest_marcabanca.utils import Manager, load_references
+import numpy as np
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+
+class TestQuery(TestCase):
+    def test_filter_references(self):
+        with TemporaryDirectory() as root:
+            mngr = Manager(root)
+            mngr.create_reference("test_io.py::test_a", np.linspace(1.0, 2.0, 10))
+            mngr.create_reference(
+                "test_io.py::test_b", np.linspace(1.0, 2.0, 20), model_name="norm"
+            )
+            mngr.create_reference("test_cpu.py::test_c", np.linspace(1.0, 2.0, 30))
+            mngr.data["references"][0].last_used -= 2 * DAY
+            mngr.write()
+
+            references = load_references(root)
+            self.assertEqual(len(references), 3)
+            self.assertTrue(all(_ref._model is None for _ref in references))
+
+            def test_node_ids(**kwargs):
+                return [
+                    _ref.reference_id["test_node_id"]
+                    for _ref in mdl.filter_references(references, **kwargs)
+                ]
+
+            self.assertEqual(
+                test_node_ids(node_glob="test_io.py::*"),
+                ["test_io.py::test_a", "test_io.py::test_b"],
+            )
+            self.assertEqual(len(test_node_ids(machine_prefix="")), 3)
+            self.assertEqual(
+                test_node_ids(python_prefix=mngr.this_python_config.config_id[:4]),
+                test_node_ids(),
+            )
+            self.assertEqual(test_node_ids(machine_prefix="missing"), [])
+            self.assertEqual(test_node_ids(model_name="norm"), ["test_io.py::test_b"])
+            self.assertEqual(
+                test_node_ids(min_samples=15, max_samples=25), ["test_io.py::test_b"]
+            )
+            usage = last_used(references)
+            self.assertEqual(
+                test_node_ids(usage=usage, max_age=DAY),
+                ["test_io.py::test_b", "test_cpu.py::test_c"],
+            )
+            self.assertEqual(
+                test_node_ids(usage=usage, min_age=DAY), ["test_io.py::test_a"]
+            )
+            with self.assertRaises(ValueError):
+                test_node_ids(max_age=DAY)
+            # Filters load neither models nor runtimes.
+            self.assertTrue(all(_ref._model is None for _ref in references))
+            self.assertTrue(all(_ref._runtimes is None for _ref in references))
+
+    def test_reference_stats(self):
+        with TemporaryDirectory() as root:
+            mngr = Manager(root)
+            mngr.create_reference(
+                "test_a", runtimes := np.random.default_rng(0).gamma(4.0, 0.5, 1000)
+            )
+            mngr.write()
+            [reference] = load_references(root)
+            model_stats = mdl.reference_stats(reference)
+            empirical_stats = mdl.reference_stats(reference, empirical=True)
+            self.assertEqual(model_stats["n"], 1000)
+            self.assertAlmostEqual(empirical_stats["mean"], runtimes.mean())
+            self.assertAlmostEqual(empirical_stats["cv"], 0.5, delta=0.05)
+            for _key in ["mean", "cv", "p99"]:
+                self.assertAlmostEqual(
+                    model_stats[_key] / empirical_stats[_key], 1.0, delta=0.1
+                )
+
+            [record] = mdl.query_records([reference])
+            self.assertEqual(record["test_node_id"], "test_a")
+            self.assertIsNone(record["last_used"])
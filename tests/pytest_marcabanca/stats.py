@@ -0,0 +1,97 @@
+import pytest_marcabanca.stats as mdl
+import numpy as np
+import numpy.testing as npt
+from unittest import TestCase, mock
+
+
+class TestBenjaminiHochberg(TestCase):
+    def test_values(self):
+        pvalues = [0.01, 0.04, 0.03, 0.2]
+        npt.assert_allclose(
+            mdl.benjamini_hochberg(pvalues), [0.04, 0.04 * 4 / 3, 0.04 * 4 / 3, 0.2]
+        )
+
+    def test_monotone_and_bounded(self):
+        pvalues = np.random.default_rng(0).uniform(size=100)
+        qvalues = mdl.benjamini_hochberg(pvalues)
+        order = np.argsort(pvalues)
+        self.assertTrue(np.all(np.diff(qvalues[order]) >= 0))
+        self.assertTrue(np.all(qvalues >= pvalues - 1e-12))
+        self.assertTrue(np.all(qvalues <= 1))
+
+    def test_empty(self):
+        self.assertEqual(len(mdl.benjamini_hochberg([])), 0)
+
+
+class TestTwoSample(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.ref = rng.gamma(10.0, 0.1, 30)
+        self.same = rng.gamma(10.0, 0.1, 30)
+        self.slow = rng.gamma(10.0, 0.15, 30)
+        self.rng = rng
+
+    def test_comparisons(self):
+        for name, fxn in mdl.COMPARISONS.items():
+            kwargs = {"rng": self.rng} if name == "bootstrap" else {}
+            with self.subTest(name):
+                self.assertLess(fxn(self.slow, self.ref, **kwargs), 0.01)
+                self.assertGreater(fxn(self.same, self.ref, **kwargs), 0.01)
+                # One-sided
+                self.assertGreater(fxn(self.ref, self.slow, **kwargs), 0.5)
+
+    def test_effect_size(self):
+        self.assertEqual(mdl.common_language_effect_size([2.0], [1.0, 3.0]), 0.5)
+        self.assertEqual(mdl.common_language_effect_size([1.0], [1.0]), 0.5)
+        self.assertGreater(mdl.common_language_effect_size(self.slow, self.ref), 0.7)
+
+
+class TestConfidenceIntervals(TestCase):
+    def test_bootstrap_ratio_ci(self):
+        rng = np.random.default_rng(0)
+        base = rng.gamma(10.0, 0.1, 50)
+        ratio, lower, upper = mdl.bootstrap_ratio_ci(2 * base, base, rng=rng)
+        self.assertAlmostEqual(ratio, 2.0)
+        self.assertLess(lower, ratio)
+        self.assertGreater(upper, ratio)
+        self.assertGreater(lower, 1.5)
+
+    def test_bootstrap_means(self):
+        rng = np.random.default_rng(0)
+        samples = [[1.0, 1.0, 1.0], [0.0, 1.0], rng.gamma(10.0, 0.1, 50)]
+        with mock.patch.object(mdl, "MAX_BOOTSTRAP_BATCH", 100):
+            # Resamples are drawn in batches of two.
+            means = mdl.bootstrap_means(samples, num_resamples=501, rng=rng)
+        self.assertEqual(means.shape, (501, 3))
+        npt.assert_array_equal(means[:, 0], 1.0)
+        self.assertEqual(set(means[:, 1]), {0.0, 0.5, 1.0})
+        npt.assert_allclose(means[:, 2].mean(), np.mean(samples[2]), rtol=0.01)
+        self.assertGreater(means[:, 2].std(), 0.0)
+
+    def test_bootstrap_ratio_cis(self):
+        rng = np.random.default_rng(0)
+        base = rng.gamma(10.0, 0.1, 50)
+        (ratio, lower, upper), (same_ratio, *same_ci) = mdl.bootstrap_ratio_cis(
+            [(2 * base, base), (base[:20], base[:20])], rng=rng
+        )
+        self.assertAlmostEqual(ratio, 2.0)
+        self.assertGreater(lower, 1.5)
+        self.assertAlmostEqual(same_ratio, 1.0)
+        self.assertLess(same_ci[0], 1.0)
+        self.assertGreater(same_ci[1], 1.0)
+        self.assertEqual(mdl.bootstrap_ratio_cis([]), [])
+
+    def test_geometric_mean_ci(self):
+        rng = np.random.default_rng(0)
+        gmean, lower, upper = mdl.geometric_mean_ci([0.5, 2.0, 1.0], rng=rng)
+        self.assertAlmostEqual(gmean, 1.0)
+        self.assertLessEqual(lower, gmean)
+        self.assertGreaterEqual(upper, gmean)
+        self.assertEqual(mdl.geometric_mean_ci([2.0, 2.0], rng=rng), (2.0, 2.0, 2.0))
+
+
+class TestMinRunsForQuantile(TestCase):
+    def test_values(self):
+        self.assertEqual(mdl.min_runs_for_quantile(0.5), 4)
+        self.assertEqual(mdl.min_runs_for_quantile(0.99), 200)
+        self.assertEqual(mdl.min_runs_for_quantile(0.9, tail_samples=1), 10)
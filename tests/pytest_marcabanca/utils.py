@@ -25,6 +25,23 @@ class TestMachineConfiguration(TestCase):
         mc1.specs["cpuinfo"]["arch"] = mc1.specs["cpuinfo"]["arch"] + "_different"
         self.assertNotEqual(mc1, mc2)
 
+    def test_similarity(self):
+        mc1 = mdl.MachineConfiguration()
+        mc2 = mdl.MachineConfiguration()
+        self.assertAlmostEqual(mc1.similarity(mc2), 1.0)
+
+        # Microcode/BIOS-like changes do not affect similarity.
+        mc2.specs["cpuinfo"]["hz_advertised"] = [1, 0]
+        mc2.specs["cpuinfo"]["stepping"] = -1
+        self.assertNotEqual(mc1, mc2)
+        self.assertAlmostEqual(mc1.similarity(mc2), 1.0)
+
+        mc2.specs["memory"] = mc1.specs["memory"] / 2
+        self.assertAlmostEqual(mc1.similarity(mc2), 0.95)
+
+        mc2.specs["cpuinfo"]["arch"] = str(mc1.specs["cpuinfo"].get("arch")) + "_other"
+        self.assertEqual(mc1.similarity(mc2), 0.0)
+
 
 class TestPythonConfiguration(TestCase):
 
@@ -35,6 +52,64 @@ class TestPythonConfiguration(TestCase):
         mc = mdl.PythonConfiguration()
         self.assertEqual(self.serializer.deserialize(self.serializer.serialize(mc)), mc)
 
+    def test_content_id(self):
+        pc1 = mdl.PythonConfiguration()
+        self.assertEqual(pc1.config_id, mdl.PythonConfiguration().config_id)
+        specs = mdl.PythonConfiguration().specs
+        specs["modules"].add(mdl.PythonModule("extra_package", "1.0"))
+        self.assertNotEqual(
+            pc1.config_id, mdl.PythonConfiguration(specs=specs).config_id
+        )
+
+    def test_encode_decode(self):
+        pc1 = mdl.PythonConfiguration()
+        specs = mdl.PythonConfiguration().specs
+        specs["modules"].add(mdl.PythonModule("extra_package", "1.0"))
+        pc2 = mdl.PythonConfiguration(specs=specs)
+
+        encoded = mdl.encode_python_configs([pc1, pc2])
+        # The second configuration is stored as a delta.
+        self.assertEqual(encoded["configs"][1]["base"], pc1.config_id)
+        self.assertEqual(
+            [str(_x) for _x in encoded["configs"][1]["added"]], ["extra_package 1.0"]
+        )
+        decoded = mdl.decode_python_configs(
+            self.serializer.deserialize(self.serializer.serialize(encoded))
+        )
+        self.assertEqual(decoded, [pc1, pc2])
+        self.assertEqual(
+            [_x.config_id for _x in decoded], [pc1.config_id, pc2.config_id]
+        )
+        self.assertEqual(decoded[1].signature, pc2.signature)
+
+        # Legacy format.
+        self.assertEqual(mdl.decode_python_configs([pc1]), [pc1])
+
+        # Bases are looked up among all the previous configurations.
+        def build_config(prefix, extra=()):
+            return mdl.PythonConfiguration(
+                specs={
+                    "python": "3",
+                    "modules": {
+                        mdl.PythonModule(f"{prefix}{_k}", "1.0") for _k in range(100)
+                    }
+                    | set(extra),
+                }
+            )
+
+        configs = [
+            build_config("a"),
+            build_config("b"),
+            build_config("b", [mdl.PythonModule("extra_b", "1.0")]),
+            build_config("a", [mdl.PythonModule("extra_a", "1.0")]),
+        ]
+        encoded = mdl.encode_python_configs(configs)
+        self.assertEqual(
+            [_x["base"] for _x in encoded["configs"]],
+            [None, None, configs[1].config_id, configs[0].config_id],
+        )
+        self.assertEqual(mdl.decode_python_configs(encoded), configs)
+
     def test_eq(self):
         pc1 = mdl.PythonConfiguration()
         pc2 = mdl.PythonConfiguration()
@@ -42,6 +117,14 @@ class TestPythonConfiguration(TestCase):
         next(iter(pc1.specs["modules"])).version += "_different"
         self.assertNotEqual(pc1, pc2)
 
+        # Configurations are compared by their content hashes first.
+        pc3 = mdl.PythonConfiguration(config_id="legacy", specs=dict(pc2.specs))
+        self.assertEqual(pc3.content_id, pc2.config_id)
+        self.assertEqual(pc3, pc2)
+        pc3 = mdl.PythonConfiguration(specs=dict(pc2.specs, python="0.0"))
+        self.assertNotEqual(pc3.content_id, pc2.content_id)
+        self.assertNotEqual(pc3, pc2)
+
 
 @contextmanager
 def get_references_manager():
@@ -141,8 +224,10 @@ class TestManager(TestCase):
             ]:
                 self.assertEqual(_ref.reference_id, reference_id)
 
-            new_python_config = mdl.PythonConfiguration()
-            next(iter(new_python_config.specs["modules"])).version += "_abc"
+            # Python configuration ids are content hashes: modify the specs before construction.
+            new_python_specs = mdl.PythonConfiguration().specs
+            next(iter(new_python_specs["modules"])).version += "_abc"
+            new_python_config = mdl.PythonConfiguration(specs=new_python_specs)
 
             new_machine_config = mdl.MachineConfiguration()
             new_machine_config.specs["cpuinfo"][
@@ -198,3 +283,380 @@ class TestManager(TestCase):
                     mngr1.get_reference_model(reference_id__new_py["test_node_id"])[1],
                 ]:
                     self.assertEqual(_ref.reference_id, reference_id__new_py)
+
+    def test_approx_module_overlap(self):
+        with get_references_manager() as mngr1:
+            this_config = mngr1.this_python_config
+            modules = sorted(this_config.specs["modules"], key=str)
+            test_node_id = "my.module::MyClass::my_method"
+
+            # Configs differing from this environment by 1 and by 6 modules.
+            for _seed in range(20):
+                configs = []
+                for _num_diffs in [6, 1]:
+                    specs = {
+                        "python": this_config.specs["python"],
+                        "modules": set(modules[_num_diffs:])
+                        | {
+                            mdl.PythonModule(f"other_{_seed}_{_k}", "1.0")
+                            for _k in range(_num_diffs)
+                        },
+                    }
+                    configs.append(mdl.PythonConfiguration(specs=specs))
+                mngr1.data["python_configs"].extend(configs)
+                mngr1.data["references"] = []
+                for _config in configs:
+                    with swapattr(mngr1, "this_python_config", _config):
+                        mngr1.create_reference(test_node_id, [1.0, 2.0, 3.0], "norm")
+
+                _, reference = mngr1.find_approx_reference_model(
+                    mngr1.build_reference_id(test_node_id)
+                )
+                self.assertEqual(
+                    reference.reference_id["python_config_id"], configs[1].config_id
+                )
+
+    def test_similar_machine_fallback(self):
+        with get_references_manager() as mngr1:
+            test_node_id = "my.module::MyClass::my_method"
+            mngr1.create_reference(test_node_id, [1.0, 2.0, 3.0], "norm")
+
+            # Simulate a microcode update on this machine.
+            new_machine_config = mdl.MachineConfiguration()
+            new_machine_config.config_id = "new_machine"
+            new_machine_config.specs["cpuinfo"]["hz_advertised"] = [1, 0]
+            mngr1.data["machine_configs"].append(new_machine_config)
+            with swapattr(mngr1, "this_machine_config", new_machine_config):
+                self.assertEqual(
+                    mngr1.get_reference_match(test_node_id), (None, None, None)
+                )
+                mngr1.min_machine_similarity = 0.9
+                tier, ref, similarity = mngr1.get_reference_match(test_node_id)
+                self.assertEqual(tier, "similar_machine")
+                self.assertEqual(ref.reference_id["test_node_id"], test_node_id)
+                self.assertAlmostEqual(similarity, 1.0)
+                self.assertEqual(mngr1.get_reference_model(test_node_id), (False, ref))
+
+                # Missing metric references are not matched.
+                self.assertEqual(
+                    mngr1.get_reference_match(test_node_id, "cold_start"),
+                    (None, None, None),
+                )
+
+            self.assertEqual(mngr1.get_reference_match(test_node_id)[0], "exact")
+
+    def test_quantiles(self):
+        ref = mdl.ReferenceModel({}, "norm")
+        ref.fit(runtimes := np.random.default_rng(0).normal(1.0, 0.1, 1000))
+        npt.assert_allclose(ref.quantiles([0.5]), [1.0], rtol=0.01)
+        npt.assert_array_equal(
+            ref.empirical_quantiles([0.5, 0.9]), np.quantile(runtimes, [0.5, 0.9])
+        )
+        summary = ref.quantile_summary()
+        self.assertEqual(list(summary), ["p50", "p90", "p99"])
+        npt.assert_allclose(summary["p99"], [1.2326, 1.2326], rtol=0.03)
+
+    def test_history(self):
+        with get_references_manager() as mngr1:
+            test_node_id = "my.module::MyClass::my_method"
+            mngr1.create_reference(test_node_id, np.linspace(1.0, 2.0, 10))
+            mngr1.append_history(
+                mdl.HistoryEntry.from_runtimes(
+                    "test",
+                    mngr1.build_reference_id(test_node_id),
+                    [2.0, 3.0],
+                    rank=0.5,
+                    rltv_runtime=1.6,
+                )
+            )
+            self.assertTrue(mngr1.modified)
+            mngr1.write()
+
+            mngr2 = mdl.Manager(mngr1.root)
+            history = mngr2.get_history(test_node_id)
+            self.assertEqual(history, mngr1.history)
+            self.assertEqual([_x.kind for _x in history], ["reference", "test"])
+            self.assertEqual(history[0].mean, 1.5)
+            self.assertEqual(history[1].num_samples, 2)
+            self.assertEqual(mngr2.get_history(test_node_id + "_missing"), [])
+
+    def test_update_reference(self):
+        with get_references_manager() as mngr1:
+            test_node_id = "my.module::MyClass::my_method"
+            rng = np.random.default_rng(0)
+            self.assertIsNone(mngr1.update_reference(test_node_id, [1.0]))
+            mngr1.create_reference(test_node_id, rng.gamma(10.0, 0.1, 20), "norm")
+            ref = mngr1.check_reference_exists(test_node_id)[1]
+            orig_mean = ref.model.stats("m")
+
+            # Updates are capped, even for a large regression.
+            for _ in range(3):
+                shift = mngr1.update_reference(
+                    test_node_id,
+                    rng.gamma(10.0, 0.2, 20),
+                    max_shift=0.02,
+                    reservoir_size=50,
+                    rng=rng,
+                )
+                self.assertLessEqual(abs(shift), 0.02 + 1e-9)
+            self.assertLessEqual(ref.model.stats("m"), orig_mean * 1.02**3 + 1e-9)
+            self.assertGreater(ref.model.stats("m"), orig_mean)
+            self.assertEqual(len(ref.runtimes), 50)
+            self.assertEqual(ref.num_samples, 80)
+            self.assertEqual(ref.num_updates, 3)
+
+            # Round trip
+            mngr1.write()
+            ref2 = mdl.Manager(mngr1.root).check_reference_exists(test_node_id)[1]
+            self.assertEqual(ref2, ref)
+            self.assertEqual((ref2.num_samples, ref2.num_updates), (80, 3))
+            self.assertEqual(ref2.original_mean, orig_mean)
+
+    def test_update_max_drift(self):
+        ref = mdl.ReferenceModel({}, "norm")
+        rng = np.random.default_rng(0)
+        ref.fit(rng.normal(1.0, 0.01, 20))
+        orig_mean = ref.original_mean
+
+        # A steady regression is absorbed up to the drift bound only.
+        for _ in range(30):
+            ref.update(
+                rng.normal(1.5, 0.01, 20), max_shift=0.02, max_drift=0.1, rng=rng
+            )
+        self.assertAlmostEqual(ref.model.stats("m"), orig_mean * 1.1, places=6)
+
+        # Updates back towards the original mean are allowed.
+        self.assertLess(
+            ref.update(rng.normal(0.5, 0.01, 5000), max_drift=0.1, rng=rng), 0
+        )
+
+        # References without an original mean start bounding drift at their next update.
+        legacy = mdl.ReferenceModel._from_serializable(
+            {**mdl.ReferenceModel._as_serializable(ref), "original_mean": None}
+        )
+        legacy.update(rng.normal(1.5, 0.01, 20), max_drift=0.0, rng=rng)
+        self.assertEqual(legacy.model_args, ref.model_args)
+
+    def test_noise(self):
+        with get_references_manager() as mngr1:
+            test_node_id = "my.module::MyClass::my_method"
+            rng = np.random.default_rng(0)
+            mngr1.create_reference(
+                test_node_id,
+                [1.0, 2.0, 3.0],
+                "norm",
+                noise=[{"noisy": False}, {"noisy": True}, {"noisy": False}],
+            )
+            ref = mngr1.check_reference_exists(test_node_id)[1]
+
+            # Annotations follow their runtimes in the reservoir.
+            new_runtimes = rng.normal(2.0, 0.5, 20)
+            mngr1.update_reference(
+                test_node_id,
+                new_runtimes,
+                noise=[{"noisy": True, "k": _k} for _k in range(20)],
+                reservoir_size=10,
+                rng=rng,
+            )
+            self.assertEqual(len(ref.noise), len(ref.runtimes))
+            for _runtime, _annotation in zip(ref.runtimes, ref.noise):
+                if "k" in _annotation:
+                    self.assertEqual(_runtime, new_runtimes[_annotation["k"]])
+
+            # Round trip
+            mngr1.write()
+            ref2 = mdl.Manager(mngr1.root).check_reference_exists(test_node_id)[1]
+            self.assertEqual(ref2.noise, ref.noise)
+
+            # Unannotated updates drop the annotations.
+            mngr1.update_reference(test_node_id, [2.0], rng=rng)
+            self.assertIsNone(ref.noise)
+
+    def test_journal(self):
+        with get_references_manager() as mngr1:
+            test_node_id = "my.module::MyClass::my_method"
+            mngr1.create_reference(test_node_id, [1.0, 2.0, 3.0], "norm")
+            mngr1.journal_completed(test_node_id)
+
+            # The journals of running sessions are not replayed.
+            mngr_live = mdl.Manager(mngr1.root)
+            self.assertIsNone(mngr_live.check_reference_exists(test_node_id))
+            self.assertIsNone(mngr_live.interrupted_session)
+            mngr_live.create_reference("other", [1.0, 2.0], "norm")
+            mngr_live.write()
+            self.assertTrue(mdl.osp.exists(mngr1.journal_path))
+
+            # Simulate a crash while appending a record.
+            with open(mngr1.journal_path, "at") as fo:
+                fo.write('{"kind": "refer')
+            mngr1.close_journal()
+
+            # References are recovered without a call to write.
+            mngr2 = mdl.Manager(mngr1.root)
+            self.assertTrue(mngr2.modified)
+            self.assertEqual(
+                mngr2.check_reference_exists(test_node_id)[1],
+                mngr1.check_reference_exists(test_node_id)[1],
+            )
+            # The journaled configs are recovered under the ids of the equal stored configs.
+            self.assertEqual(
+                mngr2.this_machine_config.config_id,
+                mngr_live.this_machine_config.config_id,
+            )
+            self.assertEqual(len(mngr2.data["machine_configs"]), 1)
+            self.assertEqual(len(mngr2.history), 2)
+            self.assertEqual(
+                mngr2.interrupted_session, (mngr1.session_id, {test_node_id})
+            )
+
+            # Writing compacts the journal.
+            mngr2.write()
+            self.assertEqual(mdl.journal_paths(mngr1.root), [])
+            mngr3 = mdl.Manager(mngr1.root)
+            self.assertIsNone(mngr3.interrupted_session)
+            self.assertEqual(mngr3.data, mngr2.data)
+
+    def test_runtimes_store(self):
+        with get_references_manager() as mngr1:
+            runtimes = {"test_a": [1.0, 2.0, 3.0], "test_b": [4.0, 5.0]}
+            for _test_node_id, _runtimes in runtimes.items():
+                mngr1.create_reference(_test_node_id, _runtimes, "norm")
+            mngr1.write()
+
+            # Runtimes are stored in the binary file.
+            with open(mngr1.paths["references"], "rt") as fo:
+                self.assertNotIn('"runtimes"', fo.read())
+            npt.assert_array_equal(
+                np.load(mngr1.paths["runtimes"]), [1.0, 2.0, 3.0, 4.0, 5.0]
+            )
+
+            # Runtimes are loaded lazily.
+            mngr2 = mdl.Manager(mngr1.root)
+            ref_b = mngr2.check_reference_exists("test_b")[1]
+            self.assertIsNone(ref_b._runtimes)
+            self.assertEqual(ref_b.runtimes_span, (3, 2))
+            npt.assert_array_equal(ref_b.runtimes, runtimes["test_b"])
+            self.assertEqual(ref_b.num_samples, 2)
+
+            # Models are built lazily.
+            self.assertIsNone(ref_b._model)
+            self.assertEqual(ref_b.rank_runtime(4.5), 0.5)
+            self.assertIsNotNone(ref_b._model)
+            ref_b.model_args = [5.0, 1.0]
+            self.assertIsNone(ref_b._model)
+            self.assertEqual(ref_b.rank_runtime(5.0), 0.5)
+
+            # Updated runtimes are re-written.
+            mngr2.update_reference("test_b", [6.0], reservoir_size=3)
+            self.assertIsNone(ref_b.runtimes_span)
+            mngr2.write()
+            mngr3 = mdl.Manager(mngr1.root)
+            for _test_node_id, _runtimes in [
+                ("test_a", runtimes["test_a"]),
+                ("test_b", [4.0, 5.0, 6.0]),
+            ]:
+                npt.assert_array_equal(
+                    mngr3.check_reference_exists(_test_node_id)[1].runtimes, _runtimes
+                )
+
+    def test_concurrent_writes(self):
+        with get_references_manager() as mngr:
+            for _test_node_id, _runtimes in [
+                ("t::a", [1.0, 2.0, 3.0]),
+                ("t::b", [5.0, 5.1, 5.2, 5.3]),
+            ]:
+                mngr.create_reference(_test_node_id, _runtimes, "norm")
+            mngr.write()
+
+            # Both sessions load the store before either writes it.
+            mngr_a = mdl.Manager(mngr.root)
+            mngr_b = mdl.Manager(mngr.root)
+            mngr_b.create_reference("t::a", [3.0] * 10, "norm")
+            mngr_b.write()
+
+            # Session A's references keep reading the runtimes they were loaded with.
+            npt.assert_array_equal(
+                mngr_a.check_reference_exists("t::b")[1].runtimes, [5.0, 5.1, 5.2, 5.3]
+            )
+
+            # Session A's write keeps the reference written by session B.
+            mngr_a.create_reference("t::z", [7.0, 8.0], "norm")
+            mngr_a.write()
+            mngr_c = mdl.Manager(mngr.root)
+            for _test_node_id, _runtimes in [
+                ("t::a", [3.0] * 10),
+                ("t::b", [5.0, 5.1, 5.2, 5.3]),
+                ("t::z", [7.0, 8.0]),
+            ]:
+                npt.assert_array_equal(
+                    mngr_c.check_reference_exists(_test_node_id)[1].runtimes, _runtimes
+                )
+            self.assertEqual(len(mngr_c.history), 4)
+
+            # References removed by a session stay removed, and updated ones are kept.
+            mngr_d = mdl.Manager(mngr.root)
+            mngr_c.update_reference("t::b", [6.0], reservoir_size=5)
+            mngr_c.write()
+            mngr_d.data["references"] = [
+                _ref
+                for _ref in mngr_d.data["references"]
+                if _ref.reference_id["test_node_id"] != "t::z"
+            ]
+            mngr_d.write()
+            mngr_e = mdl.Manager(mngr.root)
+            self.assertIsNone(mngr_e.check_reference_exists("t::z"))
+            npt.assert_array_equal(
+                mngr_e.check_reference_exists("t::b")[1].runtimes,
+                [5.0, 5.1, 5.2, 5.3, 6.0],
+            )
+
+    def test_usage(self):
+        with get_references_manager() as mngr:
+            mngr.create_reference("t::a", [1.0, 2.0, 3.0], "norm")
+            mngr.write()
+            stamp = mdl._file_stamp(mngr.paths["references"])
+
+            # Last uses do not modify the data files.
+            mngr_a = mdl.Manager(mngr.root)
+            ref = mngr_a.check_reference_exists("t::a")[1]
+            mngr_a.mark_used(ref, ref.last_used + 10)
+            self.assertFalse(mngr_a.modified)
+            mngr_a.write_usage()
+            self.assertEqual(mdl._file_stamp(mngr.paths["references"]), stamp)
+
+            # The latest last use of concurrent sessions is kept.
+            mngr_b = mdl.Manager(mngr.root)
+            self.assertEqual(
+                mngr_b.check_reference_exists("t::a")[1].last_used, ref.last_used
+            )
+            mngr_b.mark_used(
+                mngr_b.check_reference_exists("t::a")[1], ref.last_used - 5
+            )
+            mngr_b.write_usage()
+            self.assertEqual(mdl.load_references(mngr.root)[0].last_used, ref.last_used)
+
+            # Writes fold the last uses into the references.
+            mngr_b.write()
+            with open(mngr.paths["usage"], "rt") as fo:
+                self.assertEqual(mdl.json.load(fo), {})
+            self.assertEqual(
+                mdl.Manager(mngr.root).check_reference_exists("t::a")[1].last_used,
+                ref.last_used,
+            )
+
+    def test_work_units(self):
+        with get_references_manager() as mngr1:
+            test_node_id = "my.module::MyClass::my_method"
+            mngr1.create_reference(
+                test_node_id, [1.0, 2.0, 3.0], "norm", work_units=(10, "rows")
+            )
+            mngr1.create_reference(test_node_id + "_plain", [1.0, 2.0], "norm")
+            mngr1.write()
+            mngr2 = mdl.Manager(mngr1.root)
+            ref = mngr2.check_reference_exists(test_node_id)[1]
+            self.assertEqual((ref.work_units, ref.work_unit_name), (10, "rows"))
+            npt.assert_allclose(ref.throughputs(), [10.0, 5.0, 10 / 3])
+            self.assertAlmostEqual(ref.mean_throughput(), 5.0)
+            plain = mngr2.check_reference_exists(test_node_id + "_plain")[1]
+            self.assertIsNone(plain.throughputs())
+            self.assertIsNone(plain.mean_throughput())